@@ -534,28 +534,35 @@ FileTree.prototype.renderDirTree = function(container, form, repo_data) {
                             path.shift();
                             path = '/' + path.join('/') + '/';
                         }
-                        return container.data('site_root') + 'ajax/repo/' + repo_id + '/dirents/?dir_only=true&path=' + e(path);
+                        // get two levels at once, so opening a subdir needs no request
+                        return container.data('site_root') + 'ajax/repo/' + repo_id + '/dirents/?dir_only=true&depth=2&path=' + e(path);
                     },
                     'success': function(data) {
-                        var items = [];
-                        var o, item;
-                        for (var i = 0, len = data.length; i < len; i++) {
-                            o = data[i];
-                            if (o.has_subdir) {
-                                item = { 
-                                    'data': o.name, 
-                                    'attr': { 'type': o.type },
-                                    'state': 'closed'
-                                };
-                            } else {
-                                item = {
-                                    'data': o.name, 
-                                    'attr': {'type': o.type }
-                                };
+                        var get_items = function(data) {
+                            var items = [];
+                            var o, item;
+                            for (var i = 0, len = data.length; i < len; i++) {
+                                o = data[i];
+                                if (o.has_subdir) {
+                                    item = {
+                                        'data': o.name,
+                                        'attr': { 'type': o.type },
+                                        'state': 'closed'
+                                    };
+                                    if (o.children) {
+                                        item.children = get_items(o.children);
+                                    }
+                                } else {
+                                    item = {
+                                        'data': o.name,
+                                        'attr': {'type': o.type }
+                                    };
+                                }
+                                items.push(item);
                             }
-                            items.push(item);
-                       }
-                        return items;
+                            return items;
+                        };
+                        return get_items(data);
                     }
                 }
             },
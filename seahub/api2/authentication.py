@@ -1,7 +1,13 @@
+from django.core.cache import cache
 from rest_framework.authentication import BaseAuthentication
 
-from models import Token
+from models import Token, get_token_cache_key
 from seahub.base.accounts import User
+import seahub.settings as settings
+
+# Token and user are cached for a short while, and invalidated when the
+# token is changed or deleted, or the user is changed or deleted.
+API_TOKEN_CACHE_TIMEOUT = getattr(settings, 'API_TOKEN_CACHE_TIMEOUT', 5 * 60)
 
 class TokenAuthentication(BaseAuthentication):
     """
@@ -26,11 +32,38 @@ class TokenAuthentication(BaseAuthentication):
 
         if len(auth) == 2 and auth[0].lower() == "token":
             key = auth[1]
-            try:
-                token = self.model.objects.get(key=key)
-            except self.model.DoesNotExist:
-                return None
-            user = User.objects.get(email=token.user)
+            cache_key = get_token_cache_key(key)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                token, user = self.from_cache(cached)
+            else:
+                try:
+                    token = self.model.objects.get(key=key)
+                except self.model.DoesNotExist:
+                    return None
+                try:
+                    user = User.objects.get(email=token.user)
+                except User.DoesNotExist:
+                    return None
+                cache.set(cache_key, self.to_cache(token, user),
+                          API_TOKEN_CACHE_TIMEOUT)
             if user.is_active:
                 return (user, token)
 
+    def to_cache(self, token, user):
+        # Only plain values are cached, ``org`` is set per request by
+        # ``BaseMiddleware``.
+        return (token.key, token.user, token.created, user.email, user.id,
+                user.is_staff, user.is_active, user.ctime)
+
+    def from_cache(self, cached):
+        key, token_user, created, email, user_id, is_staff, is_active, \
+            ctime = cached
+        token = self.model(key=key, user=token_user, created=created)
+        user = User(email)
+        user.id = user_id
+        user.is_staff = is_staff
+        user.is_active = is_active
+        user.ctime = ctime
+        return token, user
+
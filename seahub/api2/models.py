@@ -1,10 +1,14 @@
 import uuid
 import hmac
 from hashlib import sha1
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 
 from seahub.base.accounts import User
 from seahub.base.fields import LowerCaseCharField
+from seahub.signals import user_changed
+from seahub.utils import normalize_cache_key
 
 class Token(models.Model):
     """
@@ -26,4 +30,15 @@ class Token(models.Model):
     def __unicode__(self):
         return self.key
 
+def get_token_cache_key(key):
+    return normalize_cache_key(key, 'API_TOKEN_')
 
+def clear_token_cache(sender, instance, **kwargs):
+    cache.delete(get_token_cache_key(instance.key))
+post_save.connect(clear_token_cache, sender=Token)
+post_delete.connect(clear_token_cache, sender=Token)
+
+def clear_user_token_cache(sender, username, **kwargs):
+    keys = Token.objects.filter(user=username).values_list('key', flat=True)
+    cache.delete_many([get_token_cache_key(k) for k in keys])
+user_changed.connect(clear_user_token_cache)
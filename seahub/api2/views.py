@@ -11,7 +11,8 @@ from rest_framework import renderers
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.reverse import reverse
 from rest_framework.response import Response
-from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from rest_framework.throttling import AnonSlidingWindowRateThrottle, \
+    UserSlidingWindowRateThrottle
 from rest_framework.views import APIView
 
 from django.contrib.sites.models import RequestSite
@@ -30,12 +31,14 @@ from utils import is_repo_writable, is_repo_accessible
 from seahub.base.accounts import User
 from seahub.base.models import FileDiscuss, UserStarredFiles
 from seahub.share.models import FileShare
-from seahub.views import access_to_repo, validate_owner, is_registered_user, events, group_events_data, get_diff
+from seahub.views import access_to_repo, validate_owner, is_registered_user, events, get_diff
 from seahub.utils import gen_file_get_url, gen_token, gen_file_upload_url, \
     check_filename_with_rename, get_ccnetapplet_root, \
-    get_dir_files_last_modified, get_user_events, EMPTY_SHA1, \
+    get_dir_files_last_modified, get_user_events_page, EMPTY_SHA1, \
     get_ccnet_server_addr_port, string2list, \
-    gen_block_get_url
+    gen_block_get_url, get_cached_commit
+from seahub.utils.repo import get_repos_head_and_size, get_repos_permission, \
+    get_group_repos_shared_to_user
 from seahub.utils.star import star_file, unstar_file
 import seahub.settings as settings
 try:
@@ -44,28 +47,31 @@ except ImportError:
     CLOUD_MODE = False
 from seahub.group.forms import MessageForm
 from seahub.notifications.models import UserNotification
-from seahub.utils.paginator import Paginator
+from seahub.utils.paginator import Paginator, CursorPaginator, \
+    make_cursor, parse_cursor
 from seahub.group.models import GroupMessage, MessageReply, MessageAttachment
 from seahub.group.settings import GROUP_MEMBERS_DEFAULT_DISPLAY
 from seahub.group.signals import grpmsg_added, grpmsg_reply_added
+from seahub.group.utils import fill_group_msgs
 from seahub.signals import repo_created
 from seahub.group.views import group_check
 from seahub.utils import EVENTS_ENABLED, TRAFFIC_STATS_ENABLED, api_convert_desc_link, api_tsstr_sec, get_file_type_and_ext
 from seahub.utils.file_types import IMAGE
-from seaserv import get_group_repoids, is_repo_owner, get_personal_groups, get_emailusers
+from seaserv import is_repo_owner, get_personal_groups, get_emailusers
 from seahub.profile.models import Profile
+from seahub.profile.utils import prefetch_nicknames
 from seahub.contacts.models import Contact
 from seahub.shortcuts import get_first_object_or_none
 
 from pysearpc import SearpcError, SearpcObjEncoder
-from seaserv import seafserv_rpc, seafserv_threaded_rpc, server_repo_size, \
+from seaserv import seafserv_rpc, seafserv_threaded_rpc, \
     get_personal_groups_by_user, get_session_info, \
     get_group_repos, get_repo, check_permission, get_commits, is_passwd_set,\
     list_personal_repos_by_owner, list_personal_shared_repos, check_quota, \
-    list_share_repos, get_group_repos_by_owner, get_group_repoids, list_inner_pub_repos_by_owner,\
+    list_share_repos, get_group_repos_by_owner, list_inner_pub_repos_by_owner,\
     list_inner_pub_repos,remove_share, unshare_group_repo, unset_inner_pub_repo, get_user_quota, \
     get_user_share_usage, get_user_quota_usage, CALC_SHARE_USAGE, get_group, \
-    get_commit, get_file_id_by_path
+    get_file_id_by_path
 from seaserv import seafile_api
 
 
@@ -106,7 +112,7 @@ class ObtainAuthToken(APIView):
     For example:
     	curl -d "username=foo@example.com&password=123456" http://127.0.0.1:8000/api2/auth-token/
     """
-    throttle_classes = (AnonRateThrottle, )
+    throttle_classes = (AnonSlidingWindowRateThrottle, )
     permission_classes = ()
     parser_classes = (parsers.FormParser, parsers.MultiPartParser, parsers.JSONParser,)
     renderer_classes = (renderers.JSONRenderer,)
@@ -130,7 +136,7 @@ class Accounts(APIView):
     """
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAdminUser, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         # list accounts
@@ -150,7 +156,7 @@ class Account(APIView):
     """
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAdminUser, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, email, format=None):
         # query account info
@@ -217,7 +223,7 @@ class AccountInfo(APIView):
     """
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         info = {}
@@ -234,18 +240,22 @@ class AccountInfo(APIView):
 
         return Response(info)
 
-def calculate_repo_info(repo_list, username):
+def calculate_repo_info(repo_list, username, repos_info=None):
     """
     Get some info for repo.
 
+    ``repos_info`` is the result of ``get_repos_head_and_size``, it will be
+    fetched in one batch if not provided.
     """
+    if repos_info is None:
+        repos_info = get_repos_head_and_size([r.id for r in repo_list])
     for repo in repo_list:
-        commit = get_commits(repo.id, 0, 1)[0]
+        commit, size = repos_info.get(repo.id, (None, 0))
         if not commit:
             continue
         repo.latest_modify = commit.ctime
         repo.root = commit.root_id
-        repo.size = server_repo_size(repo.id)
+        repo.size = size
 
 def repo_download_info(request, repo_id):
     repo = get_repo(repo_id)
@@ -284,14 +294,45 @@ def repo_download_info(request, repo_id):
 class Repos(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         email = request.user.username
         repos_json = []
 
         owned_repos = list_personal_repos_by_owner(email)
-        calculate_repo_info(owned_repos, email)
+        shared_repos = seafile_api.get_share_in_repo_list(email, -1, -1)
+        groups = get_personal_groups_by_user(email)
+        groups_repos = [(group, get_group_repos(group.id, email)) for
+                        group in groups]
+        if not CLOUD_MODE:
+            public_repos = list_inner_pub_repos(email)
+        else:
+            public_repos = []
+
+        # Collect all repo ids first, so that head commits, sizes and
+        # permissions are fetched only once for repos appearing in several
+        # places (e.g. shared to multiple groups).
+        all_repo_ids = [r.id for r in owned_repos]
+        all_repo_ids += [r.repo_id for r in shared_repos]
+        perm_repo_ids = [r.repo_id for r in shared_repos]
+        for group, g_repos in groups_repos:
+            all_repo_ids += [r.id for r in g_repos]
+            perm_repo_ids += [r.id for r in g_repos]
+        all_repo_ids += [r.repo_id for r in public_repos]
+
+        head_cmmt_ids = {}
+        for r in owned_repos:
+            head_cmmt_ids[r.id] = r.head_cmmt_id
+        for group, g_repos in groups_repos:
+            for r in g_repos:
+                head_cmmt_ids[r.id] = r.head_cmmt_id
+
+        repos_info = get_repos_head_and_size(all_repo_ids, head_cmmt_ids)
+        repos_perm = get_repos_permission(perm_repo_ids, email)
+
+        calculate_repo_info(owned_repos, email, repos_info)
+        owned_repos = [r for r in owned_repos if hasattr(r, 'latest_modify')]
         owned_repos.sort(lambda x, y: cmp(y.latest_modify, x.latest_modify))
         for r in owned_repos:
             if r.is_virtual:
@@ -314,16 +355,14 @@ class Repos(APIView):
                 repo["random_key"] = r.random_key
             repos_json.append(repo)
 
-        shared_repos = seafile_api.get_share_in_repo_list(email, -1, -1)
         for r in shared_repos:
-            commit = get_commits(r.repo_id, 0, 1)[0]
+            commit, size = repos_info.get(r.repo_id, (None, 0))
             if not commit:
                 continue
             r.latest_modify = commit.ctime
             r.root = commit.root_id
-            r.size = server_repo_size(r.repo_id)
-            r.password_need = is_passwd_set(r.repo_id, email)
-            r.permission = check_permission(r.repo_id, email)
+            r.size = size
+            r.permission = repos_perm.get(r.repo_id)
             repo = {
                 "type":"srepo",
                 "id":r.repo_id,
@@ -342,10 +381,9 @@ class Repos(APIView):
                 repo["random_key"] = r.random_key
             repos_json.append(repo)
 
-        groups = get_personal_groups_by_user(email)
-        for group in groups:
-            g_repos = get_group_repos(group.id, email)
-            calculate_repo_info (g_repos, email)
+        for group, g_repos in groups_repos:
+            calculate_repo_info(g_repos, email, repos_info)
+            g_repos = [r for r in g_repos if hasattr(r, 'latest_modify')]
             g_repos.sort(lambda x, y: cmp(y.latest_modify, x.latest_modify))
             for r in g_repos:
                 repo = {
@@ -359,7 +397,7 @@ class Repos(APIView):
                     "root":r.root,
                     "size":r.size,
                     "encrypted":r.encrypted,
-                    "permission": check_permission(r.id, email),
+                    "permission": repos_perm.get(r.id),
                     }
                 if r.encrypted:
                     repo["enc_version"] = r.enc_version
@@ -367,31 +405,29 @@ class Repos(APIView):
                     repo["random_key"] = r.random_key
                 repos_json.append(repo)
 
-        if not CLOUD_MODE:
-            public_repos = list_inner_pub_repos(email)
-            for r in public_repos:
-                commit = get_commits(r.repo_id, 0, 1)[0]
-                if not commit:
-                    continue
-                r.root = commit.root_id
-                r.size = server_repo_size(r.repo_id)
-                repo = {
-                    "type": "grepo",
-                    "id": r.repo_id,
-                    "name": r.repo_name,
-                    "desc": r.repo_desc,
-                    "owner": "Organization",
-                    "mtime": r.last_modified,
-                    "root": r.root,
-                    "size": r.size,
-                    "encrypted": r.encrypted,
-                    "permission": r.permission,
-                    }
-                if r.encrypted:
-                    repo["enc_version"] = commit.enc_version
-                    repo["magic"] = commit.magic
-                    repo["random_key"] = commit.random_key
-                repos_json.append(repo)
+        for r in public_repos:
+            commit, size = repos_info.get(r.repo_id, (None, 0))
+            if not commit:
+                continue
+            r.root = commit.root_id
+            r.size = size
+            repo = {
+                "type": "grepo",
+                "id": r.repo_id,
+                "name": r.repo_name,
+                "desc": r.repo_desc,
+                "owner": "Organization",
+                "mtime": r.last_modified,
+                "root": r.root,
+                "size": r.size,
+                "encrypted": r.encrypted,
+                "permission": r.permission,
+                }
+            if r.encrypted:
+                repo["enc_version"] = commit.enc_version
+                repo["magic"] = commit.magic
+                repo["random_key"] = commit.random_key
+            repos_json.append(repo)
 
         return Response(repos_json)
 
@@ -483,7 +519,7 @@ def check_repo_access_permission(request, repo):
 class Repo(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, repo_id, format=None):
         repo = get_repo(repo_id)
@@ -573,7 +609,7 @@ class Repo(APIView):
 class DownloadRepo(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, repo_id, format=None):
         username = request.user.username
@@ -586,7 +622,7 @@ class DownloadRepo(APIView):
 class UploadLinkView(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, repo_id, format=None):
         if check_permission(repo_id, request.user.username) != 'rw':
@@ -605,7 +641,7 @@ class UploadLinkView(APIView):
 class UpdateLinkView(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, repo_id, format=None):
         if check_permission(repo_id, request.user.username) != 'rw':
@@ -624,7 +660,7 @@ class UpdateLinkView(APIView):
 class UploadBlksLinkView(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, repo_id, format=None):
         if check_permission(repo_id, request.user.username) != 'rw':
@@ -643,7 +679,7 @@ class UploadBlksLinkView(APIView):
 class UpdateBlksLinkView(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, repo_id, format=None):
         if check_permission(repo_id, request.user.username) != 'rw':
@@ -872,7 +908,7 @@ class StarredFileView(APIView):
 
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         # list starred files
@@ -919,7 +955,7 @@ class FileView(APIView):
 
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, repo_id, format=None):
         # view file
@@ -1133,7 +1169,7 @@ class FileSharedLinkView(APIView):
     """
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def put(self, request, repo_id, format=None):
         # generate file shared link
@@ -1184,7 +1220,7 @@ class DirView(APIView):
     """
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, repo_id, format=None):
         # list dir
@@ -1318,7 +1354,7 @@ class SharedRepos(APIView):
     """
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         username = request.user.username
@@ -1338,7 +1374,7 @@ class BeShared(APIView):
     """
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         username = request.user.username
@@ -1346,27 +1382,7 @@ class BeShared(APIView):
         shared_repos += seafile_api.get_share_in_repo_list(username, -1, -1)
 
         joined_groups = get_personal_groups_by_user(username)
-        for grp in joined_groups:
-        # Get group repos, and for each group repos...
-            for r_id in get_group_repoids(grp.id):
-                # No need to list my own repo
-                if seafile_api.is_repo_owner(username, r_id):
-                    continue
-                 # Convert repo properties due to the different collumns in Repo
-                 # and SharedRepo
-                r = get_repo(r_id)
-                if not r:
-                    continue
-                r.repo_id = r.id
-                r.repo_name = r.name
-                r.repo_desc = r.desc
-                cmmts = get_commits(r_id, 0, 1)
-                last_commit = cmmts[0] if cmmts else None
-                r.last_modified = last_commit.ctime if last_commit else 0
-                r.share_type = 'group'
-                r.user = seafile_api.get_repo_owner(r_id)
-                r.user_perm = check_permission(r_id, username)
-                shared_repos.append(r)
+        shared_repos += get_group_repos_shared_to_user(username, joined_groups)
 
         if not CLOUD_MODE:
             shared_repos += list_inner_pub_repos(username)
@@ -1381,7 +1397,7 @@ class SharedRepo(APIView):
     """
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated, )
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def delete(self, request, repo_id, format=None):
         """
@@ -1492,13 +1508,12 @@ def activity(request):
 
     email = request.user.username
     events_count = 15
-    events, events_more_offset = get_user_events(email, 0, events_count)
-    events_more = True if len(events) == events_count else False
-    event_groups = group_events_data(events)
+    event_groups, events_more, events_more_offset = get_user_events_page(
+        email, 0, events_count)
     api_pre_events(event_groups)
 
     return render_to_response('api2/events.html', {
-            "events": events,
+            "events": event_groups,
             "events_more_offset": events_more_offset,
             "events_more": events_more,
             "event_groups": event_groups,
@@ -1511,10 +1526,8 @@ def events(request):
     username = request.user.username
     start = int(request.GET.get('start', 0))
 
-    events, start = get_user_events(username, start, events_count)
-    events_more = True if len(events) == events_count else False
-
-    event_groups = group_events_data(events)
+    event_groups, events_more, start = get_user_events_page(
+        username, start, events_count)
 
     api_pre_events(event_groups)
     ctx = {'event_groups': event_groups}
@@ -1567,7 +1580,7 @@ def group_discuss(request, group):
     UserNotification.objects.filter(to_user=username, msg_type='group_msg',
                                     detail=str(group.id)).delete()
 
-    group_msgs = get_group_msgs(group.id, page=1, username=request.user.username)
+    group_msgs = get_group_msgs(group.id, None, request.user.username)
 
     return render_to_response("api2/discussions.html", {
             "group" : group,
@@ -1575,11 +1588,31 @@ def group_discuss(request, group):
             }, context_instance=RequestContext(request))
 
 
-def get_group_msgs(groupid, page, username):
+def prepare_group_msgs(group_msgs, username):
+    fill_group_msgs(group_msgs, username)
+
+    emails = []
+    for msg in group_msgs:
+        emails.append(msg.from_email)
+        emails += [r.from_email for r in msg.replies]
+    prefetch_nicknames(emails)
 
-    # Show 15 group messages per page.
+def get_group_msgs(groupid, after, username):
+
+    # Show 15 group messages per page, older than cursor `after` if given.
+    paginator = CursorPaginator(GroupMessage.objects.filter(
+            group_id=groupid), 15)
+    group_msgs = paginator.page(after=after)
+    prepare_group_msgs(group_msgs.object_list, username)
+
+    return group_msgs
+
+def get_group_msgs_by_page(groupid, page, username):
+    """Page group messages by page number, for clients that still send
+    ``page`` to ``more_discussions``.
+    """
     paginator = Paginator(GroupMessage.objects.filter(
-            group_id=groupid).order_by('-timestamp'), 15)
+            group_id=groupid).order_by('-timestamp', '-id'), 15)
 
     # If page request (9999) is out of range, return None
     try:
@@ -1589,70 +1622,35 @@ def get_group_msgs(groupid, page, username):
 
     # Force evaluate queryset to fix some database error for mysql.
     group_msgs.object_list = list(group_msgs.object_list)
-
-    attachments = MessageAttachment.objects.filter(group_message__in=group_msgs.object_list)
-
-    msg_replies = MessageReply.objects.filter(reply_to__in=group_msgs.object_list)
-    reply_to_list = [ r.reply_to_id for r in msg_replies ]
-
-    for msg in group_msgs.object_list:
-        msg.reply_cnt = reply_to_list.count(msg.id)
-        msg.replies = []
-        for r in msg_replies:
-            if msg.id == r.reply_to_id:
-                msg.replies.append(r)
-        msg.replies = msg.replies[-3:]
-
-        for att in attachments:
-            if att.group_message_id != msg.id:
-                continue
-
-            # Attachment name is file name or directory name.
-            # If is top directory, use repo name instead.
-            path = att.path
-            if path == '/':
-                repo = get_repo(att.repo_id)
-                if not repo:
-                    # TODO: what should we do here, tell user the repo
-                    # is no longer exists?
-                    continue
-                att.name = repo.name
-            else:
-                path = path.rstrip('/') # cut out last '/' if possible
-                att.name = os.path.basename(path)
-
-            # Load to discuss page if attachment is a image and from recommend.
-            if att.attach_type == 'file' and att.src == 'recommend':
-                att.filetype, att.fileext = get_file_type_and_ext(att.name)
-                if att.filetype == IMAGE:
-                    att.obj_id = get_file_id_by_path(att.repo_id, path)
-                    if not att.obj_id:
-                        att.err = _(u'File does not exist')
-                    else:
-                        att.token = seafserv_rpc.web_get_access_token(att.repo_id, att.obj_id,
-                                                         'view', username)
-                        att.img_url = gen_file_get_url(att.token, att.name)
-
-            msg.attachment = att
+    prepare_group_msgs(group_msgs.object_list, username)
 
     return group_msgs
 
 @group_check
 def more_discussions(request, group):
     content_type = 'application/json; charset=utf-8'
-    try:
-        page = int(request.GET.get('page'))
-    except ValueError:
-        page = 2
-
-    group_msgs = get_group_msgs(group.id, page, request.user.username)
-    if group_msgs.has_next():
-        next_page = group_msgs.next_page_number()
+    ret = {}
+    if 'page' in request.GET and 'after' not in request.GET:
+        # Older clients page by number and read ``next_page``.
+        try:
+            page = int(request.GET.get('page'))
+        except ValueError:
+            page = 2
+
+        group_msgs = get_group_msgs_by_page(group.id, page,
+                                            request.user.username)
+        ret['next_page'] = ret['next_cursor'] = None
+        if group_msgs and group_msgs.has_next():
+            ret['next_page'] = group_msgs.next_page_number()
+            last = group_msgs.object_list[-1]
+            ret['next_cursor'] = make_cursor(last.timestamp, last.pk)
     else:
-        next_page = None
+        after = parse_cursor(request.GET.get('after', ''))
+        group_msgs = get_group_msgs(group.id, after, request.user.username)
+        ret['next_cursor'] = group_msgs.next_cursor
 
-    html = render_to_string('api2/discussions_body.html', {"group_msgs": group_msgs}, context_instance=RequestContext(request))
-    return HttpResponse(json.dumps({"html": html, 'next_page': next_page}), content_type=content_type)
+    ret['html'] = render_to_string('api2/discussions_body.html', {"group_msgs": group_msgs}, context_instance=RequestContext(request))
+    return HttpResponse(json.dumps(ret), content_type=content_type)
 
 def discussion(request, msg_id):
     try:
@@ -1749,7 +1747,7 @@ def repo_history_changes(request, repo_id):
 
     changes = get_diff(repo_id, '', commit_id)
 
-    c = get_commit(commit_id)
+    c = get_cached_commit(commit_id)
     if c.parent_id is None:
         # A commit is a first commit only if its parent id is None.
         changes['cmt_desc'] = repo.desc
@@ -1818,7 +1816,7 @@ def msg_reply_new(request):
 class Groups(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         email = request.user.username
@@ -1860,7 +1858,7 @@ class Groups(APIView):
 class AjaxEvents(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         return events(request)
@@ -1868,7 +1866,7 @@ class AjaxEvents(APIView):
 class AjaxDiscussions(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, group_id, format=None):
         return more_discussions(request, group_id)
@@ -1876,7 +1874,7 @@ class AjaxDiscussions(APIView):
 class ActivityHtml(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         return activity(request)
@@ -1884,7 +1882,7 @@ class ActivityHtml(APIView):
 class NewReplyHtml(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, format=None):
         return msg_reply_new(request)
@@ -1892,7 +1890,7 @@ class NewReplyHtml(APIView):
 class DiscussionsHtml(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, group_id, format=None):
         return group_discuss(request, group_id)
@@ -1904,7 +1902,7 @@ class DiscussionsHtml(APIView):
 class DiscussionHtml(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, msg_id, format=None):
         return discussion(request, msg_id)
@@ -1916,7 +1914,7 @@ class DiscussionHtml(APIView):
 class RepoHistoryChangeHtml(APIView):
     authentication_classes = (TokenAuthentication, )
     permission_classes = (IsAuthenticated,)
-    throttle_classes = (UserRateThrottle, )
+    throttle_classes = (UserSlidingWindowRateThrottle, )
 
     def get(self, request, repo_id, format=None):
         return api_repo_history_changes (request, repo_id)
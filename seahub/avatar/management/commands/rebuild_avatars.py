@@ -1,14 +1,41 @@
+from multiprocessing import Pool
+from optparse import make_option
+
 from django.core.management.base import NoArgsCommand
+from django.db import connection
+
+from seahub.avatar.models import Avatar, GroupAvatar
 
-from seahub.avatar.models import Avatar
-from seahub.avatar.settings import AUTO_GENERATE_AVATAR_SIZES
+def rebuild_avatar(avatar):
+    avatar.create_thumbnails()
+    return unicode(avatar)
 
 class Command(NoArgsCommand):
     help = "Regenerates avatar thumbnails for the sizes specified in " + \
-        "settings.AUTO_GENERATE_AVATAR_SIZES."
-    
+        "settings.AUTO_GENERATE_AVATAR_SIZES and " + \
+        "settings.AUTO_GENERATE_GROUP_AVATAR_SIZES."
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--processes', dest='processes', type='int', default=1,
+            help='Number of processes to generate thumbnails with.'),
+    )
+
     def handle_noargs(self, **options):
-        for avatar in Avatar.objects.all():
-            for size in AUTO_GENERATE_AVATAR_SIZES:
-                print "Rebuilding Avatar id=%s at size %s." % (avatar.id, size)
-                avatar.create_thumbnail(size)
+        processes = options.get('processes') or 1
+        avatars = list(Avatar.objects.all()) + list(GroupAvatar.objects.all())
+
+        if processes <= 1:
+            results = (rebuild_avatar(avatar) for avatar in avatars)
+        else:
+            # Workers only touch the storage and the cache, don't share the
+            # database connection with them.
+            connection.close()
+            pool = Pool(processes)
+            results = pool.imap_unordered(rebuild_avatar, avatars)
+
+        for name in results:
+            print "Rebuilt %s." % name
+
+        if processes > 1:
+            pool.close()
+            pool.join()
@@ -6,6 +6,7 @@ import os
 from seahub.base.fields import LowerCaseCharField
 
 from django.db import models
+from django.core.cache import cache
 from django.core.files.base import ContentFile
 from django.utils.translation import ugettext as _
 from django.utils.encoding import smart_str
@@ -28,7 +29,10 @@ from seahub.avatar.settings import (AVATAR_STORAGE_DIR, AVATAR_RESIZE_METHOD,
                              AVATAR_MAX_AVATARS_PER_USER, AVATAR_THUMB_FORMAT,
                              AVATAR_HASH_USERDIRNAMES, AVATAR_HASH_FILENAMES,
                              AVATAR_THUMB_QUALITY, AUTO_GENERATE_AVATAR_SIZES,
-                             GROUP_AVATAR_STORAGE_DIR)
+                             GROUP_AVATAR_STORAGE_DIR,
+                             AUTO_GENERATE_GROUP_AVATAR_SIZES,
+                             AVATAR_THUMB_CACHE_TIMEOUT)
+from seahub.utils import normalize_cache_key
 
 def avatar_file_path(instance=None, filename=None, size=None, ext=None):
     if isinstance(instance, Avatar):
@@ -77,41 +81,103 @@ def find_extension(format):
 
     return format
 
+def _resize_chain(image, sizes):
+    """Crop ``image`` to a square once, then resize it to each of ``sizes``,
+    largest first, each from the previous result. Return a dict of size and
+    image, with None for a size the original image already is exactly
+    (``size`` x ``size``), like the old ``create_thumbnail``.
+    """
+    (w, h) = image.size
+    if w > h:
+        diff = (w - h) / 2
+        image = image.crop((diff, 0, w - diff, h))
+    else:
+        diff = (h - w) / 2
+        image = image.crop((0, diff, w, h - diff))
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+
+    ret = {}
+    for size in sorted(set(sizes), reverse=True):
+        if w == size and h == size:
+            ret[size] = None
+            continue
+        image = image.resize((size, size), AVATAR_RESIZE_METHOD)
+        ret[size] = image
+    return ret
+
+def _thumb_cache_key(name):
+    return normalize_cache_key(name, 'AVATAR_THUMB_')
+
 class AvatarBase(object):
     """
     Base class for avatar.
     """
+    # Sizes generated when a new avatar is saved.
+    auto_generate_sizes = ()
+
+    def set_avatar_file(self, image_file):
+        """Store ``image_file`` as the avatar, named after the md5 of its
+        content, so thumbnail names, which are derived from it, are content
+        addressed and never change once created.
+        """
+        md5 = hashlib.md5()
+        for chunk in image_file.chunks():
+            md5.update(chunk)
+        ext = os.path.splitext(image_file.name)[1].lower()
+        self.avatar.save(md5.hexdigest() + ext, image_file, save=False)
+
     def thumbnail_exists(self, size):
-        return self.avatar.storage.exists(self.avatar_name(size))
-    
+        # Thumbnail names are content addressed, a thumbnail once created is
+        # never changed, so it's safe to remember that it exists.
+        name = self.avatar_name(size)
+        key = _thumb_cache_key(name)
+        if cache.get(key):
+            return True
+        if self.avatar.storage.exists(name):
+            cache.set(key, True, AVATAR_THUMB_CACHE_TIMEOUT)
+            return True
+        return False
+
     def create_thumbnail(self, size, quality=None):
-        # invalidate the cache of the thumbnail with the given size first
+        self.create_thumbnails([size], quality)
+
+    def create_thumbnails(self, sizes=None, quality=None):
+        """Create thumbnails of every size in ``sizes`` (default
+        ``auto_generate_sizes``). The original is read and decoded once.
+        """
+        if sizes is None:
+            sizes = self.auto_generate_sizes
+        if not sizes:
+            return
+
+        # invalidate the cache of the thumbnails with the given sizes first
         if isinstance(self, Avatar):
-            invalidate_cache(self.emailuser, size)
-            
+            for size in sizes:
+                invalidate_cache(self.emailuser, size)
+
         try:
             orig = self.avatar.storage.open(self.avatar.name, 'rb').read()
             image = Image.open(StringIO(orig))
+            thumbs = _resize_chain(image, sizes)
         except IOError:
             return # What should we do here?  Render a "sorry, didn't work" img?
         quality = quality or AVATAR_THUMB_QUALITY
-        (w, h) = image.size
-        if w != size or h != size:
-            if w > h:
-                diff = (w - h) / 2
-                image = image.crop((diff, 0, w - diff, h))
+        storage = self.avatar.storage
+        for size, thumb_image in thumbs.items():
+            if thumb_image is None:
+                thumb_file = ContentFile(orig)
             else:
-                diff = (h - w) / 2
-                image = image.crop((0, diff, w, h - diff))
-            if image.mode != "RGBA":
-                image = image.convert("RGBA")
-            image = image.resize((size, size), AVATAR_RESIZE_METHOD)
-            thumb = StringIO()
-            image.save(thumb, AVATAR_THUMB_FORMAT, quality=quality)
-            thumb_file = ContentFile(thumb.getvalue())
-        else:
-            thumb_file = ContentFile(orig)
-        thumb = self.avatar.storage.save(self.avatar_name(size), thumb_file)
+                thumb = StringIO()
+                thumb_image.save(thumb, AVATAR_THUMB_FORMAT, quality=quality)
+                thumb_file = ContentFile(thumb.getvalue())
+            name = self.avatar_name(size)
+            # Overwrite a stale thumbnail, instead of saving under another
+            # name which would never be used.
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, thumb_file)
+            cache.set(_thumb_cache_key(name), True, AVATAR_THUMB_CACHE_TIMEOUT)
 
     def avatar_url(self, size):
         return self.avatar.storage.url(self.avatar_name(size))
@@ -129,6 +195,8 @@ class AvatarBase(object):
         )
     
 class Avatar(models.Model, AvatarBase):
+    auto_generate_sizes = AUTO_GENERATE_AVATAR_SIZES
+
     emailuser = LowerCaseCharField(max_length=255)
     primary = models.BooleanField(default=False)
     avatar = models.ImageField(max_length=1024, upload_to=avatar_file_path, blank=True)
@@ -155,6 +223,8 @@ class Avatar(models.Model, AvatarBase):
         super(Avatar, self).delete(*args, **kwargs)
 
 class GroupAvatar(models.Model, AvatarBase):
+    auto_generate_sizes = AUTO_GENERATE_GROUP_AVATAR_SIZES
+
     group_id = models.CharField(max_length=255)
     avatar = models.ImageField(max_length=1024, upload_to=avatar_file_path, blank=True)
     date_uploaded = models.DateTimeField(default=datetime.datetime.now)
@@ -167,8 +237,8 @@ class GroupAvatar(models.Model, AvatarBase):
 
 def create_default_thumbnails(instance=None, created=False, **kwargs):
     if created:
-        for size in AUTO_GENERATE_AVATAR_SIZES:
-            instance.create_thumbnail(size)
+        instance.create_thumbnails()
 
 signals.post_save.connect(create_default_thumbnails, sender=Avatar, dispatch_uid="create_default_thumbnails")
+signals.post_save.connect(create_default_thumbnails, sender=GroupAvatar, dispatch_uid="create_default_group_thumbnails")
 
@@ -1,4 +1,5 @@
 import os.path
+import hashlib
 
 from django.test import TestCase
 from django.core.urlresolvers import reverse
@@ -6,7 +7,8 @@ from django.conf import settings
 
 from seahub.base.accounts import User
 
-from seahub.avatar.settings import AVATAR_DEFAULT_URL, AVATAR_MAX_AVATARS_PER_USER
+from seahub.avatar.settings import AVATAR_DEFAULT_URL, AVATAR_MAX_AVATARS_PER_USER, \
+    AUTO_GENERATE_AVATAR_SIZES
 from seahub.avatar.util import get_primary_avatar
 from seahub.avatar.models import Avatar
 
@@ -60,7 +62,19 @@ class AvatarUploadTests(AvatarTestCase):
         avatar = get_primary_avatar(self.user) 
        
         self.failIfEqual(avatar, None)
-        
+
+    def testAutomaticThumbnailCreation(self):
+        upload_helper(self, "test.png")
+        avatar = get_primary_avatar(self.user)
+        f = open(os.path.join(self.testdatapath, "test.png"), "rb")
+        digest = hashlib.md5(f.read()).hexdigest()
+        f.close()
+        self.failUnlessEqual(os.path.basename(avatar.avatar.name),
+                             digest + '.png')
+        for size in AUTO_GENERATE_AVATAR_SIZES:
+            self.failUnless(avatar.avatar.storage.exists(
+                    avatar.avatar_name(size)))
+
     def testImageWithoutExtension(self):
         # use with AVATAR_ALLOWED_FILE_EXTS = ('.jpg', '.png')
         response = upload_helper(self, "imagefilewithoutext")
@@ -147,4 +161,3 @@ class AvatarUploadTests(AvatarTestCase):
     # def testHashUserName
     # def testChangePrimaryAvatar
     # def testDeleteThumbnailAndRecreation    
-    # def testAutomaticThumbnailCreation
@@ -73,7 +73,7 @@ def add(request, extra_context=None, next_override=None,
                 primary = True,
             )
             image_file = request.FILES['avatar']
-            avatar.avatar.save(image_file.name, image_file)
+            avatar.set_avatar_file(image_file)
             avatar.save()
             messages.success(request, _("Successfully uploaded a new avatar."))
             avatar_updated.send(sender=Avatar, user=request.user, avatar=avatar)
@@ -120,7 +120,7 @@ def group_add(request, gid):
             image_file = request.FILES['avatar']
             avatar = GroupAvatar()
             avatar.group_id = gid
-            avatar.avatar.save(image_file.name, image_file)
+            avatar.set_avatar_file(image_file)
             avatar.save()
             # invalidate group avatar cache
             invalidate_group_cache(gid)
@@ -13,6 +13,7 @@ from registration import signals
 from seaserv import ccnet_threaded_rpc, unset_repo_passwd, is_passwd_set
 
 from seahub.profile.models import Profile
+from seahub.signals import user_changed
 
 
 UNUSABLE_PASSWORD = '!' # This will never be a valid hash
@@ -71,16 +72,6 @@ class UserManager(object):
         user.ctime = emailuser.ctime
         user.org = emailuser.org
 
-        # User last login timestamp is recorded in a seperated table.
-        from seahub.base.models import UserLastLogin
-        try:
-            user_last_login = UserLastLogin.objects.get(username=emailuser.email)
-            login_dt = user_last_login.last_login
-        except UserLastLogin.DoesNotExist:
-            from seahub.utils.time import dt
-            login_dt = dt(user.ctime)
-        user.last_login = login_dt
-
         return user
 
 class User(object):
@@ -101,6 +92,27 @@ class User(object):
     def __unicode__(self):
         return self.username
 
+    def _get_last_login(self):
+        # User last login timestamp is recorded in a seperated table, it's
+        # only looked up when needed.
+        if '_last_login' not in self.__dict__:
+            from seahub.base.models import UserLastLogin
+            try:
+                user_last_login = UserLastLogin.objects.get(username=self.email)
+                self._last_login = user_last_login.last_login
+            except UserLastLogin.DoesNotExist:
+                ctime = getattr(self, 'ctime', None)
+                if ctime is None:
+                    return None
+                from seahub.utils.time import dt
+                self._last_login = dt(ctime)
+        return self._last_login
+
+    def _set_last_login(self, value):
+        self._last_login = value
+
+    last_login = property(_get_last_login, _set_last_login)
+
     def is_anonymous(self):
         """
         Always returns False. This is a way of comparing User objects to
@@ -128,6 +140,7 @@ class User(object):
             ccnet_threaded_rpc.add_emailuser(self.username, self.password,
                                              int(self.is_staff),
                                              int(self.is_active))
+        user_changed.send(sender=User, username=self.username)
 
     def delete(self):
         """
@@ -137,6 +150,7 @@ class User(object):
         ccnet_threaded_rpc.remove_emailuser(self.username)
         ccnet_threaded_rpc.remove_group_user(self.username)
         Profile.objects.filter(user=self.username).delete()
+        user_changed.send(sender=User, username=self.username)
 
     def get_and_delete_messages(self):
         messages = []
@@ -1,9 +1,7 @@
-from django.core.cache import cache
-
 from seaserv import get_binding_peerids, get_orgs_by_user
 
-from seahub.notifications.models import Notification
-from seahub.notifications.utils import refresh_cache
+from seahub.notifications.utils import get_cur_topinfo
+from seahub.profile.utils import clear_prefetched_user_info
 try:
     from seahub.settings import CLOUD_MODE
 except ImportError:
@@ -27,32 +25,30 @@ class BaseMiddleware(object):
 
         request.user.org = None
         request.user.orgs = None
+
+        # Nicknames and user ids prefetched are only valid in one request.
+        clear_prefetched_user_info()
             
         return None
 
     def process_response(self, request, response):
+        clear_prefetched_user_info()
         return response
     
 class InfobarMiddleware(object):
     """Query info bar close status, and store into reqeust."""
 
-    def get_from_db(self):
-        ret = Notification.objects.all().filter(primary=1)
-        refresh_cache()
-        return ret
-
     def process_request(self, request):
         topinfo_close = request.COOKIES.get('info_id', '')
 
-        cur_note = cache.get('CUR_TOPINFO') if cache.get('CUR_TOPINFO') else \
-            self.get_from_db()
+        cur_note = get_cur_topinfo()
         if not cur_note:
             request.cur_note = None
         else:
-            if str(cur_note[0].id) in topinfo_close.split('_'):
+            if str(cur_note.id) in topinfo_close.split('_'):
                 request.cur_note = None
             else:
-                request.cur_note = cur_note[0]
+                request.cur_note = cur_note
 
         return None
             
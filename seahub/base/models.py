@@ -170,8 +170,11 @@ class DirFilesLastModifiedInfo(models.Model):
     files under a directory <parent_dir> in repo <repo_id>.
 
     The field "last_modified_info" is the json format of a dict whose keys are
-    the file names and values are their corresponding last modified
-    timestamps.
+    the file and sub directory names and values are lists of their last
+    modified timestamps and object ids, like {"xxx": [t1, obj_id1]}. Object
+    ids are used to find the entries changed since last computed. Records
+    saved by older versions map names to timestamps only, and are re-computed
+    in full once.
 
     The field "dir_id" is used to check whether the cache should be
     re-computed
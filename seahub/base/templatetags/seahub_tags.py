@@ -16,6 +16,8 @@ from seahub.base.accounts import User
 from seahub.profile.models import Profile
 from seahub.profile.settings import NICKNAME_CACHE_TIMEOUT, NICKNAME_CACHE_PREFIX, \
     EMAIL_ID_CACHE_TIMEOUT, EMAIL_ID_CACHE_PREFIX
+from seahub.profile.utils import get_prefetched_nickname, \
+    get_prefetched_email_id
 from seahub.cconvert import CConvert
 from seahub.po import TRANSLATION_MAP
 from seahub.shortcuts import get_first_object_or_none
@@ -215,6 +217,10 @@ def email2nickname(value):
     if not value:
         return ''
 
+    nickname = get_prefetched_nickname(value)
+    if nickname is not None:
+        return nickname
+
     key = normalize_cache_key(value, NICKNAME_CACHE_PREFIX)
     nickname = cache.get(key)
     if not nickname:
@@ -233,6 +239,10 @@ def email2id(value):
     if not value:
         return -1
 
+    user_id = get_prefetched_email_id(value)
+    if user_id is not None:
+        return user_id
+
     key = normalize_cache_key(value, EMAIL_ID_CACHE_PREFIX)
     user_id = cache.get(key)
     if not user_id:
@@ -287,14 +297,7 @@ cc.spliter = ''
 @register.filter(name='char2pinyin')
 def char2pinyin(value):
     """Convert Chinese character to pinyin."""
-
-    key = normalize_cache_key(value, 'CHAR2PINYIN_')
-    py = cache.get(key)
-    if not py:
-        py = cc.convert(value)
-        cache.set(key, py, 365 * 24 * 60 * 60)
-
-    return py
+    return cc.convert(value)
 
 @register.filter(name='translate_permission')
 def translate_permission(value):
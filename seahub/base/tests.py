@@ -1,3 +1,4 @@
+# -*- coding: utf-8 -*-
 """
 This file demonstrates two different styles of tests (one doctest and one
 unittest). These will both pass when you run "manage.py test".
@@ -55,3 +56,476 @@ class BasicTest(BaseTestCase):
         self.assertEqual(r.status_code, 200)
 
         self.assertEqual(len(r.context['notes']), 0)
+
+class TieredCacheTest(unittest.TestCase):
+    def setUp(self):
+        from seahub.base.tiered_cache import TieredCache
+        self.cache = TieredCache(None, {'OPTIONS': {
+                    'SHARED_CACHE': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCAL_MAX_ENTRIES': 2,
+                    'LOCAL_PREFIX_TIMEOUTS': {'SHARED_ONLY_': 0},
+                    }})
+        self.cache.clear()
+
+    def test_get_set(self):
+        self.cache.set('foo', 'bar')
+        self.assertEqual(self.cache.get('foo'), 'bar')
+
+        # Served by the shared cache after cleared from local tier.
+        self.cache.clear_local()
+        self.assertEqual(self.cache.get('foo'), 'bar')
+
+        self.cache.delete('foo')
+        self.assertEqual(self.cache.get('foo'), None)
+
+    def test_prefix_timeout(self):
+        self.cache.set('SHARED_ONLY_foo', 'bar')
+        self.assertEqual(len(self.cache._local), 0)
+        self.assertEqual(self.cache.get('SHARED_ONLY_foo'), 'bar')
+
+        # Deleted by another process.
+        self.cache._shared.delete('SHARED_ONLY_foo')
+        self.assertEqual(self.cache.get('SHARED_ONLY_foo'), None)
+
+    def test_get_many(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c', 'd']),
+                         {'a': 1, 'b': 2, 'c': 3})
+
+    def test_get_or_set(self):
+        calls = []
+        def callback():
+            calls.append(1)
+            return 'value'
+        self.assertEqual(self.cache.get_or_set('key', callback), 'value')
+        self.assertEqual(self.cache.get_or_set('key', callback), 'value')
+        self.assertEqual(len(calls), 1)
+
+class FakeSearpcObj(object):
+    """Like seaserv objects, every unknown attribute is None, so it can't be
+    pickled.
+    """
+    def __init__(self, d):
+        self._dict = d
+
+    def __getattr__(self, name):
+        try:
+            return self._dict[name]
+        except KeyError:
+            return None
+
+class BatchCallTest(unittest.TestCase):
+    def test_results(self):
+        from seahub.utils import batch_call
+        calls = []
+        def func(x):
+            calls.append(x)
+            return x * 2
+        self.assertEqual(batch_call(func, [1, 2, 3, 2]), {1: 2, 2: 4, 3: 6})
+        self.assertEqual(sorted(calls), [1, 2, 3])
+        self.assertEqual(batch_call(func, []), {})
+
+    def test_nested(self):
+        from seahub.utils import batch_call
+        def func(x):
+            return sum(batch_call(lambda y: y, range(x)).values())
+        self.assertEqual(batch_call(func, range(20)),
+                         dict([(x, sum(range(x))) for x in range(20)]))
+
+    def test_exception(self):
+        from seahub.utils import batch_call
+        def func(x):
+            if x == 2:
+                raise ValueError(x)
+            return x
+        self.assertRaises(ValueError, batch_call, func, [1, 2, 3])
+
+class CommitCacheTest(unittest.TestCase):
+    def setUp(self):
+        from seahub.base.tiered_cache import TieredCache
+        import seahub.utils as utils
+        self.utils = utils
+        self.orig = (utils.cache, utils.seafserv_threaded_rpc)
+        utils.cache = TieredCache(None, {'OPTIONS': {
+                    'SHARED_CACHE': 'django.core.cache.backends.locmem.LocMemCache',
+                    }})
+        utils.cache.clear()
+        utils._commit_lru.clear()
+
+        self.commit = FakeSearpcObj({'id': 'a' * 40, 'root_id': 'b' * 40,
+                                     'ctime': 1380000000, 'desc': u'Added',
+                                     'creator_name': 'foo@foo.com'})
+        self.rpc_calls = []
+        test = self
+        class FakeRpc(object):
+            def get_commit(self, commit_id):
+                test.rpc_calls.append(commit_id)
+                return test.commit
+        utils.seafserv_threaded_rpc = FakeRpc()
+
+    def tearDown(self):
+        self.utils.cache, self.utils.seafserv_threaded_rpc = self.orig
+        self.utils._commit_lru.clear()
+
+    def test_round_trip(self):
+        commit_id = self.commit.id
+        c = self.utils.get_cached_commit(commit_id)
+        self.assertEqual(c.ctime, 1380000000)
+
+        # Served by the shared cache, which pickles values.
+        self.utils._commit_lru.clear()
+        self.utils.cache.clear_local()
+        c = self.utils.get_cached_commit(commit_id)
+        self.assertEqual(self.rpc_calls, [commit_id])
+        self.assertEqual(c.root_id, self.commit.root_id)
+        self.assertEqual(c.props.desc, u'Added')
+        self.assertEqual(c.parent_id, None)
+
+        # Served by the local LRU.
+        self.assertEqual(self.utils.get_cached_commit(commit_id).creator_name,
+                         'foo@foo.com')
+        self.assertEqual(self.rpc_calls, [commit_id])
+
+class EventsFeedTest(unittest.TestCase):
+    """Walk the cached events feed with a fake seafevents.
+    """
+    def setUp(self):
+        import sys
+        import types
+        import seahub.settings
+        import seahub.utils as utils
+
+        test = self
+        self.events = []        # newest first
+        self.deleted_repos = set()
+        self.db_reads = []
+
+        class FakeSession(object):
+            def close(self):
+                pass
+        seafevents = types.ModuleType('seafevents')
+        seafevents.init_db_session_class = lambda conf: FakeSession
+        def get_user_events(session, username, start, limit):
+            test.db_reads.append((start, limit))
+            return test.events[start:start + limit]
+        seafevents.get_user_events = get_user_events
+        def delete_event(session, uuid):
+            test.events = [e for e in test.events if e.uuid != uuid]
+        seafevents.delete_event = delete_event
+
+        self.orig_seafevents = sys.modules.get('seafevents')
+        self.orig_conf = getattr(seahub.settings, 'EVENTS_CONFIG_FILE', '')
+        sys.modules['seafevents'] = seafevents
+        seahub.settings.EVENTS_CONFIG_FILE = 'events.conf'
+        self.utils = reload(utils)
+
+        class FakeRpc(object):
+            def get_commit(self, commit_id):
+                i = int(commit_id.split('_')[1])
+                return FakeSearpcObj({'id': commit_id, 'repo_id': 'repo',
+                                      'desc': u'Added "f%d"' % i,
+                                      'ctime': 1380000000 + i,
+                                      'creator_name': 'foo@foo.com'})
+        def get_repo(repo_id):
+            if repo_id in test.deleted_repos:
+                return None
+            return FakeSearpcObj({'id': repo_id, 'encrypted': False})
+        self.utils.seafserv_threaded_rpc = FakeRpc()
+        self.utils.get_repo = get_repo
+        self.utils.cache.clear()
+        self.utils._commit_lru.clear()
+
+    def tearDown(self):
+        import sys
+        import seahub.settings
+        if self.orig_seafevents is None:
+            del sys.modules['seafevents']
+        else:
+            sys.modules['seafevents'] = self.orig_seafevents
+        if self.orig_conf == '':
+            del seahub.settings.EVENTS_CONFIG_FILE
+        else:
+            seahub.settings.EVENTS_CONFIG_FILE = self.orig_conf
+        self.utils.cache.clear()
+        reload(self.utils)
+
+    def add_events(self, start, end, repo_id='repo'):
+        for i in range(start, end):
+            self.events.insert(0, FakeSearpcObj({
+                        'uuid': 'e%d' % i, 'etype': 'repo-update',
+                        'repo_id': repo_id, 'commit_id': 'c_%d' % i,
+                        'username': 'foo@foo.com'}))
+
+    def get_page(self, start, count=10):
+        groups, more, new_start = self.utils.get_user_events_page(
+            'foo@foo.com', start, count)
+        uuids = [e.uuid for g in groups for e in g['events']]
+        # Stale events are deleted after the request.
+        self.utils._delete_stale_events()
+        return uuids, more, new_start
+
+    def walk(self, start=0):
+        uuids = []
+        more = True
+        while more:
+            page, more, start = self.get_page(start)
+            uuids += page
+        return uuids
+
+    def expected(self, start, end):
+        return ['e%d' % i for i in range(end - 1, start - 1, -1)]
+
+    def test_cached_pages(self):
+        self.add_events(0, 25)
+        self.assertEqual(self.walk(), self.expected(0, 25))
+
+        # Served from the cache, only the newest event is read.
+        self.db_reads = []
+        self.assertEqual(self.get_page(0), (self.expected(15, 25), True, 10))
+        self.assertEqual(self.db_reads, [(0, 1)])
+
+    def test_end_of_feed(self):
+        self.add_events(0, 20)
+        self.assertEqual(self.get_page(10), (self.expected(0, 10), True, 20))
+        self.assertEqual(self.get_page(20), ([], False, 20))
+        self.assertEqual(self.get_page(20), ([], False, 20))
+
+    def test_new_events(self):
+        self.add_events(0, 25)
+        self.assertEqual(self.get_page(0), (self.expected(15, 25), True, 10))
+        self.assertEqual(self.get_page(10), (self.expected(5, 15), True, 20))
+
+        # New events are merged into the cached first page, and the start
+        # of cached pages is shifted.
+        self.add_events(25, 28)
+        self.assertEqual(self.get_page(0), (self.expected(15, 28), True, 13))
+        self.assertEqual(self.get_page(13), (self.expected(5, 15), True, 23))
+        self.assertEqual(self.get_page(23), (self.expected(0, 5), False, 28))
+
+        # Too many new events, the cache is rebuilt.
+        self.add_events(28, 28 + self.utils.EVENTS_CACHE_MAX_NEW + 1)
+        self.assertEqual(self.walk(),
+                         self.expected(0, 28 + self.utils.EVENTS_CACHE_MAX_NEW + 1))
+
+    def test_repo_deleted(self):
+        for i in range(25):
+            self.add_events(i, i + 1, 'gone' if i % 5 == 3 else 'repo')
+        self.assertEqual(self.get_page(0), (self.expected(15, 25), True, 10))
+
+        # Events of the deleted repo are dropped from the cached page, and
+        # skipped when reading later pages.
+        self.deleted_repos.add('gone')
+        alive = [x for x in self.expected(0, 25)
+                 if int(x[1:]) % 5 != 3]
+        self.assertEqual(self.get_page(0)[0], alive[:8])
+        self.assertEqual(self.walk(10), alive[8:])
+        self.assertEqual(self.walk(), alive)
+
+class DirFilesLastModifiedTest(unittest.TestCase):
+    def setUp(self):
+        import stat
+        import seahub.utils as utils
+        self.utils = utils
+        self.orig = (utils.seafile_api, utils.seafserv_threaded_rpc,
+                     utils.DirFilesLastModifiedInfo)
+        self.dirents = {
+            'a': (stat.S_IFREG | 0644, 'a' * 40),
+            'd': (stat.S_IFDIR | 0755, 'd' * 40),
+            }
+        self.revision_error = False
+        self.rpc_calls = []
+        self.saved = []
+        test = self
+
+        class FakeApi(object):
+            def list_dir_by_dir_id(self, dir_id):
+                return [FakeSearpcObj({'obj_name': k, 'mode': v[0],
+                                       'obj_id': v[1]})
+                        for k, v in test.dirents.items()]
+        class FakeRpc(object):
+            def list_file_revisions(self, repo_id, path, limit, days):
+                test.rpc_calls.append(path)
+                if test.revision_error:
+                    raise utils.SearpcError('error')
+                return [FakeSearpcObj({'creator_name': 'foo@foo.com',
+                                       'ctime': 300})]
+            def calc_files_last_modified(self, repo_id, path, limit):
+                test.rpc_calls.append('calc')
+                return [FakeSearpcObj({'file_name': 'a', 'last_modified': 300}),
+                        FakeSearpcObj({'file_name': 'd', 'last_modified': 400})]
+        class FakeQuery(object):
+            def update(self, **kwargs):
+                test.saved.append(kwargs)
+        class FakeManager(object):
+            def filter(self, **kwargs):
+                return FakeQuery()
+        class FakeInfo(object):
+            objects = FakeManager()
+        utils.seafile_api = FakeApi()
+        utils.seafserv_threaded_rpc = FakeRpc()
+        utils.DirFilesLastModifiedInfo = FakeInfo
+
+    def tearDown(self):
+        (self.utils.seafile_api, self.utils.seafserv_threaded_rpc,
+         self.utils.DirFilesLastModifiedInfo) = self.orig
+
+    def test_load(self):
+        from seahub.utils import _dump_dir_files_last_modified, \
+            _load_dir_files_last_modified
+        value = _dump_dir_files_last_modified({'a': 1, 'b': 2},
+                                              {'a': 'x' * 40})
+        self.assertEqual(_load_dir_files_last_modified(value),
+                         ({'a': 1, 'b': 2}, {'a': 'x' * 40, 'b': ''}))
+
+        # Format of older versions, without file ids.
+        self.assertEqual(_load_dir_files_last_modified('{"a": 1, "b": 2}'),
+                         ({'a': 1, 'b': 2}, None))
+
+    def update(self, old_ids):
+        info = FakeSearpcObj({'id': 1, 'dir_id': 'x' * 40,
+                              'last_modified_info':
+                              self.utils._dump_dir_files_last_modified(
+                    {'a': 100, 'd': 200}, old_ids)})
+        return self.utils.update_dir_files_last_modified(info, 'repo', '/',
+                                                         'y' * 40)
+
+    def test_update_file_changed(self):
+        ret = self.update({'a': 'b' * 40, 'd': 'd' * 40})
+        self.assertEqual(ret, {'a': 300, 'd': 200})
+        self.assertEqual(self.rpc_calls, ['/a'])
+        self.assertEqual(self.utils._load_dir_files_last_modified(
+                self.saved[0]['last_modified_info']),
+                         ({'a': 300, 'd': 200}, {'a': 'a' * 40, 'd': 'd' * 40}))
+
+    def test_update_dir_changed(self):
+        ret = self.update({'a': 'a' * 40, 'd': 'e' * 40})
+        self.assertEqual(ret, {'a': 300, 'd': 400})
+        self.assertEqual(self.rpc_calls, ['calc'])
+        self.assertEqual(len(self.saved), 1)
+
+    def test_update_error(self):
+        self.revision_error = True
+        ret = self.update({'a': 'b' * 40, 'd': 'd' * 40})
+        self.assertEqual(ret['d'], 200)
+        self.assertEqual(self.saved, [])
+
+class LineDiffTest(unittest.TestCase):
+    def check_blocks(self, a, b, blocks):
+        last_i = last_j = 0
+        for i, j, k in blocks:
+            self.assertTrue(i >= last_i and j >= last_j)
+            self.assertEqual(a[i:i + k], b[j:j + k])
+            last_i, last_j = i + k, j + k
+        self.assertEqual(blocks[-1], (len(a), len(b), 0))
+
+    def test_line_matcher(self):
+        from seahub.utils.htmldiff import LineMatcher
+        s = LineMatcher('a b c d'.split(), 'a x c d'.split())
+        self.assertEqual(s.get_opcodes(),
+                         [('equal', 0, 1, 0, 1), ('replace', 1, 2, 1, 2),
+                          ('equal', 2, 4, 2, 4)])
+
+    def test_myers_fallback(self):
+        from seahub.utils.htmldiff import line_matching_blocks
+        # No line is unique, so the Myers diff is used.
+        a = ['x', 'y'] * 20
+        b = ['x', 'y', 'y'] * 10 + ['x'] * 5
+        blocks = line_matching_blocks(a, b)
+        self.check_blocks(a, b, blocks)
+        self.assertTrue(sum(k for i, j, k in blocks) >= 20)
+
+        # Beyond max_d the region is reported as replaced.
+        blocks = line_matching_blocks(['p', 'x', 'x', 'q'],
+                                      ['p', 'y', 'y', 'q'], max_d=0)
+        self.assertEqual(blocks, [(0, 0, 1), (3, 3, 1), (4, 4, 0)])
+
+    def test_budgets(self):
+        from seahub.utils.htmldiff import HtmlDiff, DiffTooLarge, \
+            make_unified_diff
+        a = ['line %d' % i for i in range(1000)]
+        b = ['changed %d' % i for i in range(1000)]
+        diff = HtmlDiff(fast=True)
+        self.assertRaises(DiffTooLarge, diff.make_table, a, b, True,
+                          max_size=1024)
+        self.assertRaises(DiffTooLarge, diff.make_table, a, b, True,
+                          timeout=-1)
+
+        text, truncated = make_unified_diff(a, b, max_size=1024,
+                                            matcher=diff.matcher)
+        self.assertTrue(truncated)
+        self.assertTrue(len(text) <= 1024)
+        self.assertTrue(text.startswith('--- \n+++ \n@@ -1,1000 +1,1000 @@'))
+
+        text, truncated = make_unified_diff(['a', 'b'], ['a', 'c'])
+        self.assertFalse(truncated)
+        self.assertEqual(text.splitlines()[-2:], ['-b', '+c'])
+
+class TextPreviewTest(unittest.TestCase):
+    def setUp(self):
+        from StringIO import StringIO
+        import seahub.views.file as file_views
+        self.views = file_views
+        self.orig = (file_views.urlopen, file_views.TEXT_PREVIEW_CHUNK_SIZE,
+                     file_views.TEXT_PREVIEW_MAX_BYTES)
+        file_views.TEXT_PREVIEW_CHUNK_SIZE = 4
+
+        test = self
+        class FakeResponse(StringIO):
+            def getcode(self):
+                return 200
+        def urlopen(url, headers=None):
+            # Range is ignored, like a server not supporting it.
+            return FakeResponse(test.content)
+        file_views.urlopen = urlopen
+
+    def tearDown(self):
+        self.views.urlopen, self.views.TEXT_PREVIEW_CHUNK_SIZE, \
+            self.views.TEXT_PREVIEW_MAX_BYTES = self.orig
+
+    def read_pages(self, max_lines):
+        pages = []
+        offset, file_enc = 0, 'auto'
+        while offset is not None:
+            err, content, file_enc, offset = self.views.repo_file_get_lines(
+                'http://127.0.0.1/files/token/a.txt', file_enc, offset,
+                max_lines)
+            self.assertEqual(err, '')
+            pages.append(content)
+        return pages
+
+    def test_read_lines(self):
+        from StringIO import StringIO
+        read_lines = self.views.read_lines
+        self.assertEqual(read_lines(StringIO('a\nbb\nccc\nd'), 2, 100),
+                         ('a\nbb\n', False))
+        self.assertEqual(read_lines(StringIO('a\nbb\nccc\nd'), 10, 100),
+                         ('a\nbb\nccc\nd', True))
+        self.assertEqual(read_lines(StringIO('x' * 20), 10, 8),
+                         ('x' * 8, False))
+
+    def test_multibyte_boundary(self):
+        self.views.TEXT_PREVIEW_MAX_BYTES = 7
+        for text in (u'\u4e2d\u6587\u5b57\u7b26' * 5,
+                     u'\u4e2d\u6587\n\u5b57\u7b26\u5b57\u7b26\n\u4e2d\n'):
+            for enc in ('gbk', 'utf-8'):
+                self.content = text.encode(enc)
+                pages = self.read_pages(10)
+                self.assertTrue(len(pages) > 1)
+                self.assertEqual(u''.join(pages), text)
+
+    def test_max_lines(self):
+        self.views.TEXT_PREVIEW_MAX_BYTES = 1024
+        self.content = ''.join(['line %d\n' % i for i in range(10)])
+        pages = self.read_pages(3)
+        self.assertEqual(pages[0], u'line 0\nline 1\nline 2\n')
+        self.assertEqual(u''.join(pages), self.content.decode('utf-8'))
+
+class CConvertTest(unittest.TestCase):
+    def test_convert(self):
+        from seahub.cconvert import CConvert
+        cc = CConvert()
+        self.assertEqual(cc.convert(u'中文'), 'zhong-wen')
+        self.assertEqual(cc.convert(u'a，b'), 'ab')
+
+        cc.just_shengmu = True
+        self.assertEqual(cc.convert(u'中文'), 'zw')
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Two-tier cache backend.
+
+A bounded in-process LRU is put in front of a shared cache backend (e.g.
+memcached or file based cache), so hot keys like nicknames and avatars are
+served without touching the shared cache.
+
+Example::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'seahub.base.tiered_cache.TieredCache',
+            'OPTIONS': {
+                'SHARED_CACHE': 'shared',
+                'LOCAL_MAX_ENTRIES': 10000,
+                'LOCAL_TIMEOUT': 60,
+                'LOCAL_PREFIX_TIMEOUTS': {'COMMIT_': 24 * 60 * 60},
+            },
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+        },
+    }
+
+Values in the local tier expire after ``LOCAL_TIMEOUT`` seconds (or the
+timeout of the first matching prefix in ``LOCAL_PREFIX_TIMEOUTS``), since
+other processes may change them in the shared cache. Keys with a prefix
+timeout of 0 are never kept in the local tier.
+"""
+import time
+import threading
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from django.core.cache.backends.base import BaseCache
+
+from seahub.base.lru import LRUCache
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        BaseCache.__init__(self, params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_CACHE', location or 'shared')
+        self._shared_cache = None
+        self._local = LRUCache(int(options.get('LOCAL_MAX_ENTRIES', 10000)))
+        self._local_timeout = int(options.get('LOCAL_TIMEOUT', 60))
+        # Longest prefix first, so that the most specific prefix wins.
+        prefix_timeouts = options.get('LOCAL_PREFIX_TIMEOUTS', {})
+        self._prefix_timeouts = sorted(prefix_timeouts.items(),
+                                       key=lambda x: len(x[0]), reverse=True)
+        self._lock_timeout = int(options.get('LOCK_TIMEOUT', 10))
+        # A fixed set of striped locks keeps memory bounded.
+        self._local_locks = [threading.Lock() for i in range(64)]
+
+    @property
+    def _shared(self):
+        # Resolved lazily, the shared cache may not be created yet when this
+        # backend is initialized by ``django.core.cache``.
+        if self._shared_cache is None:
+            from django.core.cache import get_cache
+            self._shared_cache = get_cache(self._shared_alias)
+        return self._shared_cache
+
+    def _local_ttl(self, key, timeout):
+        ttl = self._local_timeout
+        for prefix, prefix_ttl in self._prefix_timeouts:
+            if key.startswith(prefix):
+                ttl = prefix_ttl
+                break
+        if timeout is None:
+            timeout = self.default_timeout
+        if timeout:
+            ttl = min(ttl, timeout)
+        return ttl
+
+    def _local_get(self, key, version):
+        entry = self._local.get(self.make_key(key, version))
+        if entry is None:
+            return None
+        expire_at, pickled = entry
+        if expire_at < time.time():
+            self._local.delete(self.make_key(key, version))
+            return None
+        return pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout, version):
+        ttl = self._local_ttl(key, timeout)
+        if ttl <= 0:
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._local.set(self.make_key(key, version),
+                        (time.time() + ttl, pickled))
+
+    def add(self, key, value, timeout=None, version=None):
+        if self._shared.add(key, value, timeout=timeout, version=version):
+            self._local_set(key, value, timeout, version)
+            return True
+        return False
+
+    def get(self, key, default=None, version=None):
+        value = self._local_get(key, version)
+        if value is not None:
+            return value
+
+        value = self._shared.get(key, version=version)
+        if value is None:
+            return default
+        self._local_set(key, value, None, version)
+        return value
+
+    def set(self, key, value, timeout=None, version=None):
+        self._shared.set(key, value, timeout=timeout, version=version)
+        self._local_set(key, value, timeout, version)
+
+    def delete(self, key, version=None):
+        self._local.delete(self.make_key(key, version))
+        self._shared.delete(key, version=version)
+
+    def get_many(self, keys, version=None):
+        ret = {}
+        missing = []
+        for key in keys:
+            value = self._local_get(key, version)
+            if value is not None:
+                ret[key] = value
+            else:
+                missing.append(key)
+
+        if missing:
+            found = self._shared.get_many(missing, version=version)
+            for key, value in found.items():
+                self._local_set(key, value, None, version)
+                ret[key] = value
+        return ret
+
+    def set_many(self, data, timeout=None, version=None):
+        self._shared.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            self._local_set(key, value, timeout, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local.delete(self.make_key(key, version))
+        self._shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        if self._local_get(key, version) is not None:
+            return True
+        return self._shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete(self.make_key(key, version))
+        return self._shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local.delete(self.make_key(key, version))
+        return self._shared.decr(key, delta, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self._shared.clear()
+
+    def clear_local(self):
+        """Clear the in-process tier only.
+        """
+        self._local.clear()
+
+    def close(self, **kwargs):
+        self._shared.close(**kwargs)
+
+    def _get_local_lock(self, key):
+        return self._local_locks[hash(key) % len(self._local_locks)]
+
+    def get_or_set(self, key, callback, timeout=None, version=None):
+        """Return the value of ``key``, calling ``callback`` to compute and
+        cache it on a miss.
+
+        Only one thread in this process, and (through a lock key in the
+        shared cache) preferably only one process, computes a missing value
+        at a time, others wait for it up to ``LOCK_TIMEOUT`` seconds.
+        """
+        value = self.get(key, version=version)
+        if value is not None:
+            return value
+
+        with self._get_local_lock(key):
+            value = self.get(key, version=version)
+            if value is not None:
+                return value
+
+            lock_key = key + '__lock'
+            if self._shared.add(lock_key, 1, self._lock_timeout,
+                                version=version):
+                try:
+                    value = callback()
+                    self.set(key, value, timeout=timeout, version=version)
+                finally:
+                    self._shared.delete(lock_key, version=version)
+                return value
+
+            # Another process is computing the value, wait for it.
+            deadline = time.time() + self._lock_timeout
+            while time.time() < deadline:
+                time.sleep(0.05)
+                value = self._shared.get(key, version=version)
+                if value is not None:
+                    self._local_set(key, value, timeout, version)
+                    return value
+
+            value = callback()
+            self.set(key, value, timeout=timeout, version=version)
+            return value
@@ -18,20 +18,51 @@
 import sys,os
 import re
 import string
-class CConvert:
-	def __init__(self):
-		self.has_shengdiao = False
-		self.just_shengmu  = False
-		self.spliter = '-'
-		"Load data table"
+import threading
+
+# Map from a unicode character to its pinyin, loaded on first use.
+_pinyin_table = None
+_pinyin_table_lock = threading.Lock()
+_PINYIN_PATT = re.compile(r'[0-9a-zA-Z]+')
+_ASCII_PUNCTUATIONS = set("'\"`~!@#$%^&*()=+[]{}\\|;:,.<>/?")
+_CJK_PUNCTUATIONS = set("－—！#＃%％&＆（）*，、。：；？？　@＠＼{｛｜}｝~～‘’“”《》【】+＋=＝×￥·…　".decode("utf-8"))
+
+def _load_pinyin_table():
+	"Load data table into a dict, only the first pinyin of a character is kept"
+	global _pinyin_table
+	with _pinyin_table_lock:
+		if _pinyin_table is not None:
+			return _pinyin_table
 		try:
 			fp=open(os.path.join(os.path.dirname(__file__), 'convert-utf-8.txt'))
 		except IOError:
 			print "Can't load data from convert-utf-8.txt\nPlease make sure this file exists."
 			sys.exit(1)
 		else:
-			self.data=fp.read().decode("utf-8")# decoded data to unicode
+			data=fp.read().decode("utf-8")# decoded data to unicode
 			fp.close()
+		table = {}
+		for line in data.splitlines():
+			if not line or line[0] in table:
+				continue
+			m = _PINYIN_PATT.match(line, 1)
+			if m:
+				table[line[0]] = m.group(0)
+		_pinyin_table = table
+	return _pinyin_table
+
+class CConvert:
+	def __init__(self):
+		self.has_shengdiao = False
+		self.just_shengmu  = False
+		self.spliter = '-'
+
+	@property
+	def table(self):
+		"Data table, loaded lazily so that importing doesn't slow startup"
+		if _pinyin_table is not None:
+			return _pinyin_table
+		return _load_pinyin_table()
 	
 	def convert1(self, strIn):
 		"Convert Unicode strIn to PinYin"
@@ -63,16 +94,16 @@ class CConvert:
 	def getIndex(self, strIn):
 		"Convert single Unicode to PinYin from index"
 		if strIn==' ':return self.spliter
-		if set(strIn).issubset("'\"`~!@#$%^&*()=+[]{}\\|;:,.<>/?"):return self.spliter # or return ""
-		if set(strIn).issubset("－—！#＃%％&＆（）*，、。：；？？　@＠＼{｛｜}｝~～‘’“”《》【】+＋=＝×￥·…　".decode("utf-8")):return ""
-		pos=re.search("^"+strIn+"([0-9a-zA-Z]+)", self.data, re.M)
-		if pos==None:
+		if set(strIn).issubset(_ASCII_PUNCTUATIONS):return self.spliter # or return ""
+		if set(strIn).issubset(_CJK_PUNCTUATIONS):return ""
+		py=self.table.get(strIn)
+		if py==None:
 			return strIn
 		else:
 			if not self.just_shengmu:
-				return pos.group(1)
+				return py
 			else:
-				return pos.group(1)[:1]
+				return py[:1]
 	
 	def convert(self, strIn):
 		"Convert Unicode strIn to PinYin"
@@ -18,6 +18,10 @@ class GroupMessage(models.Model):
     message = models.CharField(max_length=2048)
     timestamp = models.DateTimeField(default=datetime.datetime.now)
 
+    class Meta:
+        # For paginating messages of a group by timestamp.
+        index_together = [['group_id', 'timestamp']]
+
 class MessageReply(models.Model):
     reply_to = models.ForeignKey(GroupMessage)
     from_email = LowerCaseCharField(max_length=255)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import os
+
+from django.db.models import Count
+from django.utils.translation import ugettext as _
+
+from seaserv import get_repo, get_file_id_by_path, web_get_access_token
+
+from seahub.group.models import MessageReply, MessageAttachment
+from seahub.utils import batch_call, get_file_type_and_ext, gen_file_get_url
+from seahub.utils.file_types import IMAGE
+
+def _get_file_id(repo_and_path):
+    repo_id, path = repo_and_path
+    return get_file_id_by_path(repo_id, path)
+
+def fill_group_msgs(group_msgs, username, replies_per_msg=3):
+    """Set ``reply_cnt``, ``replies`` (the latest ``replies_per_msg``
+    replies) and ``attachment`` of each message in ``group_msgs``.
+
+    Reply counts come from one aggregate query, replies and attachments are
+    fetched in one query each and bucketed by message id, repos and file ids
+    of attachments are resolved in one batch.
+    """
+    msg_ids = [msg.id for msg in group_msgs]
+    if not msg_ids:
+        return
+
+    reply_cnts = dict(MessageReply.objects.filter(reply_to__in=msg_ids).
+                      values_list('reply_to').annotate(Count('id')))
+
+    replies = {}
+    replied_ids = [k for k, v in reply_cnts.items() if v > 0]
+    if replied_ids:
+        for r in MessageReply.objects.filter(
+                reply_to__in=replied_ids).order_by('id'):
+            replies.setdefault(r.reply_to_id, []).append(r)
+
+    attachments = {}
+    for att in MessageAttachment.objects.filter(group_message__in=msg_ids):
+        attachments[att.group_message_id] = att
+
+    # Attachment name is file name or directory name. If is top directory,
+    # use repo name instead.
+    repos = batch_call(get_repo, [att.repo_id for att in attachments.values()
+                                  if att.path == '/'])
+
+    # Load to discuss page if attachment is a image and from recommend.
+    images = []
+    for att in attachments.values():
+        if att.path == '/':
+            repo = repos.get(att.repo_id)
+            att.name = repo.name if repo else None
+            continue
+        att.name = os.path.basename(att.path.rstrip('/'))
+        if att.attach_type == 'file' and att.src == 'recommend':
+            att.filetype, att.fileext = get_file_type_and_ext(att.name)
+            if att.filetype == IMAGE:
+                images.append(att)
+    file_ids = batch_call(_get_file_id, [(att.repo_id, att.path.rstrip('/'))
+                                         for att in images])
+    for att in images:
+        att.obj_id = file_ids.get((att.repo_id, att.path.rstrip('/')))
+        if not att.obj_id:
+            att.err = _(u'File does not exist')
+        else:
+            att.token = web_get_access_token(att.repo_id, att.obj_id,
+                                             'view', username)
+            att.img_url = gen_file_get_url(att.token, att.name)
+
+    for msg in group_msgs:
+        msg.reply_cnt = reply_cnts.get(msg.id, 0)
+        msg.replies = replies.get(msg.id, [])[-replies_per_msg:]
+        att = attachments.get(msg.id)
+        if att is not None and att.name is not None:
+            msg.attachment = att
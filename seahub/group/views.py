@@ -6,7 +6,6 @@ import simplejson as json
 import urllib2
 
 from django.core.mail import send_mail
-from django.core.paginator import EmptyPage, InvalidPage
 from django.core.urlresolvers import reverse
 from django.contrib import messages
 from django.contrib.sites.models import RequestSite
@@ -23,7 +22,7 @@ from django.utils.translation import ungettext
 from seahub.auth.decorators import login_required
 import seaserv
 from seaserv import ccnet_threaded_rpc, seafserv_threaded_rpc, seafserv_rpc, \
-    web_get_access_token, seafile_api, \
+    seafile_api, \
     get_repo, get_group_repos, get_commits, is_group_user, \
     get_personal_groups_by_user, get_group, get_group_members, create_repo, \
     get_personal_groups, create_org_repo, get_org_group_repos, \
@@ -38,11 +37,13 @@ from forms import MessageForm, MessageReplyForm, GroupRecommendForm, \
     GroupAddForm, GroupJoinMsgForm, WikiCreateForm
 from signals import grpmsg_added, grpmsg_reply_added
 from settings import GROUP_MEMBERS_DEFAULT_DISPLAY
+from utils import fill_group_msgs
 from seahub.base.decorators import sys_staff_required
 from seahub.base.models import FileDiscuss
 from seahub.contacts.models import Contact
 from seahub.contacts.signals import mail_sended
 from seahub.notifications.models import UserNotification
+from seahub.profile.utils import prefetch_user_info
 from seahub.wiki import get_group_wiki_repo, get_group_wiki_page, convert_wiki_link,\
     get_wiki_pages
 from seahub.wiki.models import WikiDoesNotExist, WikiPageMissing, GroupWiki
@@ -50,10 +51,9 @@ from seahub.wiki.utils import clean_page_name, get_wiki_dirent
 from seahub.settings import SITE_ROOT, SITE_NAME, MEDIA_URL
 from seahub.shortcuts import get_first_object_or_none
 from seahub.utils import render_error, render_permission_error, string2list, \
-    check_and_get_org_by_group, gen_file_get_url, get_file_type_and_ext, \
-    get_file_contributors, is_valid_email, calc_file_path_hash
-from seahub.utils.file_types import IMAGE
-from seahub.utils.paginator import Paginator
+    check_and_get_org_by_group, get_file_contributors, is_valid_email, \
+    calc_file_path_hash
+from seahub.utils.paginator import CursorPaginator, parse_cursor
 from seahub.views import is_registered_user
 from seahub.views.modules import get_enabled_mods_by_group, MOD_GROUP_WIKI,\
     enable_mod_for_group, disable_mod_for_group, get_available_mods_by_group
@@ -491,6 +491,11 @@ def group_info(request, group):
                                               request.user.username)
         cmt.tp = cmt.props.desc.split(' ')[0]
 
+    emails = [m.user_name for m in members[:GROUP_MEMBERS_DEFAULT_DISPLAY]]
+    emails.append(group.creator_name)
+    emails += [cmt.creator_name for cmt in recent_commits]
+    prefetch_user_info(emails)
+
     # get available modules(wiki, etc)
     mods_available = get_available_mods_by_group(group.id)
     mods_enabled = get_enabled_mods_by_group(group.id)
@@ -526,6 +531,7 @@ def group_members(request, group):
             m.can_be_contact = False
         else:
             m.can_be_contact = True
+    prefetch_user_info([m.user_name for m in members])
 
     # get available modules(wiki, etc)
     mods_available = get_available_mods_by_group(group.id)
@@ -907,6 +913,12 @@ def group_recommend(request):
         msg.reply_cnt = len(msg.replies)
         msg.replies = msg.replies[-3:]
 
+    emails = []
+    for msg in grp_msgs:
+        emails.append(msg.from_email)
+        emails += [r.from_email for r in msg.replies]
+    prefetch_user_info(emails)
+
     ctx = {}
     ctx['messages'] = grp_msgs
     html = render_to_string("group/discussion_list.html", ctx)
@@ -1145,71 +1157,21 @@ def group_discuss(request, group):
     members = get_group_members(group.id)
         
     """group messages"""
-    # Show 15 group messages per page.
-    paginator = Paginator(GroupMessage.objects.filter(
-            group_id=group.id).order_by('-timestamp'), 15)
-
-    # Make sure page request is an int. If not, deliver first page.
-    try:
-        page = int(request.GET.get('page', '1'))
-    except ValueError:
-        page = 1
-
-    # If page request (9999) is out of range, deliver last page of results.
-    try:
-        group_msgs = paginator.page(page)
-    except (EmptyPage, InvalidPage):
-        group_msgs = paginator.page(paginator.num_pages)
-
-    group_msgs.page_range = paginator.get_page_range(group_msgs.number)
+    # Show 15 group messages per page, invalid cursor delivers first page.
+    paginator = CursorPaginator(GroupMessage.objects.filter(
+            group_id=group.id), 15)
+    group_msgs = paginator.page(
+        after=parse_cursor(request.GET.get('after', '')),
+        before=parse_cursor(request.GET.get('before', '')))
 
-    # Force evaluate queryset to fix some database error for mysql.        
-    group_msgs.object_list = list(group_msgs.object_list) 
+    fill_group_msgs(group_msgs.object_list, username)
 
-    attachments = MessageAttachment.objects.filter(group_message__in=group_msgs.object_list)
-
-    msg_replies = MessageReply.objects.filter(reply_to__in=group_msgs.object_list)
-    reply_to_list = [ r.reply_to_id for r in msg_replies ]
-    
+    # Resolve nicknames and user ids of members and message authors at once.
+    emails = [m.user_name for m in members[:GROUP_MEMBERS_DEFAULT_DISPLAY]]
     for msg in group_msgs.object_list:
-        msg.reply_cnt = reply_to_list.count(msg.id)
-        msg.replies = []
-        for r in msg_replies:
-            if msg.id == r.reply_to_id:
-                msg.replies.append(r)
-        msg.replies = msg.replies[-3:]
-            
-        for att in attachments:
-            if att.group_message_id != msg.id:
-                continue
-
-            # Attachment name is file name or directory name.
-            # If is top directory, use repo name instead.
-            path = att.path
-            if path == '/':
-                repo = get_repo(att.repo_id)
-                if not repo:
-                    # TODO: what should we do here, tell user the repo
-                    # is no longer exists?
-                    continue
-                att.name = repo.name
-            else:
-                path = path.rstrip('/') # cut out last '/' if possible
-                att.name = os.path.basename(path)
-
-            # Load to discuss page if attachment is a image and from recommend.
-            if att.attach_type == 'file' and att.src == 'recommend':
-                att.filetype, att.fileext = get_file_type_and_ext(att.name)
-                if att.filetype == IMAGE:
-                    att.obj_id = get_file_id_by_path(att.repo_id, path)
-                    if not att.obj_id:
-                        att.err = _(u'File does not exist')
-                    else:
-                        att.token = web_get_access_token(att.repo_id, att.obj_id,
-                                                         'view', username)
-                        att.img_url = gen_file_get_url(att.token, att.name)
-
-            msg.attachment = att
+        emails.append(msg.from_email)
+        emails += [r.from_email for r in msg.replies]
+    prefetch_user_info(emails)
 
     # get available modules(wiki, etc)
     mods_available = get_available_mods_by_group(group.id)
@@ -3,11 +3,13 @@ import logging
 import string
 from datetime import datetime, timedelta
 
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.core.management.base import BaseCommand, CommandError
 from django.core.urlresolvers import reverse
+from django.db.models import Count
 
 from seahub.message.models import UserMessage, UserMsgLastCheck
+from seahub.utils.mail import send_mails
 import seahub.settings as settings
 
 # Get an instance of a logger
@@ -58,28 +60,17 @@ class Command(BaseCommand):
             last_check.save()
 
         # handle msgs
-        email_ctx = {}
-
-        for msg in unread_msgs:
-            if email_ctx.has_key(msg.to_email):
-                email_ctx[msg.to_email] += 1
-            else:
-                email_ctx[msg.to_email] = 1
-        
-        for to_email, count in email_ctx.items():
-            subject = subjects[1] if count > 1 else subjects[0]
-            template = string.Template(email_templates[1]) if count > 1 else \
-                string.Template(email_templates[0])
-            content = template.substitute(to_email=to_email, count=count,
-                                         site_name=site_name, url=url)
-
-            try:
-                send_mail(subject, content, settings.DEFAULT_FROM_EMAIL,
-                          [to_email], fail_silently=False)
-                logger.info('Successfully sended email to %s' % to_email)
-            except Exception, e:
-                logger.error('Failed to send email to %s, error detail: %s' % (to_email, e))
-
-
-        
-    
+        email_ctx = unread_msgs.values_list('to_email').\
+            annotate(Count('message_id')).order_by()
+
+        templates = [string.Template(t) for t in email_templates]
+        def gen_mails():
+            for to_email, count in email_ctx.iterator():
+                subject = subjects[1] if count > 1 else subjects[0]
+                template = templates[1] if count > 1 else templates[0]
+                content = template.substitute(to_email=to_email, count=count,
+                                              site_name=site_name, url=url)
+                yield EmailMessage(subject, content,
+                                   settings.DEFAULT_FROM_EMAIL, [to_email])
+
+        send_mails(gen_mails())
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
+from models import UserMsgSummary
 
-def msg_info_list(msgs, user):
-    """Group message list by ``from_email`` or ``to_email`` and order by
-    message time. 
+def msg_info_list(user):
+    """Group messages related to ``user`` by the other user and order by
+    last message time, read from conversation summaries.
 
     **Returns**
 
@@ -13,35 +14,6 @@ def msg_info_list(msgs, user):
     ]
 
     """
-    message = {}
-
-    for msg in msgs:
-        if (msg.from_email == user): # message user send to others
-            if not message.has_key(msg.to_email):
-                message.setdefault(msg.to_email,{})
-                message[msg.to_email].setdefault('not_read', 0)
-                message[msg.to_email].setdefault('last_msg',msg.message)
-                message[msg.to_email].setdefault('last_time',msg.timestamp)
-            else:
-                if msg.timestamp > message[msg.to_email]['last_time']:
-                    message[msg.to_email]['last_time'] = msg.timestamp
-                    message[msg.to_email]['last_msg'] = msg.message
-                    
-        else:                   # message others send to the user
-            if not message.has_key(msg.from_email):
-                message.setdefault(msg.from_email,{})
-                message[msg.from_email].setdefault('not_read',0) 
-                message[msg.from_email].setdefault('last_msg',msg.message) 
-                message[msg.from_email].setdefault('last_time',msg.timestamp)
-            else:
-                if msg.timestamp > message[msg.from_email]['last_time']:
-                    message[msg.from_email]['last_time'] = msg.timestamp
-                    message[msg.from_email]['last_msg'] = msg.message
-
-            if not msg.ifread:
-                message[msg.from_email]['not_read'] += 1
-
-    sorted_msg = sorted(message.items(), key=lambda x: x[1]['last_time'],
-                        reverse=True)
-
-    return sorted_msg
+    return [(s.peer, {'last_msg': s.last_msg, 'not_read': s.not_read,
+                      'last_time': s.last_time})
+            for s in UserMsgSummary.objects.get_summaries_by_user(user)]
@@ -3,8 +3,8 @@ import os
 import datetime
 
 from django import forms
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction, IntegrityError
+from django.db.models import Q, F, Max, Count
 from django.forms import ModelForm
 from django.utils.translation import ugettext as _
 
@@ -31,6 +31,7 @@ class UserMessageManager(models.Manager):
         new_msg = self.model(from_email=user1, to_email=user2, message=msg,
                              ifread=0)
         new_msg.save(using=self._db)
+        UserMsgSummary.objects.update_by_new_message(new_msg)
         return new_msg
     
     def update_unread_messages(self, user1, user2):
@@ -40,6 +41,8 @@ class UserMessageManager(models.Manager):
         super(UserMessageManager, self).filter(
             Q(from_email=user1)&Q(to_email=user2)&Q(ifread=0)
             ).update(ifread=1)
+        UserMsgSummary.objects.filter(username=user2, peer=user1).update(
+            not_read=0)
 
     def count_unread_messages_by_user(self, user):
         """Count a user's unread messages.
@@ -60,6 +63,106 @@ class UserMessage(models.Model):
     def __unicode__(self):
         return "%s|%s|%s" % (self.from_email, self.to_email, self.message)
 
+class UserMsgSummaryManager(models.Manager):
+    def _init_summaries(self, username, before=None):
+        """Create summaries of a user's conversations from existing messages
+        (with id less than ``before`` if given), if the user has no summary
+        yet.
+        """
+        if super(UserMsgSummaryManager, self).filter(
+            username=username).exists():
+            return
+
+        msgs = UserMessage.objects.all()
+        if before is not None:
+            msgs = msgs.filter(message_id__lt=before)
+
+        last_ids = {}
+        for peer, last_id in msgs.filter(from_email=username).values_list(
+            'to_email').annotate(Max('message_id')):
+            last_ids[peer] = last_id
+        for peer, last_id in msgs.filter(to_email=username).values_list(
+            'from_email').annotate(Max('message_id')):
+            last_ids[peer] = max(last_id, last_ids.get(peer, 0))
+        if not last_ids:
+            return
+
+        # Messages sent to oneself are never unread.
+        not_read = dict(msgs.filter(to_email=username, ifread=0).exclude(
+                from_email=username).values_list('from_email').annotate(
+                Count('message_id')))
+        last_msgs = UserMessage.objects.in_bulk(last_ids.values())
+
+        summaries = []
+        for peer, last_id in last_ids.iteritems():
+            msg = last_msgs.get(last_id)
+            if msg is None:
+                continue
+            summaries.append(self.model(username=username, peer=peer,
+                                        last_msg=msg.message,
+                                        last_time=msg.timestamp,
+                                        not_read=not_read.get(peer, 0)))
+        # Roll back to a savepoint on failure, as some databases (e.g.
+        # PostgreSQL) abort the whole transaction, like ``get_or_create``.
+        sid = transaction.savepoint(using=self.db)
+        try:
+            self.bulk_create(summaries)
+            transaction.savepoint_commit(sid, using=self.db)
+        except IntegrityError:
+            # Created by a concurrent request.
+            transaction.savepoint_rollback(sid, using=self.db)
+
+    def _update_summary(self, username, peer, msg, unread):
+        updated = super(UserMsgSummaryManager, self).filter(
+            username=username, peer=peer).update(
+            last_msg=msg.message, last_time=msg.timestamp,
+            not_read=F('not_read') + unread)
+        if updated:
+            return
+        sid = transaction.savepoint(using=self.db)
+        try:
+            self.create(username=username, peer=peer, last_msg=msg.message,
+                        last_time=msg.timestamp, not_read=unread)
+            transaction.savepoint_commit(sid, using=self.db)
+        except IntegrityError:
+            # Created by a concurrent request, update it.
+            transaction.savepoint_rollback(sid, using=self.db)
+            self._update_summary(username, peer, msg, unread)
+
+    def update_by_new_message(self, msg):
+        """Update summaries of the sender and receiver of a new message.
+        """
+        self._init_summaries(msg.from_email, before=msg.message_id)
+        self._update_summary(msg.from_email, msg.to_email, msg, 0)
+        if msg.to_email == msg.from_email:
+            # Sent to oneself, it is not unread.
+            return
+        self._init_summaries(msg.to_email, before=msg.message_id)
+        self._update_summary(msg.to_email, msg.from_email, msg, 1)
+
+    def get_summaries_by_user(self, username):
+        """List summaries of a user's conversations, latest first.
+        """
+        self._init_summaries(username)
+        return super(UserMsgSummaryManager, self).filter(
+            username=username).order_by('-last_time')
+
+class UserMsgSummary(models.Model):
+    """
+    Summary of the conversation between a user and a peer, kept up to date
+    when messages are added or read, so that listing conversations does not
+    read all messages of the user.
+    """
+    username = LowerCaseCharField(max_length=255, db_index=True)
+    peer = LowerCaseCharField(max_length=255)
+    last_msg = models.CharField(max_length=512)
+    last_time = models.DateTimeField()
+    not_read = models.IntegerField(default=0)
+    objects = UserMsgSummaryManager()
+
+    class Meta:
+        unique_together = ('username', 'peer')
+
 class UserMsgLastCheck(models.Model):
     check_time = models.DateTimeField()
 
@@ -0,0 +1,57 @@
+from django.test import TestCase
+
+from seahub.message.models import UserMessage, UserMsgSummary
+
+class UserMsgSummaryTest(TestCase):
+    def get_summary(self, username, peer):
+        return UserMsgSummary.objects.get(username=username, peer=peer)
+
+    def test_send(self):
+        UserMessage.objects.add_unread_message('a@a.com', 'b@b.com', 'hi')
+        msg = UserMessage.objects.add_unread_message('a@a.com', 'b@b.com',
+                                                     'hello')
+
+        s = self.get_summary('a@a.com', 'b@b.com')
+        self.assertEqual(s.last_msg, 'hello')
+        self.assertEqual(s.last_time, msg.timestamp)
+        self.assertEqual(s.not_read, 0)
+        s = self.get_summary('b@b.com', 'a@a.com')
+        self.assertEqual(s.last_msg, 'hello')
+        self.assertEqual(s.not_read, 2)
+
+    def test_read(self):
+        UserMessage.objects.add_unread_message('a@a.com', 'b@b.com', 'hi')
+        UserMessage.objects.add_unread_message('b@b.com', 'a@a.com', 'hi')
+        UserMessage.objects.update_unread_messages('a@a.com', 'b@b.com')
+
+        self.assertEqual(self.get_summary('b@b.com', 'a@a.com').not_read, 0)
+        self.assertEqual(self.get_summary('a@a.com', 'b@b.com').not_read, 1)
+
+    def test_send_to_self(self):
+        UserMessage.objects.add_unread_message('a@a.com', 'a@a.com', 'memo')
+
+        s = self.get_summary('a@a.com', 'a@a.com')
+        self.assertEqual(s.last_msg, 'memo')
+        self.assertEqual(s.not_read, 0)
+
+    def test_init(self):
+        # Messages saved before summaries were kept.
+        UserMessage(from_email='a@a.com', to_email='b@b.com', message='hi',
+                    ifread=0).save()
+        UserMessage(from_email='b@b.com', to_email='a@a.com', message='yes',
+                    ifread=1).save()
+        UserMessage(from_email='c@c.com', to_email='b@b.com', message='hey',
+                    ifread=0).save()
+        UserMessage(from_email='b@b.com', to_email='b@b.com', message='memo',
+                    ifread=0).save()
+
+        summaries = UserMsgSummary.objects.get_summaries_by_user('b@b.com')
+        d = dict([(s.peer, (s.last_msg, s.not_read)) for s in summaries])
+        self.assertEqual(d, {'a@a.com': ('yes', 1), 'c@c.com': ('hey', 1),
+                             'b@b.com': ('memo', 0)})
+
+        # Summaries of the receiver are created from earlier messages when
+        # a new message comes.
+        UserMessage.objects.add_unread_message('b@b.com', 'c@c.com', 'ok')
+        s = self.get_summary('c@c.com', 'b@b.com')
+        self.assertEqual((s.last_msg, s.not_read), ('ok', 1))
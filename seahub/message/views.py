@@ -30,8 +30,7 @@ def message_list(request):
     """
     username = request.user.username
 
-    messages = UserMessage.objects.get_messages_related_to_user(username)
-    msgs = msg_info_list(messages, username)
+    msgs = msg_info_list(username)
 
     total_unread = 0
     for msg in msgs:
@@ -1,11 +1,13 @@
 # encoding: utf-8
 import logging
 import string
-from datetime import datetime
-from django.core.mail import send_mail
+from datetime import datetime, timedelta
+from django.core.mail import EmailMessage
 from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
 
 from seahub.notifications.models import UserNotification
+from seahub.utils.mail import send_mails
 import seahub.settings as settings
 
 # Get an instance of a logger
@@ -35,26 +37,19 @@ class Command(BaseCommand):
         logger.info('Finish sending group notification.\n')
 
     def do_action(self):
-        today = datetime.now()
-        notifications = UserNotification.objects.all()
-        
-        d = {}
-        for e in notifications:
-            if today.year != e.timestamp.year or today.month != e.timestamp.month or \
-                    today.day != e.timestamp.day: # Only send today's notifications
-                continue
-            if d.has_key(e.to_user):
-                d[e.to_user] += 1
-            else:
-                d[e.to_user] = 1
-
-        for user,cnt in d.items():
-            template = string.Template(email_template)
-            content = template.substitute(username=user, msg_url=url, site_name=site_name)
-            try:
-                send_mail(subject, content, settings.DEFAULT_FROM_EMAIL, [user], \
-                              fail_silently=False)
-                logger.info('Succesfuuly sended email to %s' % user)
-            except Exception, e:
-                logger.error('Failed to send email to %s, error detail: %s' % (user, e))
-    
+        # Only send today's notifications.
+        today = datetime.now().replace(hour=0, minute=0, second=0,
+                                       microsecond=0)
+        to_users = UserNotification.objects.filter(
+            timestamp__gte=today, timestamp__lt=today + timedelta(days=1)).\
+            values_list('to_user').annotate(Count('id')).order_by()
+
+        template = string.Template(email_template)
+        def gen_mails():
+            for user, cnt in to_users.iterator():
+                content = template.substitute(username=user, msg_url=url,
+                                              site_name=site_name)
+                yield EmailMessage(subject, content,
+                                   settings.DEFAULT_FROM_EMAIL, [user])
+
+        send_mails(gen_mails())
@@ -1,3 +1,5 @@
 from django.conf import settings
 
-NOTIFICATION_CACHE_TIMEOUT = getattr(settings, 'NOTIFICATION_CACHE_TIMEOUT', 0)
+# Interval in seconds to check whether the primary notification is changed by
+# other processes.
+NOTIFICATION_CHECK_INTERVAL = getattr(settings, 'NOTIFICATION_CHECK_INTERVAL', 10)
@@ -1,11 +1,58 @@
+import time
+import uuid
+
 from django.core.cache import cache
 
 from seahub.notifications.models import Notification
-from seahub.notifications.settings import NOTIFICATION_CACHE_TIMEOUT
+from seahub.notifications.settings import NOTIFICATION_CHECK_INTERVAL
+
+CUR_TOPINFO_VERSION_KEY = 'CUR_TOPINFO_VERSION'
+CUR_TOPINFO_VERSION_TIMEOUT = 7 * 24 * 60 * 60
+
+# Process local snapshot of the primary notification, as a tuple of
+# (version, notification, last checked time). Replaced as a whole, so that
+# readers never see a partially updated snapshot.
+_cur_topinfo = (None, None, 0)
+
+def _load_topinfo(version):
+    global _cur_topinfo
+    notes = Notification.objects.filter(primary=1)[:1]
+    note = notes[0] if notes else None
+    _cur_topinfo = (version, note, time.time())
+    return note
+
 def refresh_cache():
     """
     Function to be called when change primary notification.
     """
-    cache.set('CUR_TOPINFO', Notification.objects.all().filter(primary=1),
-              NOTIFICATION_CACHE_TIMEOUT)
-    
+    version = uuid.uuid4().hex
+    cache.set(CUR_TOPINFO_VERSION_KEY, version, CUR_TOPINFO_VERSION_TIMEOUT)
+    _load_topinfo(version)
+
+def get_cur_topinfo():
+    """Return current primary notification or ``None``.
+
+    The notification is kept in process, and reloaded from database only
+    when its version stamp in cache is bumped by ``refresh_cache``. The
+    stamp is checked at most once every ``NOTIFICATION_CHECK_INTERVAL``
+    seconds.
+    """
+    global _cur_topinfo
+    cur_version, note, checked_at = _cur_topinfo
+    now = time.time()
+    if now - checked_at < NOTIFICATION_CHECK_INTERVAL:
+        return note
+
+    version = cache.get(CUR_TOPINFO_VERSION_KEY)
+    if version is None:
+        # Stamp is expired or evicted, start a new one.
+        cache.add(CUR_TOPINFO_VERSION_KEY, uuid.uuid4().hex,
+                  CUR_TOPINFO_VERSION_TIMEOUT)
+        version = cache.get(CUR_TOPINFO_VERSION_KEY)
+        return _load_topinfo(version)
+
+    if version != cur_version:
+        return _load_topinfo(version)
+
+    _cur_topinfo = (cur_version, note, now)
+    return note
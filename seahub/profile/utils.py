@@ -1,9 +1,14 @@
+import threading
+
 from django.core.cache import cache
 
+from seaserv import ccnet_threaded_rpc
+
 from models import Profile
-from settings import NICKNAME_CACHE_PREFIX, NICKNAME_CACHE_TIMEOUT
+from settings import NICKNAME_CACHE_PREFIX, NICKNAME_CACHE_TIMEOUT, \
+    EMAIL_ID_CACHE_PREFIX, EMAIL_ID_CACHE_TIMEOUT
 from seahub.shortcuts import get_first_object_or_none
-from seahub.utils import normalize_cache_key
+from seahub.utils import normalize_cache_key, batch_call
 
 def refresh_cache(username):
     """
@@ -14,4 +19,96 @@ def refresh_cache(username):
 
     key = normalize_cache_key(username, NICKNAME_CACHE_PREFIX)
     cache.set(key, nickname, NICKNAME_CACHE_TIMEOUT)
-    
+
+# Nicknames and user ids resolved for current request, read by
+# ``email2nickname`` and ``email2id`` template filters.
+_prefetched = threading.local()
+
+def clear_prefetched_user_info():
+    """Drop prefetched user info, called at the start and the end of each
+    request.
+    """
+    _prefetched.nicknames = {}
+    _prefetched.email_ids = {}
+
+def get_prefetched_nickname(email):
+    return getattr(_prefetched, 'nicknames', {}).get(email)
+
+def get_prefetched_email_id(email):
+    return getattr(_prefetched, 'email_ids', {}).get(email)
+
+def _get_from_cache(emails, prefix):
+    """Return a dict mapping emails to cached values, and a list of emails
+    not in cache.
+    """
+    keys = dict([(normalize_cache_key(e, prefix), e) for e in emails])
+    found = cache.get_many(keys.keys())
+    ret = {}
+    for key, value in found.items():
+        if value:
+            ret[keys[key]] = value
+    missing = [e for e in emails if e not in ret]
+    return ret, missing
+
+def prefetch_nicknames(emails):
+    """Resolve nicknames of ``emails`` in bulk for current request.
+    """
+    emails = set([e for e in emails if e])
+    if not hasattr(_prefetched, 'nicknames'):
+        clear_prefetched_user_info()
+    emails = [e for e in emails if e not in _prefetched.nicknames]
+    if not emails:
+        return
+
+    nicknames, missing = _get_from_cache(emails, NICKNAME_CACHE_PREFIX)
+    if missing:
+        profiles = Profile.objects.filter(user__in=missing)
+        profile_nicknames = dict([(p.user, p.nickname) for p in profiles])
+        to_cache = {}
+        for e in missing:
+            # A blank nickname in profile is kept, same as email2nickname.
+            if e in profile_nicknames:
+                nickname = profile_nicknames[e]
+            else:
+                nickname = e.split('@')[0]
+            nicknames[e] = nickname
+            to_cache[normalize_cache_key(e, NICKNAME_CACHE_PREFIX)] = nickname
+        cache.set_many(to_cache, NICKNAME_CACHE_TIMEOUT)
+
+    _prefetched.nicknames.update(nicknames)
+
+def _get_email_id(email):
+    emailuser = ccnet_threaded_rpc.get_emailuser(email)
+    return emailuser.id if emailuser else -1
+
+def prefetch_email_ids(emails):
+    """Resolve user ids of ``emails`` in bulk for current request.
+    """
+    emails = set([e for e in emails if e])
+    if not hasattr(_prefetched, 'email_ids'):
+        clear_prefetched_user_info()
+    emails = [e for e in emails if e not in _prefetched.email_ids]
+    if not emails:
+        return
+
+    email_ids, missing = _get_from_cache(emails, EMAIL_ID_CACHE_PREFIX)
+    if missing:
+        # ccnet has no bulk lookup, query users concurrently.
+        results = batch_call(_get_email_id, missing)
+        to_cache = {}
+        for e in missing:
+            user_id = results.get(e)
+            if user_id is None:
+                continue
+            email_ids[e] = user_id
+            to_cache[normalize_cache_key(e, EMAIL_ID_CACHE_PREFIX)] = user_id
+        cache.set_many(to_cache, EMAIL_ID_CACHE_TIMEOUT)
+
+    _prefetched.email_ids.update(email_ids)
+
+def prefetch_user_info(emails):
+    """Resolve both nicknames and user ids of ``emails`` for current request.
+    """
+    emails = list(emails)
+    prefetch_nicknames(emails)
+    prefetch_email_ids(emails)
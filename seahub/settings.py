@@ -195,6 +195,16 @@ OFFICE_PREVIEW_MAX_SIZE = 2 * 1024 * 1024
 USE_PDFJS = True
 FILE_ENCODING_LIST = ['auto', 'utf-8', 'gbk', 'ISO-8859-1', 'ISO-8859-5']
 FILE_ENCODING_TRY_LIST = ['utf-8', 'gbk']
+# Plain text files are previewed TEXT_PREVIEW_MAX_LINES lines (at most about
+# TEXT_PREVIEW_MAX_BYTES bytes) at a time.
+TEXT_PREVIEW_MAX_LINES = 1000
+TEXT_PREVIEW_MAX_BYTES = 1024 * 1024
+
+# Text diff, a plain unified diff is shown when the side by side diff is
+# larger than TEXT_DIFF_MAX_SIZE bytes or takes more than TEXT_DIFF_TIMEOUT
+# seconds.
+TEXT_DIFF_MAX_SIZE = 2 * 1024 * 1024
+TEXT_DIFF_TIMEOUT = 5
 
 # Avatar
 AVATAR_STORAGE_DIR = 'avatars'
@@ -226,8 +236,32 @@ if 'win32' in sys.platform:
         CACHE_DIR = os.path.join(CCNET_CONF_PATH, '..')
         install_topdir = os.path.join(CCNET_CONF_PATH, '..')
 
+# A per-process LRU in front of a shared cache. For multi-process
+# deployments, memcached is recommended as the shared cache.
 CACHES = {
     'default': {
+        'BACKEND': 'seahub.base.tiered_cache.TieredCache',
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'LOCAL_MAX_ENTRIES': 10000,
+            'LOCAL_TIMEOUT': 60,
+            'LOCAL_PREFIX_TIMEOUTS': {
+                # Commit objects never change.
+                'COMMIT_': 24 * 60 * 60,
+                # Changed by admin at any time.
+                'CUR_TOPINFO': 10,
+                # Revoked tokens must stop working in every process at
+                # once, 0 skips the local tier.
+                'API_TOKEN_': 0,
+                # Counters of SlidingWindowRateThrottle.
+                'throtte_': 0,
+                # Failed login counters (LOGIN_ATTEMPT_PREFIX), shared by all
+                # processes.
+                'UserLoginAttempt_': 0,
+            },
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
         'LOCATION': os.path.join(CACHE_DIR, 'seahub_cache'),
         'OPTIONS': {
@@ -239,8 +273,8 @@ CACHES = {
 # rest_framwork
 REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'rest_framework.throttling.AnonSlidingWindowRateThrottle',
+        'rest_framework.throttling.UserSlidingWindowRateThrottle',
     ),
     'DEFAULT_THROTTLE_RATES': {
         'anon': '5/minute',
@@ -0,0 +1,91 @@
+import logging
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from pysearpc import SearpcError
+from seaserv import get_repo
+from seahub.share.models import FileShare, UploadLinkShare
+from seahub.utils import batch_call, get_cached_commit
+from seahub.utils.repo import DirTree
+
+logger = logging.getLogger(__name__)
+
+def get_repo_and_head(repo_id):
+    """Return repo and its head commit, or ``None`` if failed to get them.
+    """
+    try:
+        repo = get_repo(repo_id)
+        if not repo or not repo.head_cmmt_id:
+            return repo, None
+        return repo, get_cached_commit(repo.head_cmmt_id)
+    except SearpcError, e:
+        logger.error(e)
+        return None
+
+class Command(NoArgsCommand):
+    help = "Remove shared links and upload links whose library, file or " + \
+        "directory no longer exists."
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int', default=100,
+            help='Number of libraries to check in one batch.'),
+    )
+
+    def handle_noargs(self, **options):
+        batch_size = options.get('batch_size') or 100
+        repo_ids = set(FileShare.objects.values_list('repo_id', flat=True))
+        repo_ids.update(UploadLinkShare.objects.values_list('repo_id', flat=True))
+        repo_ids = sorted(repo_ids)
+
+        checked = removed = 0
+        for i in xrange(0, len(repo_ids), batch_size):
+            batch = repo_ids[i:i + batch_size]
+            repos = batch_call(get_repo_and_head, batch)
+            for repo_id in batch:
+                if repos.get(repo_id) is None:
+                    logger.warning('Failed to get repo %s.' % repo_id)
+                    continue
+                repo, head = repos[repo_id]
+                if repo and not head:
+                    # Can't tell whether the links are valid, keep them.
+                    logger.warning('No head commit found for repo %s.' % repo_id)
+                    continue
+                c, r = self.clean_repo_links(repo_id, head)
+                checked += c
+                removed += r
+
+        print "Checked %d links, removed %d invalid links." % (checked, removed)
+
+    def clean_repo_links(self, repo_id, head):
+        """Check links of a repo against its head commit, and delete invalid
+        ones. ``head`` is ``None`` if the repo does not exist.
+        """
+        dir_tree = DirTree(head) if head else None
+        invalid_fs, invalid_ul = [], []
+        fileshares = FileShare.objects.filter(repo_id=repo_id)
+        uploadlinks = UploadLinkShare.objects.filter(repo_id=repo_id)
+
+        for fs in fileshares:
+            if dir_tree is None:
+                invalid_fs.append(fs.id)
+            elif fs.s_type == 'f':
+                if dir_tree.get_file_id(fs.path) is None:
+                    invalid_fs.append(fs.id)
+            elif dir_tree.get_dir_id(fs.path) is None:
+                invalid_fs.append(fs.id)
+
+        for link in uploadlinks:
+            if dir_tree is None or dir_tree.get_dir_id(link.path) is None:
+                invalid_ul.append(link.id)
+
+        if dir_tree is not None and dir_tree.has_error:
+            logger.warning('Failed to list dirs of repo %s.' % repo_id)
+            return (len(fileshares) + len(uploadlinks), 0)
+
+        if invalid_fs:
+            FileShare.objects.filter(id__in=invalid_fs).delete()
+        if invalid_ul:
+            UploadLinkShare.objects.filter(id__in=invalid_ul).delete()
+        return (len(fileshares) + len(uploadlinks),
+                len(invalid_fs) + len(invalid_ul))
@@ -36,7 +36,8 @@ from seahub.signals import share_file_to_user_successful
 from seahub.views import validate_owner, is_registered_user
 from seahub.utils import render_permission_error, string2list, render_error, \
     gen_token, gen_shared_link, gen_shared_upload_link, gen_dir_share_link, \
-    gen_file_share_link, IS_EMAIL_CONFIGURED, check_filename_with_rename
+    gen_file_share_link, IS_EMAIL_CONFIGURED, check_filename_with_rename, \
+    batch_call
 
 try:
     from seahub.settings import CLOUD_MODE
@@ -365,64 +366,99 @@ def list_share_out_repos(request):
             "shared_repos": shared_repos,
             }, context_instance=RequestContext(request))
 
+def get_page_params(request):
+    try:
+        current_page = int(request.GET.get('page', '1'))
+        per_page = int(request.GET.get('per_page', '25'))
+    except ValueError:
+        current_page = 1
+        per_page = 25
+    return max(current_page, 1), max(per_page, 1)
+
+def get_personal_repos(repo_ids):
+    """Return a dict mapping repo id to repo of personal repos in
+    ``repo_ids``.
+    """
+    repo_ids = set(repo_ids)
+    personal = batch_call(is_personal_repo, repo_ids)
+    repos = batch_call(seafile_api.get_repo,
+                       [x for x in repo_ids if personal.get(x)])
+    return dict([(k, v) for k, v in repos.items() if v])
+
 @login_required
 def list_shared_links(request):
-    """List share links, and remove invalid links(file/dir is deleted or moved).
+    """List share links.
+
+    Invalid links (file/dir is deleted or moved) are removed by the
+    ``clean_share_links`` command.
     """
     username = request.user.username
 
-    fileshares = FileShare.objects.filter(username=username)
+    current_page, per_page = get_page_params(request)
+    start = per_page * (current_page - 1)
+    fileshares = list(FileShare.objects.filter(username=username).order_by(
+            '-ctime')[start:start + per_page + 1])
+    page_next = len(fileshares) == per_page + 1
+    fileshares = fileshares[:per_page]
+
+    repos = get_personal_repos([fs.repo_id for fs in fileshares])
     p_fileshares = []           # personal file share
     for fs in fileshares:
-        if is_personal_repo(fs.repo_id):  # only list files in personal repos
-            r = seafile_api.get_repo(fs.repo_id)
-            if not r:
-                fs.delete()
-                continue
-
-            if fs.s_type == 'f':
-                if seafile_api.get_file_id_by_path(r.id, fs.path) is None:
-                    fs.delete()
-                    continue
-                fs.filename = os.path.basename(fs.path)
-                fs.shared_link = gen_file_share_link(fs.token) 
-            else:
-                if seafile_api.get_dir_id_by_path(r.id, fs.path) is None:
-                    fs.delete()
-                    continue
-                fs.filename = os.path.basename(fs.path.rstrip('/'))
-                fs.shared_link = gen_dir_share_link(fs.token)
-            fs.repo = r
-            p_fileshares.append(fs)
+        r = repos.get(fs.repo_id)
+        if not r:  # only list files in personal repos
+            continue
+        if fs.s_type == 'f':
+            fs.filename = os.path.basename(fs.path)
+            fs.shared_link = gen_file_share_link(fs.token)
+        else:
+            fs.filename = os.path.basename(fs.path.rstrip('/'))
+            fs.shared_link = gen_dir_share_link(fs.token)
+        fs.repo = r
+        p_fileshares.append(fs)
     
     return render_to_response('repo/shared_links.html', {
             "fileshares": p_fileshares,
+            'current_page': current_page,
+            'prev_page': current_page-1,
+            'next_page': current_page+1,
+            'per_page': per_page,
+            'page_next': page_next,
             }, context_instance=RequestContext(request))
 
 @login_required
 def list_shared_upload_links(request):
-    """List upload links, and remove invalid links(dir is deleted or moved).
+    """List upload links.
+
+    Invalid links (dir is deleted or moved) are removed by the
+    ``clean_share_links`` command.
     """
     username = request.user.username
 
-    uploadlinks = UploadLinkShare.objects.filter(username=username)
+    current_page, per_page = get_page_params(request)
+    start = per_page * (current_page - 1)
+    uploadlinks = list(UploadLinkShare.objects.filter(
+            username=username).order_by('-ctime')[start:start + per_page + 1])
+    page_next = len(uploadlinks) == per_page + 1
+    uploadlinks = uploadlinks[:per_page]
+
+    repos = get_personal_repos([link.repo_id for link in uploadlinks])
     p_uploadlinks = []
     for link in uploadlinks:
-        if is_personal_repo(link.repo_id):
-            r = seafile_api.get_repo(link.repo_id)
-            if not r:
-                link.delete()
-                continue
-            if seafile_api.get_dir_id_by_path(r.id, link.path) is None:
-                link.delete()
-                continue
-            link.dir_name = os.path.basename(link.path.rstrip('/'))
-            link.shared_link = gen_shared_upload_link(link.token)
-            link.repo = r
-            p_uploadlinks.append(link)
+        r = repos.get(link.repo_id)
+        if not r:
+            continue
+        link.dir_name = os.path.basename(link.path.rstrip('/'))
+        link.shared_link = gen_shared_upload_link(link.token)
+        link.repo = r
+        p_uploadlinks.append(link)
 
     return render_to_response('repo/shared_upload_links.html', {
             "uploadlinks": p_uploadlinks,
+            'current_page': current_page,
+            'prev_page': current_page-1,
+            'next_page': current_page+1,
+            'per_page': per_page,
+            'page_next': page_next,
             }, context_instance=RequestContext(request))
 
 @login_required
@@ -5,3 +5,6 @@ repo_created = django.dispatch.Signal(providing_args=["org_id", "creator", "repo
 repo_deleted = django.dispatch.Signal(providing_args=["org_id", "usernames", "repo_owner", "repo_id", "repo_name"])
 
 share_file_to_user_successful = django.dispatch.Signal(providing_args=["priv_share_obj"])
+
+# Sent when a user is saved (e.g. activated or deactivated) or deleted.
+user_changed = django.dispatch.Signal(providing_args=["username"])
@@ -1,6 +1,7 @@
 # encoding: utf-8
 import os
 import re
+import stat
 import urllib2
 import uuid
 import logging
@@ -8,22 +9,28 @@ import hashlib
 import json
 import tempfile
 import locale
+import threading
 import ConfigParser
 from datetime import datetime
+from multiprocessing.pool import ThreadPool
 from urlparse import urlparse
 
 import ccnet
 
+from django.core.cache import cache
+from django.core.signals import request_finished
 from django.core.urlresolvers import reverse
 from django.contrib.sites.models import RequestSite
-from django.db import IntegrityError
+from django.db import transaction, IntegrityError
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 from django.utils.translation import ugettext as _
 from django.http import HttpResponseRedirect, HttpResponse
+from django.utils import timezone
 from django.utils.http import urlquote
 
 from htmldiff import HtmlDiff
+from seahub.base.lru import LRUCache
 
 from pysearpc import SearpcError
 from seaserv import seafile_api
@@ -61,6 +68,9 @@ logger = logging.getLogger(__name__)
 EMPTY_SHA1 = '0000000000000000000000000000000000000000'
 MAX_INT = 2147483647 
 
+# Number of threads of the pool shared by requests to fan out RPCs.
+BATCH_CALL_MAX_WORKERS = getattr(seahub.settings, 'BATCH_CALL_MAX_WORKERS', 8)
+
 PREVIEW_FILEEXT = {
     TEXT: ('ac', 'am', 'bat', 'c', 'cc', 'cmake', 'cpp', 'cs', 'css', 'diff', 'el', 'h', 'html', 'htm', 'java', 'js', 'json', 'less', 'make', 'org', 'php', 'pl', 'properties', 'py', 'rb', 'scala', 'script', 'sh', 'sql', 'txt', 'text', 'tex', 'vi', 'vim', 'xhtml', 'xml', 'log', 'csv', 'groovy', 'rst', 'patch', 'go'),
     IMAGE: ('gif', 'jpeg', 'jpg', 'png', 'ico'),
@@ -173,6 +183,58 @@ def normalize_cache_key(value, prefix=None):
     key = value if prefix is None else prefix + value
     return urlquote(key)
     
+_batch_pool = None
+_batch_pool_pid = None
+_batch_pool_lock = threading.Lock()
+_in_batch_worker = threading.local()
+
+def _get_batch_pool():
+    """Return the thread pool shared by ``batch_call``, created on first use.
+
+    The pool lives as long as the process, so calls don't pay for starting
+    and joining threads. A forked child creates its own pool, as threads
+    are not inherited.
+    """
+    global _batch_pool, _batch_pool_pid
+    with _batch_pool_lock:
+        if _batch_pool is None or _batch_pool_pid != os.getpid():
+            _batch_pool = ThreadPool(BATCH_CALL_MAX_WORKERS)
+            _batch_pool_pid = os.getpid()
+        return _batch_pool
+
+def _batch_worker_call(func, arg):
+    _in_batch_worker.active = True
+    try:
+        return func(arg)
+    finally:
+        _in_batch_worker.active = False
+
+def batch_call(func, args_list):
+    """Call ``func`` with each element of ``args_list`` and return a dict
+    mapping the element to the result.
+
+    Duplicated elements are called only once. Calls are made on a shared
+    thread pool, so ``func`` must only use thread safe RPC clients
+    (e.g. ``seafserv_threaded_rpc``). If a call raises an exception, it is
+    raised to the caller, the same as calling ``func`` in a loop.
+    """
+    seen = set()
+    uniq_args = []
+    for arg in args_list:
+        if arg not in seen:
+            seen.add(arg)
+            uniq_args.append(arg)
+
+    # Nested calls from a worker run serially, waiting on the shared pool
+    # from inside it may deadlock.
+    if len(uniq_args) <= 1 or BATCH_CALL_MAX_WORKERS <= 1 or \
+            getattr(_in_batch_worker, 'active', False):
+        return dict([(arg, func(arg)) for arg in uniq_args])
+
+    results = _get_batch_pool().map(lambda arg: _batch_worker_call(func, arg),
+                                    uniq_args)
+    return dict(zip(uniq_args, results))
+
 def validate_group_name(group_name):
     """
     Check whether group name is valid.
@@ -181,6 +243,118 @@ def validate_group_name(group_name):
     """
     return re.match('^\w+$', group_name, re.U)
 
+# Commit objects are immutable, so cached commits never become stale.
+COMMIT_CACHE_PREFIX = 'COMMIT_'
+COMMIT_CACHE_TIMEOUT = getattr(seahub.settings, 'COMMIT_CACHE_TIMEOUT',
+                               7 * 24 * 60 * 60)
+_commit_lru = LRUCache(getattr(seahub.settings, 'COMMIT_LRU_CACHE_ENTRIES',
+                               10000))
+_commit_cache_stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+_commit_cache_stats_lock = threading.Lock()
+
+# Fields of commit objects kept in the commit cache. Commit objects got from
+# seaf-server can't be pickled, so only these fields are cached.
+COMMIT_FIELDS = ('id', 'repo_id', 'root_id', 'parent_id', 'second_parent_id',
+                 'creator', 'creator_name', 'desc', 'ctime', 'repo_name',
+                 'encrypted', 'enc_version', 'magic', 'random_key', 'version',
+                 'conflict', 'new_merge', 'no_local_history', 'device_name')
+
+class CachedCommit(object):
+    """A commit rebuilt from the fields in the commit cache.
+    """
+    def __init__(self, fields):
+        self.__dict__.update(fields)
+
+    @property
+    def props(self):
+        # Fields of seaserv objects can also be read from ``props``.
+        return self
+
+def commit_to_dict(commit):
+    fields = {}
+    for name in COMMIT_FIELDS:
+        try:
+            fields[name] = getattr(commit, name)
+        except Exception:
+            fields[name] = None
+    return fields
+
+def get_commit_cache_stats():
+    """Return hit/miss counters of the commit cache in current process.
+
+    ``local_hits`` are served by the in-process LRU, ``shared_hits`` by the
+    Django cache, ``misses`` need a seaf-server RPC.
+    """
+    with _commit_cache_stats_lock:
+        return dict(_commit_cache_stats)
+
+def _count_commit_cache(local_hits, shared_hits=0, misses=0):
+    # Commits are also looked up from ``batch_call`` workers.
+    with _commit_cache_stats_lock:
+        _commit_cache_stats['local_hits'] += local_hits
+        _commit_cache_stats['shared_hits'] += shared_hits
+        _commit_cache_stats['misses'] += misses
+
+def cache_commits(commits):
+    """Put commits got from seaf-server into the commit cache.
+    """
+    to_set = {}
+    for c in commits:
+        if c is None:
+            continue
+        fields = commit_to_dict(c)
+        _commit_lru.set(c.id, fields)
+        to_set[COMMIT_CACHE_PREFIX + c.id] = fields
+    if to_set:
+        cache.set_many(to_set, COMMIT_CACHE_TIMEOUT)
+
+def get_cached_commits(commit_ids):
+    """Get commit objects by ids, look up in-process LRU first, then the
+    shared Django cache, and finally seaf-server.
+
+    Returns:
+        A dict mapping commit id to ``CachedCommit``. Commits that can not be
+        found are not included.
+    """
+    ret = {}
+    missing = []
+    for commit_id in commit_ids:
+        if not commit_id or commit_id in ret or commit_id in missing:
+            continue
+        fields = _commit_lru.get(commit_id)
+        if fields is not None:
+            ret[commit_id] = CachedCommit(fields)
+        else:
+            missing.append(commit_id)
+    local_hits = len(ret)
+
+    if not missing:
+        _count_commit_cache(local_hits)
+        return ret
+
+    found = cache.get_many([COMMIT_CACHE_PREFIX + x for x in missing])
+    _count_commit_cache(local_hits, len(found), len(missing) - len(found))
+    fetched = []
+    for commit_id in missing:
+        fields = found.get(COMMIT_CACHE_PREFIX + commit_id)
+        if fields is not None:
+            _commit_lru.set(commit_id, fields)
+        else:
+            commit = seafserv_threaded_rpc.get_commit(commit_id)
+            if commit is None:
+                continue
+            fetched.append(commit)
+            fields = commit_to_dict(commit)
+        ret[commit_id] = CachedCommit(fields)
+    cache_commits(fetched)
+
+    return ret
+
+def get_cached_commit(commit_id):
+    """Get a commit object by id through the commit cache.
+    """
+    return get_cached_commits([commit_id]).get(commit_id)
+
 def get_repo_last_modify(repo):
     """ Get last modification time for a repo.
 
@@ -189,7 +363,7 @@ def get_repo_last_modify(repo):
     consuming.
     """
     if repo.head_cmmt_id is not None:
-        last_cmmt = seafserv_threaded_rpc.get_commit(repo.head_cmmt_id)
+        last_cmmt = get_cached_commit(repo.head_cmmt_id)
     else:
         logger.info('[repo %s] head_cmmt_id is missing.' % repo.id)
         last_cmmt = get_commits(repo.id, 0, 1)[0]
@@ -198,8 +372,14 @@ def get_repo_last_modify(repo):
 def calculate_repos_last_modify(repo_list):
     """ Get last modification time for repos.
     """
+    head_commits = get_cached_commits([r.head_cmmt_id for r in repo_list
+                                       if r.head_cmmt_id is not None])
     for repo in repo_list:
-        repo.latest_modify = get_repo_last_modify(repo)
+        if repo.head_cmmt_id is not None:
+            last_cmmt = head_commits.get(repo.head_cmmt_id)
+            repo.latest_modify = last_cmmt.ctime if last_cmmt else 0
+        else:
+            repo.latest_modify = get_repo_last_modify(repo)
 
 def normalize_dir_path(path):
     """Add '/' at the end of directory path if necessary.
@@ -407,19 +587,30 @@ def check_and_get_org_by_group(group_id, user):
     
     return org, base_template
 
-def calc_file_last_modified(repo_id, file_path, file_path_hash, file_id):
-    """Calculate file last modification time, and save to db.
+def _get_file_last_revision_info(args):
+    """Return creator and ctime of the latest revision of a file,
+    ``('', 0)`` if not found, or ``None`` on error.
     """
+    repo_id, file_path = args
     try:
-        # get the lastest one file revision
-        commits = seafserv_threaded_rpc.list_file_revisions(repo_id, file_path, 1, -1)
+        commits = seafserv_threaded_rpc.list_file_revisions(repo_id, file_path,
+                                                            1, -1)
     except SearpcError, e:
-        return '', 0
+        logger.error(e)
+        return None
 
     if not commits:
         return '', 0
 
-    email, last_modified = commits[0].creator_name, commits[0].ctime
+    return commits[0].creator_name, commits[0].ctime
+
+def calc_file_last_modified(repo_id, file_path, file_path_hash, file_id):
+    """Calculate file last modification time, and save to db.
+    """
+    email, last_modified = _get_file_last_revision_info(
+        (repo_id, file_path)) or ('', 0)
+    if not last_modified:
+        return '', 0
 
     info = FileLastModifiedInfo(repo_id=repo_id,
                                 file_path=file_path,
@@ -575,49 +766,104 @@ def get_files_last_modified(files_list):
         }
     
     """
-    filepath_hash_set = set()
-    ret_dict = {}
-
-    for e in files_list:
-        repo_id, file_path, file_id = e
-        path_hash = calc_file_path_hash(file_path)
-        filepath_hash_set.add(path_hash)
+    # Index cached records on (repo_id, file_path), so that each file is
+    # matched in constant time.
+    path_hashes = set()
+    repo_ids = set()
+    for repo_id, file_path, file_id in files_list:
+        path_hashes.add(calc_file_path_hash(file_path))
+        repo_ids.add(repo_id)
 
     m_infos = FileLastModifiedInfo.objects.filter(
-        file_path_hash__in=list(filepath_hash_set))
-    for f in files_list:
-        repo_id, file_path, file_id = f
-        for info in m_infos:
-            if repo_id == info.repo_id and file_path == info.file_path:
-                # Got the record in db
-                ret_key = '|'.join(f)
-                if file_id != info.file_id:
-                    # record is outdated, need re-calculate
-                    info.delete()
-                    email, last_modified = calc_file_last_modified(
-                        info.repo_id, info.file_path, info.file_path_hash,
-                        file_id)
-                    ret_dict[ret_key] = last_modified
-                    continue
-                else:
-                    # record is valid
-                    ret_dict[ret_key] = info.last_modified
-                    continue
+        repo_id__in=list(repo_ids), file_path_hash__in=list(path_hashes))
+    infos_index = {}
+    for info in m_infos:
+        infos_index[(info.repo_id, info.file_path)] = info
 
-    # Process the remaining files.
+    ret_dict = {}
+    to_calc = {}                # (repo_id, file_path) -> file_id
+    outdated_ids = []
     for f in files_list:
-        ret_key = '|'.join(f)
-        if ret_dict.has_key(ret_key):
+        repo_id, file_path, file_id = f
+        info = infos_index.get((repo_id, file_path))
+        if info is not None and info.file_id == file_id:
+            # record is valid
+            ret_dict['|'.join(f)] = info.last_modified
             continue
+        if info is not None:
+            # record is outdated, need re-calculate
+            outdated_ids.append(info.id)
+        to_calc[(repo_id, file_path)] = file_id
+
+    if not to_calc:
+        return ret_dict
+
+    # Re-calculate outdated and missing records concurrently.
+    results = batch_call(_get_file_last_revision_info, to_calc.keys())
+
+    new_infos = []
+    for key, file_id in to_calc.items():
+        repo_id, file_path = key
+        email, last_modified = results.get(key) or ('', 0)
+        ret_dict['|'.join((repo_id, file_path, file_id))] = last_modified
+        if not last_modified:
+            continue
+        new_infos.append(FileLastModifiedInfo(
+                repo_id=repo_id, file_path=file_path,
+                file_path_hash=calc_file_path_hash(file_path),
+                file_id=file_id, last_modified=last_modified, email=email))
+
+    if outdated_ids:
+        FileLastModifiedInfo.objects.filter(id__in=outdated_ids).delete()
+    # Roll back to a savepoint on failure, as some databases (e.g.
+    # PostgreSQL) abort the whole transaction.
+    sid = transaction.savepoint()
+    try:
+        FileLastModifiedInfo.objects.bulk_create(new_infos)
+        transaction.savepoint_commit(sid)
+    except IntegrityError, e:
+        # Records inserted by a concurrent request, skip this step.
+        transaction.savepoint_rollback(sid)
+        logger.warn(e)
 
-        repo_id, file_path, file_id = f
-        path_hash = calc_file_path_hash(file_path)
-        email, last_modified = calc_file_last_modified(
-            repo_id, file_path, path_hash, file_id)
-        ret_dict[ret_key] = last_modified
-        
     return ret_dict
-    
+
+def group_events_data(events):
+    """
+    Group events according to the date.
+    """
+    event_groups = []
+    for e in events:
+        if e.etype == 'repo-update':
+            e.time = datetime.fromtimestamp(int(e.commit.ctime)) # e.commit.ctime is a timestamp
+            e.author = e.commit.creator_name
+        else:
+            # e.timestamp is a datetime.datetime in UTC
+            # change from UTC timezone to current seahub timezone
+            def utc_to_local(dt):
+                tz = timezone.get_default_timezone()
+                utc = dt.replace(tzinfo=timezone.utc)
+                local = timezone.make_naive(utc, tz)
+                return local
+
+            e.time = utc_to_local(e.timestamp)
+            if e.etype == 'repo-create':
+                e.author = e.creator
+            else:
+                e.author = e.repo_owner
+        e.date = (e.time).strftime("%Y-%m-%d")
+        
+        if len(event_groups) == 0 or \
+            len(event_groups) > 0 and e.date != event_groups[-1]['date']:
+            event_group = {}
+            event_group['date'] = e.date
+            event_group['events'] = [e]
+            event_groups.append(event_group)
+        else:
+            event_groups[-1]['events'].append(e)
+
+    return event_groups
+
 # events related    
 if EVENTS_CONFIG_FILE:
     import seafevents
@@ -625,88 +871,124 @@ if EVENTS_CONFIG_FILE:
     EVENTS_ENABLED = True
     SeafEventsSession = seafevents.init_db_session_class(EVENTS_CONFIG_FILE)
 
-    def _same_events(e1, e2):
-        """Two events are equal should follow two rules:
-        1. event1.username = event2.username
-        2. event1.commit.desc = event2.commit.desc
-        """
-        if e1.username != e2.username:
-            return False
-        else:
-            if hasattr(e1, 'commit') and hasattr(e2, 'commit'):
-                if e1.commit.desc == e2.commit.desc:
-                    return True
-            return False
+    # Uuids of events of deleted repos, deleted in batch after the request
+    # that found them is finished, see ``_delete_stale_events``.
+    _stale_event_uuids = set()
+    _stale_event_lock = threading.Lock()
 
-    def _get_events(username, start, count, org_id=None):
-        ev_session = SeafEventsSession()
+    def _delete_stale_events(**kwargs):
+        with _stale_event_lock:
+            if not _stale_event_uuids:
+                return
+            uuids = list(_stale_event_uuids)
+            _stale_event_uuids.clear()
 
-        valid_events = []
-        total_used = 0
+        ev_session = SeafEventsSession()
         try:
-            next_start = start
-            while True:
-                events = _get_events_inner(ev_session, username, next_start, count)
-                if not events:
-                    break
-                
-                for e1 in events:
-                    duplicate = False
-                    for e2 in valid_events:
-                        if _same_events(e1, e2): duplicate = True; break
-                    if not duplicate:
-                        valid_events.append(e1)
-                    total_used = total_used + 1
-                    if len(valid_events) == count:
-                        break
-                
-                if len(valid_events) == count:
-                    break
-                next_start = next_start + len(events)
+            for ev_uuid in uuids:
+                seafevents.delete_event(ev_session, ev_uuid)
+        except Exception, e:
+            logger.error(e)
         finally:
             ev_session.close()
+    request_finished.connect(_delete_stale_events)
+
+    def _prefetch_events(events, username, repos):
+        """Set ``repo`` and ``commit`` of repo-update events in one batch.
 
-        for e in valid_events:            # parse commit description
+        ``repos`` is a dict mapping repo id to repo (``None`` if the repo has
+        been deleted), repos not in it are fetched and added to it.
+        """
+        update_events = [e for e in events if e.etype == 'repo-update']
+        repo_ids = [e.repo_id for e in update_events if e.repo_id not in repos]
+        new_repos = batch_call(get_repo, repo_ids)
+        for repo in new_repos.values():
+            # ``seafserv_rpc`` is not thread safe, ask for each repo once.
+            if repo and repo.encrypted:
+                repo.password_set = seafserv_rpc.is_passwd_set(repo.id,
+                                                                username)
+        repos.update(new_repos)
+
+        commits = get_cached_commits([e.commit_id for e in update_events
+                                      if repos.get(e.repo_id)])
+        for e in update_events:
+            e.repo = repos.get(e.repo_id)
+            e.commit = commits.get(e.commit_id)
+
+    def _filter_events(events, username, repos, seen, valid_events,
+                       count=None):
+        """Append valid and not duplicated events of ``events`` to
+        ``valid_events``, until it has ``count`` events.
+
+        Two events are duplicated if they have the same username and commit
+        description, ``seen`` is the set of such keys of accepted events.
+        Events of deleted repos are queued for deletion.
+
+        Returns the number of events used, not counting events of deleted
+        repos.
+        """
+        _prefetch_events(events, username, repos)
+
+        used = 0
+        stale_uuids = []
+        for ev in events:
+            if count is not None and len(valid_events) >= count:
+                break
+            if ev.etype == 'repo-update':
+                if not ev.repo:
+                    stale_uuids.append(ev.uuid)
+                    continue
+                used += 1
+                if not ev.commit:
+                    continue
+                key = (ev.username, ev.commit.desc)
+                if key in seen:
+                    continue
+                seen.add(key)
+            else:
+                used += 1
+            valid_events.append(ev)
+
+        if stale_uuids:
+            with _stale_event_lock:
+                _stale_event_uuids.update(stale_uuids)
+        return used
+
+    def _parse_events_desc(events):
+        for e in events:            # parse commit description
             if hasattr(e, 'commit'):
                 e.commit.converted_cmmt_desc = convert_cmmt_desc_link(e.commit)
                 e.commit.more_files = more_files_in_commit(e.commit)
-        return valid_events, start + total_used
 
-    def _get_events_inner(ev_session, username, start, limit):
-        '''Read events from seafevents database, and remove events that are
-        no longer valid
+    def _get_events(username, start, count, org_id=None):
+        '''Read events from seafevents database, skip duplicated events
+        and events that are no longer valid.
 
-        Return 'limit' events or less than 'limit' events if no more events remain
+        Events of deleted repos are deleted after the request.
         '''
-        valid_events = []
-        next_start = start
-        while True:
-            events = seafevents.get_user_events(ev_session, username,
-                                                next_start, limit)
-            if not events:
-                break
-
-            for ev in events:
-                if ev.etype == 'repo-update':
-                    repo = get_repo(ev.repo_id)
-                    if not repo:
-                        # delete the update event for repo which has been deleted
-                        seafevents.delete_event(ev_session, ev.uuid)
-                        continue
-                    if repo.encrypted:
-                        repo.password_set = seafserv_rpc.is_passwd_set(repo.id, username)
-                    ev.repo = repo
-                    ev.commit = seafserv_threaded_rpc.get_commit(ev.commit_id)
+        ev_session = SeafEventsSession()
 
-                valid_events.append(ev)
-                if len(valid_events) == limit:
+        valid_events = []
+        seen = set()
+        repos = {}
+        total_used = 0
+        try:
+            # Offset in the database, events of deleted repos are counted
+            # since they are not deleted yet.
+            offset = start
+            while len(valid_events) < count:
+                events = seafevents.get_user_events(ev_session, username,
+                                                    offset, count)
+                if not events:
                     break
+                offset += len(events)
+                total_used += _filter_events(events, username, repos, seen,
+                                             valid_events, count)
+        finally:
+            ev_session.close()
 
-            if len(valid_events) == limit:
-                break            
-            next_start = next_start + len(valid_events)
-
-        return valid_events
+        _parse_events_desc(valid_events)
+        return valid_events, start + total_used
 
     def get_user_events(username, start, count):
         """Return user events list and a new start.
@@ -722,12 +1004,206 @@ if EVENTS_CONFIG_FILE:
     def get_org_user_events(org_id, username, start, count):
         return _get_events(username, start, count, org_id=org_id)
 
+    # Events feed pages of a user are cached, until a new event comes, or at
+    # most EVENTS_CACHE_TIMEOUT seconds since they may refer to repos which
+    # are deleted or unshared later.
+    EVENTS_CACHE_PREFIX = 'EVENTS_'
+    EVENTS_CACHE_TIMEOUT = getattr(seahub.settings, 'EVENTS_CACHE_TIMEOUT',
+                                   60 * 60)
+    # Rebuild the cache instead of merging new events into it, if more events
+    # than this are added since it's built.
+    EVENTS_CACHE_MAX_NEW = getattr(seahub.settings, 'EVENTS_CACHE_MAX_NEW', 50)
+
+    # Fields of events kept in the events cache. Repos and commits of events
+    # can't be pickled, they are looked up again when a page is read.
+    EVENT_FIELDS = ('uuid', 'etype', 'timestamp', 'username', 'repo_id',
+                    'commit_id', 'repo_name', 'creator', 'repo_owner')
+
+    class CachedEvent(object):
+        def __init__(self, fields):
+            self.__dict__.update(fields)
+
+    def _dump_events(events):
+        ret = []
+        for e in events:
+            d = dict([(f, getattr(e, f, None)) for f in EVENT_FIELDS])
+            if e.etype == 'repo-update':
+                d['converted_cmmt_desc'] = e.commit.converted_cmmt_desc
+                d['more_files'] = e.commit.more_files
+            ret.append(d)
+        return ret
+
+    def _load_events(data, username):
+        """Rebuild events dumped by ``_dump_events``, and set their repos and
+        commits. Events whose repo or commit is gone since are dropped.
+        """
+        events = [CachedEvent(d) for d in data]
+        _prefetch_events(events, username, {})
+        ret = []
+        for e in events:
+            if e.etype == 'repo-update':
+                if not e.repo or not e.commit:
+                    continue
+                e.commit.converted_cmmt_desc = e.converted_cmmt_desc
+                e.commit.more_files = e.more_files
+            ret.append(e)
+        return ret
+
+    def _events_cache_key(username, name):
+        return normalize_cache_key(username,
+                                   '%s%s_' % (EVENTS_CACHE_PREFIX, name))
+
+    def _events_page_key(username, feed, start):
+        # Pages are keyed by start in the feed when it was built, which is
+        # start in the database minus the number of events added since.
+        return _events_cache_key(username, '%s_%d' % (
+                feed['epoch'], start - feed['shift']))
+
+    def _refresh_events_feed(ev_session, username, feed, head, count):
+        """Update cached feed info ``feed`` to the newest event ``head``.
+
+        Only events newer than the cached head are read, and merged into the
+        cached first page.  Returns the updated feed info, or ``None`` if the
+        cache should be rebuilt.
+        """
+        if not feed['head'] or not head:
+            return None
+        events = seafevents.get_user_events(ev_session, username, 0,
+                                            EVENTS_CACHE_MAX_NEW + 1)
+        uuids = [e.uuid for e in events]
+        if feed['head'] not in uuids:
+            return None
+        new_events = events[:uuids.index(feed['head'])]
+
+        top_key = _events_page_key(username, feed, feed['top'] + feed['shift'])
+        top_page = cache.get(top_key)
+        old_events = []
+        if top_page is not None:
+            old_events = _load_events(top_page['events'], username)
+        seen = set([(e.username, e.commit.desc) for e in old_events
+                    if e.etype == 'repo-update'])
+
+        valid_events = []
+        used = _filter_events(new_events, username, {}, seen, valid_events)
+        _parse_events_desc(valid_events)
+
+        feed = dict(feed, head=head, shift=feed['shift'] + used)
+        if top_page is not None:
+            events = valid_events + old_events
+            if len(events) > count + EVENTS_CACHE_MAX_NEW:
+                return None
+            top_page['events'] = _dump_events(events)
+            cache.set(_events_page_key(username, feed, 0), top_page,
+                      EVENTS_CACHE_TIMEOUT)
+            feed['top'] = -feed['shift']
+        return feed
+
+    def get_user_events_page(username, start, count, org_id=None):
+        """Return a page of user's events feed starting at ``start``, as a
+        tuple of date grouped events (see ``group_events_data``), whether
+        there are more events, and start of the next page.
+
+        Pages are cached per user, a request only reads the newest event of
+        the user to check whether the cache is still up to date.
+        """
+        feed_key = _events_cache_key(username, 'FEED')
+        feed = cache.get(feed_key)
+        feed_changed = False
+
+        ev_session = SeafEventsSession()
+        try:
+            latest = seafevents.get_user_events(ev_session, username, 0, 1)
+            head = latest[0].uuid if latest else None
+            if feed is not None and feed['head'] != head:
+                feed = _refresh_events_feed(ev_session, username, feed, head,
+                                            count)
+                feed_changed = True
+        finally:
+            ev_session.close()
+
+        if feed is None:
+            feed = {'epoch': uuid.uuid4().hex, 'head': head, 'shift': 0,
+                    'top': 0}
+            feed_changed = True
+
+        page_key = _events_page_key(username, feed, start)
+        page = cache.get(page_key)
+        if page is None:
+            events, new_start = _get_events(username, start, count, org_id)
+            page = {
+                'events': _dump_events(events),
+                'more': len(events) == count,
+                'new_start': new_start - feed['shift'],
+                }
+            cache.set(page_key, page, EVENTS_CACHE_TIMEOUT)
+            if start == 0:
+                feed['top'] = -feed['shift']
+                feed_changed = True
+        else:
+            events = _load_events(page['events'], username)
+
+        if feed_changed:
+            cache.set(feed_key, feed, EVENTS_CACHE_TIMEOUT)
+        return group_events_data(events), page['more'], \
+            page['new_start'] + feed['shift']
+
 else:
     EVENTS_ENABLED = False
     def get_user_events():
         pass
     def get_org_user_events():
         pass
+    def get_user_events_page():
+        pass
+
+# Fall back to re-calculate the whole directory if more than this number of
+# files are changed.
+DIR_FILES_LAST_MODIFIED_MAX_DELTA = getattr(
+    seahub.settings, 'DIR_FILES_LAST_MODIFIED_MAX_DELTA', 50)
+
+def _list_dir_entry_ids(dir_id):
+    """Return a dict mapping entry names to object ids of a directory, and a
+    set of names of sub directories. Return ``(None, None)`` on error.
+    """
+    try:
+        dirents = seafile_api.list_dir_by_dir_id(dir_id)
+    except SearpcError, e:
+        logger.error(e)
+        return None, None
+
+    entry_ids = {}
+    dir_names = set()
+    for dirent in dirents:
+        entry_ids[dirent.obj_name] = dirent.obj_id
+        if stat.S_ISDIR(dirent.mode):
+            dir_names.add(dirent.obj_name)
+    return entry_ids, dir_names
+
+def _dump_dir_files_last_modified(last_modified_info, entry_ids):
+    # Stored as {'xxx': [t1, obj_id1], 'yyy': [t2, obj_id2]}, object ids of
+    # files and sub directories are used to find changed entries when the
+    # directory is changed.
+    d = {}
+    for name, last_modified in last_modified_info.iteritems():
+        d[name] = [last_modified, entry_ids.get(name, '')]
+    return json.dumps(d)
+
+def _load_dir_files_last_modified(value):
+    """Return a tuple of last modified info and object ids dict. Object ids
+    dict is ``None`` for records saved by older versions.
+    """
+    d = json.loads(value)
+    last_modified_info = {}
+    entry_ids = {}
+    old_format = False
+    for name, v in d.iteritems():
+        if isinstance(v, list):
+            last_modified_info[name], entry_ids[name] = v
+        else:
+            # Older versions saved {'xxx': t1, 'yyy': t2}.
+            last_modified_info[name] = v
+            old_format = True
+    return last_modified_info, None if old_format else entry_ids
 
 def calc_dir_files_last_modified(repo_id, parent_dir, parent_dir_hash, dir_id):
     try:
@@ -747,12 +1223,19 @@ def calc_dir_files_last_modified(repo_id, parent_dir, parent_dir_hash, dir_id):
         key = entry.file_name
         value = entry.last_modified
         last_modified_info[key] = value
-        
+
+    entry_ids = _list_dir_entry_ids(dir_id)[0]
+    if entry_ids is None:
+        # Without object ids the record can't be updated incrementally,
+        # calculate again next time.
+        return last_modified_info
+
     info = DirFilesLastModifiedInfo(repo_id=repo_id,
                                     parent_dir=parent_dir,
                                     parent_dir_hash=parent_dir_hash,
                                     dir_id=dir_id,
-                                    last_modified_info=json.dumps(last_modified_info))
+                                    last_modified_info=_dump_dir_files_last_modified(
+                                        last_modified_info, entry_ids))
 
     try:
         info.save()
@@ -762,6 +1245,65 @@ def calc_dir_files_last_modified(repo_id, parent_dir, parent_dir_hash, dir_id):
         
     return last_modified_info
 
+def update_dir_files_last_modified(info, repo_id, parent_dir, dir_id):
+    """Bring an outdated ``DirFilesLastModifiedInfo`` record up to date.
+
+    Old and new directory listings are compared by object id, and only
+    added or modified files are re-calculated. The whole directory is
+    re-calculated if the record has no object ids, a sub directory changed
+    or too many files changed. The record is updated in place, unless some
+    calculation failed.
+    """
+    old_info, old_entry_ids = _load_dir_files_last_modified(
+        info.last_modified_info)
+    new_entry_ids, dir_names = _list_dir_entry_ids(dir_id)
+
+    changed = None
+    if old_entry_ids is not None and new_entry_ids is not None:
+        changed = [name for name, obj_id in new_entry_ids.iteritems()
+                   if old_entry_ids.get(name) != obj_id]
+        if len(changed) > DIR_FILES_LAST_MODIFIED_MAX_DELTA or \
+                dir_names.intersection(changed):
+            changed = None
+
+    failed = False
+    if changed is None:
+        try:
+            ret_list = seafserv_threaded_rpc.calc_files_last_modified(
+                repo_id, parent_dir.encode('utf-8'), 0)
+        except:
+            return {}
+        last_modified_info = {}
+        for entry in ret_list:
+            last_modified_info[entry.file_name] = entry.last_modified
+    else:
+        last_modified_info = {}
+        for name in new_entry_ids:
+            if name in old_info:
+                last_modified_info[name] = old_info[name]
+        paths = [(repo_id, os.path.join(parent_dir, name)) for name in changed]
+        results = batch_call(_get_file_last_revision_info, paths)
+        for name, path in zip(changed, paths):
+            result = results.get(path)
+            if result is None:
+                failed = True
+                result = ('', 0)
+            last_modified_info[name] = result[1]
+
+    if failed or new_entry_ids is None:
+        # Don't save incomplete results, calculate again next time.
+        return last_modified_info
+
+    # Only update if no one else has updated the record, the loser of
+    # concurrent updates just returns what it calculated.
+    DirFilesLastModifiedInfo.objects.filter(
+        id=info.id, dir_id=info.dir_id).update(
+        dir_id=dir_id,
+        last_modified_info=_dump_dir_files_last_modified(
+            last_modified_info, new_entry_ids))
+
+    return last_modified_info
+
 def get_dir_files_last_modified(repo_id, parent_dir, dir_id=None):
     '''Calc the last modified time of all the files under the directory
     <parent_dir> of the repo <repo_id>. Return a dict whose keys are the file
@@ -784,11 +1326,11 @@ def get_dir_files_last_modified(repo_id, parent_dir, dir_id=None):
         # cache exist
         if info.dir_id != dir_id:
             # cache is outdated
-            info.delete()
-            return calc_dir_files_last_modified(repo_id, parent_dir, parent_dir_hash, dir_id)
+            return update_dir_files_last_modified(info, repo_id, parent_dir,
+                                                  dir_id)
         else:
             # cache is valid
-            return json.loads(info.last_modified_info)
+            return _load_dir_files_last_modified(info.last_modified_info)[0]
 
 def calc_file_path_hash(path, bits=12):
     if isinstance(path, unicode):
@@ -24,9 +24,16 @@ Class Differ:
 
 Class HtmlDiff:
     For producing HTML side by side comparison with change highlights.
+
+Class LineMatcher:
+    A fast SequenceMatcher for lines, using patience diff on line ids.
 """
 
+from __future__ import absolute_import
+
 import heapq
+import bisect
+import time
 from collections import namedtuple as _namedtuple
 from functools import reduce
 
@@ -1150,7 +1157,7 @@ def _format_range_unified(start, stop):
     return '{},{}'.format(beginning, length)
 
 def unified_diff(a, b, fromfile='', tofile='', fromfiledate='',
-                 tofiledate='', n=3, lineterm='\n'):
+                 tofiledate='', n=3, lineterm='\n', fast=False, matcher=None):
     r"""
     Compare two sequences of lines; generate the delta as a unified diff.
 
@@ -1172,6 +1179,10 @@ def unified_diff(a, b, fromfile='', tofile='', fromfiledate='',
     'fromfile', 'tofile', 'fromfiledate', and 'tofiledate'.
     The modification times are normally expressed in the ISO 8601 format.
 
+    Set 'fast' to True to match lines with LineMatcher, which is much faster
+    than SequenceMatcher on large files.  A 'matcher' already made for 'a'
+    and 'b' (e.g. HtmlDiff.matcher) may be passed to reuse its matching.
+
     Example:
 
     >>> for line in unified_diff('one two three four'.split(),
@@ -1190,8 +1201,14 @@ def unified_diff(a, b, fromfile='', tofile='', fromfiledate='',
      four
     """
 
+    if matcher is not None:
+        pass
+    elif fast:
+        matcher = LineMatcher(a, b)
+    else:
+        matcher = SequenceMatcher(None, a, b)
     started = False
-    for group in SequenceMatcher(None,a,b).get_grouped_opcodes(n):
+    for group in matcher.get_grouped_opcodes(n):
         if not started:
             started = True
             fromdate = '\t{}'.format(fromfiledate) if fromfiledate else ''
@@ -1560,51 +1577,313 @@ def _mdiff(fromlines, tolines, context=None, linejunk=None,
             to_line, to_diff = tolines.pop(0)
             yield (from_line,to_line,fromDiff or to_diff)
 
-    # Handle case where user does not want context differencing, just yield
-    # them up without doing anything else with them.
-    line_pair_iterator = _line_pair_iterator()
+    return _limit_context(_line_pair_iterator(), context)
+
+def _limit_context(line_pairs, context):
+    """Yields from/to line pairs within `context` lines of a difference.
+
+    line_pairs -- iterator of (from line, to line, flag) tuples, as yielded
+        by _mdiff() without context.
+    context -- number of context lines to keep around differences, if None,
+        all line pairs are yielded.
+
+    A (None, None, None) tuple is yielded as the separator of context
+    groups.
+    """
+    line_pair_iterator = iter(line_pairs)
     if context is None:
         while True:
             yield line_pair_iterator.next()
-    # Handle case where user wants context differencing.  We must do some
-    # storage of lines until we know for sure that they are to be yielded.
-    else:
-        context += 1
-        lines_to_write = 0
-        while True:
-            # Store lines up until we find a difference, note use of a
-            # circular queue because we only need to keep around what
-            # we need for context.
-            index, contextLines = 0, [None]*(context)
-            found_diff = False
-            while(found_diff is False):
-                from_line, to_line, found_diff = line_pair_iterator.next()
-                i = index % context
-                contextLines[i] = (from_line, to_line, found_diff)
-                index += 1
-            # Yield lines that we have collected so far, but first yield
-            # the user's separator.
-            if index > context:
-                yield None, None, None
-                lines_to_write = context
+    # We must do some storage of lines until we know for sure that they are
+    # to be yielded.
+    context += 1
+    lines_to_write = 0
+    while True:
+        # Store lines up until we find a difference, note use of a
+        # circular queue because we only need to keep around what
+        # we need for context.
+        index, contextLines = 0, [None]*(context)
+        found_diff = False
+        while(found_diff is False):
+            from_line, to_line, found_diff = line_pair_iterator.next()
+            i = index % context
+            contextLines[i] = (from_line, to_line, found_diff)
+            index += 1
+        # Yield lines that we have collected so far, but first yield
+        # the user's separator.
+        if index > context:
+            yield None, None, None
+            lines_to_write = context
+        else:
+            lines_to_write = index
+            index = 0
+        while(lines_to_write):
+            i = index % context
+            index += 1
+            yield contextLines[i]
+            lines_to_write -= 1
+        # Now yield the context lines after the change
+        lines_to_write = context-1
+        while(lines_to_write):
+            from_line, to_line, found_diff = line_pair_iterator.next()
+            # If another change within the context, extend the context
+            if found_diff:
+                lines_to_write = context-1
             else:
-                lines_to_write = index
-                index = 0
-            while(lines_to_write):
-                i = index % context
-                index += 1
-                yield contextLines[i]
                 lines_to_write -= 1
-            # Now yield the context lines after the change
-            lines_to_write = context-1
-            while(lines_to_write):
-                from_line, to_line, found_diff = line_pair_iterator.next()
-                # If another change within the context, extend the context
-                if found_diff:
-                    lines_to_write = context-1
-                else:
-                    lines_to_write -= 1
-                yield from_line, to_line, found_diff
+            yield from_line, to_line, found_diff
+
+########################################################################
+###  Line Diff
+########################################################################
+
+# Maximum number of differences searched by the Myers diff in a region
+# without unique common lines, a larger region is reported as replaced.
+LINE_DIFF_MAX_D = 500
+
+# Lines longer than this are not compared character by character.
+INTRALINE_MAX_LINE_LEN = 1000
+
+def _intern_lines(a, b):
+    """Returns lists of integer ids of lines in `a` and `b`, equal lines
+    get the same id, so that later comparisons are cheap."""
+    ids = {}
+    a_ids = [ids.setdefault(line, len(ids)) for line in a]
+    b_ids = [ids.setdefault(line, len(ids)) for line in b]
+    return a_ids, b_ids
+
+def _unique_common(a, alo, ahi, b, blo, bhi):
+    """Returns (i, j) pairs of lines occurring exactly once in both
+    a[alo:ahi] and b[blo:bhi], which form the longest increasing sequence
+    in both i and j (the "patience" anchors)."""
+    counts = {}
+    for i in xrange(alo, ahi):
+        c = counts.get(a[i])
+        counts[a[i]] = [i, None] if c is None else [-1, None]
+    for j in xrange(blo, bhi):
+        c = counts.get(b[j])
+        if c is None or c[0] < 0:
+            continue
+        c[1] = j if c[1] is None else -1
+    pairs = [(i, j) for i, j in counts.itervalues()
+             if i >= 0 and j is not None and j >= 0]
+    if not pairs:
+        return []
+    pairs.sort()
+
+    # Longest increasing subsequence of j, by patience sorting.
+    tails = []          # tails[k]: index in pairs of the tail of a k+1 run
+    tail_js = []
+    prev = [None] * len(pairs)
+    for n, (i, j) in enumerate(pairs):
+        k = bisect.bisect_left(tail_js, j)
+        if k:
+            prev[n] = tails[k - 1]
+        if k == len(tails):
+            tails.append(n)
+            tail_js.append(j)
+        else:
+            tails[k] = n
+            tail_js[k] = j
+    ret = []
+    n = tails[-1]
+    while n is not None:
+        ret.append(pairs[n])
+        n = prev[n]
+    ret.reverse()
+    return ret
+
+def _myers_matches(a, alo, ahi, b, blo, bhi, max_d):
+    """Returns matching blocks of a[alo:ahi] and b[blo:bhi] of a shortest
+    edit script, or None if it needs more than `max_d` differences."""
+    n, m = ahi - alo, bhi - blo
+    v = {1: 0}
+    trace = []
+    for d in xrange(min(n + m, max_d) + 1):
+        trace.append(v.copy())
+        for k in xrange(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+        break
+    else:
+        return None
+
+    # Walk back through the trace to collect the snakes.
+    matches = []
+    x, y = n, m
+    for d in xrange(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+            start_x = v[prev_k]
+        else:
+            prev_k = k - 1
+            start_x = v[prev_k] + 1
+        start_y = start_x - k
+        if x > start_x:
+            matches.append((alo + start_x, blo + start_y, x - start_x))
+        x, y = v[prev_k], v[prev_k] - prev_k
+    return matches
+
+def line_matching_blocks(a, b, max_d=LINE_DIFF_MAX_D):
+    """Returns matching blocks of line lists `a` and `b`, in the format of
+    SequenceMatcher.get_matching_blocks().
+
+    Lines are interned into integer ids, and compared with the patience
+    diff: lines unique in both sides are matched first, regions between them
+    are diffed recursively, falling back to the Myers diff when there is no
+    unique common line.  This runs in about linear time on real world files,
+    whereas SequenceMatcher is quadratic on large changed regions.
+    """
+    a, b = _intern_lines(a, b)
+    blocks = []
+    queue = [(0, len(a), 0, len(b))]
+    while queue:
+        alo, ahi, blo, bhi = queue.pop()
+        # Strip common prefix and suffix.
+        i, j = alo, blo
+        while i < ahi and j < bhi and a[i] == b[j]:
+            i += 1
+            j += 1
+        if i > alo:
+            blocks.append((alo, blo, i - alo))
+        alo, blo = i, j
+        i, j = ahi, bhi
+        while i > alo and j > blo and a[i - 1] == b[j - 1]:
+            i -= 1
+            j -= 1
+        if i < ahi:
+            blocks.append((i, j, ahi - i))
+        ahi, bhi = i, j
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_common(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            for i, j in anchors:
+                blocks.append((i, j, 1))
+                queue.append((alo, i, blo, j))
+                alo, blo = i + 1, j + 1
+            queue.append((alo, ahi, blo, bhi))
+            continue
+
+        matches = _myers_matches(a, alo, ahi, b, blo, bhi, max_d)
+        if matches:
+            blocks.extend(matches)
+    blocks.sort()
+
+    # Collapse adjacent blocks.
+    i1 = j1 = k1 = 0
+    non_adjacent = []
+    for i2, j2, k2 in blocks:
+        if i1 + k1 == i2 and j1 + k1 == j2:
+            k1 += k2
+        else:
+            if k1:
+                non_adjacent.append((i1, j1, k1))
+            i1, j1, k1 = i2, j2, k2
+    if k1:
+        non_adjacent.append((i1, j1, k1))
+    non_adjacent.append((len(a), len(b), 0))
+    return non_adjacent
+
+class LineMatcher(SequenceMatcher):
+    """SequenceMatcher for lists of lines, using line_matching_blocks().
+
+    Only the methods built on matching blocks (get_matching_blocks,
+    get_opcodes, get_grouped_opcodes, ratio) are meaningful.
+
+    >>> s = LineMatcher('a b c d'.split(), 'a x c d'.split())
+    >>> s.get_opcodes()
+    [('equal', 0, 1, 0, 1), ('replace', 1, 2, 1, 2), ('equal', 2, 4, 2, 4)]
+    """
+
+    def __init__(self, a, b, max_d=LINE_DIFF_MAX_D):
+        self.a, self.b = a, b
+        self.max_d = max_d
+        self.matching_blocks = self.opcodes = None
+
+    def get_matching_blocks(self):
+        if self.matching_blocks is None:
+            self.matching_blocks = line_matching_blocks(self.a, self.b,
+                                                        self.max_d)
+        return map(Match._make, self.matching_blocks)
+
+def _intraline_markup(fromline, toline, charjunk):
+    """Returns from/to lines with _mdiff() intraline change markers, or None
+    if the lines are not similar enough to be shown as a changed pair."""
+    if len(fromline) > INTRALINE_MAX_LINE_LEN or \
+            len(toline) > INTRALINE_MAX_LINE_LEN:
+        return None
+    cruncher = SequenceMatcher(charjunk, fromline, toline)
+    # Same cutoff as Differ._fancy_replace().
+    if cruncher.real_quick_ratio() <= 0.75 or \
+            cruncher.quick_ratio() <= 0.75 or cruncher.ratio() <= 0.75:
+        return None
+    fromparts, toparts = [], []
+    for tag, i1, i2, j1, j2 in cruncher.get_opcodes():
+        if tag == 'equal':
+            fromparts.append(fromline[i1:i2])
+            toparts.append(toline[j1:j2])
+            continue
+        if tag in ('replace', 'delete'):
+            fromparts.append('\0%s%s\1' % ('^' if tag == 'replace' else '-',
+                                            fromline[i1:i2]))
+        if tag in ('replace', 'insert'):
+            toparts.append('\0%s%s\1' % ('^' if tag == 'replace' else '+',
+                                          toline[j1:j2]))
+    return ''.join(fromparts), ''.join(toparts)
+
+def _fast_mdiff(fromlines, tolines, context=None, charjunk=IS_CHARACTER_JUNK,
+                matcher=None):
+    r"""Returns generator yielding marked up from/to side by side differences.
+
+    Same as _mdiff(), but lines are matched with LineMatcher (or `matcher`),
+    and lines of a replaced block are paired up by position instead of
+    searching for the best matching pair, so the cost is about linear in the
+    number of lines.
+    """
+    if matcher is None:
+        matcher = LineMatcher(fromlines, tolines)
+
+    def _line_pair_iterator():
+        blank = ('', '\n')
+        opcodes = matcher.get_opcodes()
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                for i in xrange(i1, i2):
+                    j = j1 + i - i1
+                    yield (i + 1, fromlines[i]), (j + 1, tolines[j]), False
+                continue
+            for n in xrange(max(i2 - i1, j2 - j1)):
+                i, j = i1 + n, j1 + n
+                markup = None
+                if i < i2 and j < j2:
+                    markup = _intraline_markup(fromlines[i], tolines[j],
+                                               charjunk)
+                if markup is not None:
+                    yield (i + 1, markup[0]), (j + 1, markup[1]), True
+                    continue
+                from_line = to_line = blank
+                if i < i2:
+                    from_line = (i + 1, '\0-%s\1' % (fromlines[i] or ' '))
+                if j < j2:
+                    to_line = (j + 1, '\0+%s\1' % (tolines[j] or ' '))
+                yield from_line, to_line, True
+
+    return _limit_context(_line_pair_iterator(), context)
 
 
 _file_template = """
@@ -1663,6 +1942,30 @@ _legend = """
                   </table></td> </tr>
     </table>"""
 
+class DiffTooLarge(Exception):
+    """Raised when rendering a diff exceeds its size or time budget."""
+    pass
+
+def make_unified_diff(a, b, n=3, max_size=None, timeout=None, matcher=None):
+    """Returns (text, truncated) of the unified diff of line lists `a` and
+    `b`, lines are matched with LineMatcher unless `matcher` is given.
+
+    The text is cut at about `max_size` characters, or when `timeout`
+    seconds are used up, and `truncated` is True then.
+    """
+    if timeout is not None:
+        deadline = time.time() + timeout
+    size = 0
+    s = []
+    for line in unified_diff(a, b, n=n, lineterm='', fast=True,
+                             matcher=matcher):
+        size += len(line) + 1
+        if (max_size is not None and size > max_size) or \
+                (timeout is not None and time.time() > deadline):
+            return '\n'.join(s), True
+        s.append(line)
+    return '\n'.join(s), False
+
 class HtmlDiff(object):
     """For producing HTML side by side comparison with change highlights.
 
@@ -1686,7 +1989,7 @@ class HtmlDiff(object):
     _default_prefix = 0
 
     def __init__(self,tabsize=8,wrapcolumn=None,linejunk=None,
-                 charjunk=IS_CHARACTER_JUNK):
+                 charjunk=IS_CHARACTER_JUNK,fast=False):
         """HtmlDiff instance initializer
 
         Arguments:
@@ -1696,11 +1999,17 @@ class HtmlDiff(object):
         linejunk,charjunk -- keyword arguments passed into ndiff() (used to by
             HtmlDiff() to generate the side by side HTML differences).  See
             ndiff() documentation for argument default values and descriptions.
+        fast -- match lines with LineMatcher instead of ndiff(), which is
+            much faster on large files, linejunk is ignored then.
         """
         self._tabsize = tabsize
         self._wrapcolumn = wrapcolumn
         self._linejunk = linejunk
         self._charjunk = charjunk
+        self._fast = fast
+        # LineMatcher of the last table made in fast mode, so that a
+        # unified_diff() of the same lines can reuse its matching.
+        self.matcher = None
 
     def make_file(self,fromlines,tolines,fromdesc='',todesc='',context=False,
                   numlines=5):
@@ -1950,14 +2259,13 @@ class HtmlDiff(object):
 
         return fromlist,tolist,flaglist,next_href,next_id
 
-    def make_table(self,fromlines,tolines,context=False, numlines=5):
+    def make_table(self,fromlines,tolines,context=False, numlines=5,
+                   max_size=None, timeout=None):
         """Returns HTML table of side by side comparison with change highlights
 
         Arguments:
         fromlines -- list of "from" lines
         tolines -- list of "to" lines
-        fromdesc -- "from" file column header string
-        todesc -- "to" file column header string
         context -- set to True for contextual differences (defaults to False
             which shows full differences).
         numlines -- number of context lines.  When context is set True,
@@ -1965,6 +2273,33 @@ class HtmlDiff(object):
             When context is False, controls the number of lines to place
             the "next" link anchors before the next change (so click of
             "next" link jumps to just before the change).
+        max_size -- maximum length of the returned HTML, defaults to None
+            which means no limit.
+        timeout -- maximum seconds spent on making the table, defaults to
+            None which means no limit.
+
+        DiffTooLarge is raised when `max_size` or `timeout` is exceeded.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+        size = 0
+        s = []
+        for row in self.make_table_rows(fromlines, tolines, context,
+                                        numlines):
+            size += len(row)
+            if max_size is not None and size > max_size:
+                raise DiffTooLarge('diff is larger than %d' % max_size)
+            if timeout is not None and time.time() > deadline:
+                raise DiffTooLarge('diff takes more than %ss' % timeout)
+            s.append(row)
+
+        return ''.join(s)
+
+    def make_table_rows(self,fromlines,tolines,context=False, numlines=5):
+        """Returns iterator of HTML table rows of side by side comparison
+
+        See make_table() for arguments.  Rows are generated as the diff goes,
+        so callers may stream them or stop early.
         """
 
         # make unique anchor prefixes so that multiple tables may exist
@@ -1980,41 +2315,29 @@ class HtmlDiff(object):
             context_lines = numlines
         else:
             context_lines = None
-        diffs = _mdiff(fromlines,tolines,context_lines,linejunk=self._linejunk,
-                      charjunk=self._charjunk)
+        if self._fast:
+            self.matcher = LineMatcher(fromlines,tolines)
+            diffs = _fast_mdiff(fromlines,tolines,context_lines,
+                                charjunk=self._charjunk,matcher=self.matcher)
+        else:
+            diffs = _mdiff(fromlines,tolines,context_lines,
+                           linejunk=self._linejunk,charjunk=self._charjunk)
 
         # set up iterator to wrap lines that exceed desired width
         if self._wrapcolumn:
             diffs = self._line_wrapper(diffs)
 
-        # collect up from/to lines and flags into lists (also format the lines)
-        fromlist,tolist,flaglist = self._collect_lines(diffs)
-
-        # process change flags, generating middle column of next anchors/links
-        # fromlist,tolist,flaglist,next_href,next_id = self._convert_flags(
-        #     fromlist,tolist,flaglist,context,numlines)
-
-        s = []
         fmt = '            <tr>%s' + \
               '%s</tr>\n'
-        for i in range(len(flaglist)):
-            if flaglist[i] is None:
+        for i, (fromdata,todata,flag) in enumerate(diffs):
+            if flag is None:
                 # mdiff yields None on separator lines skip the bogus ones
                 # generated for the first line
                 if i > 0:
-                    s.append('        </tbody>        \n        <tbody>\n')
+                    yield '        </tbody>        \n        <tbody>\n'
             else:
-                s.append( fmt % (fromlist[i], tolist[i]))
-
-        data_rows = ''.join(s)
-
-        return data_rows
-
-        # return data_rows.replace('\0+',''). \
-        #              replace('\0-',''). \
-        #              replace('\0^',''). \
-        #              replace('\1',''). \
-        #              replace('\t','&nbsp;')
+                yield fmt % (self._format_line(0,flag,*fromdata),
+                             self._format_line(1,flag,*todata))
 
 del re
 
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+A keep-alive connection pool for fetching files from seafile httpserver.
+
+``urlopen`` behaves like ``urllib2.urlopen`` for the GET requests Seahub
+sends to httpserver: it raises ``urllib2.HTTPError`` and ``urllib2.URLError``
+and returns a file-like response. Connections are put back to the pool when
+a response is read to the end or closed, so close responses that are not
+fully read.
+"""
+from __future__ import absolute_import
+
+import socket
+import httplib
+import logging
+import threading
+import urllib2
+import urlparse
+from StringIO import StringIO
+
+import seahub.settings
+
+logger = logging.getLogger(__name__)
+
+# Max number of idle connections kept per host.
+INNER_HTTP_POOL_MAXSIZE = getattr(seahub.settings, 'INNER_HTTP_POOL_MAXSIZE', 10)
+# Timeout in seconds of connecting to and reading from httpserver.
+INNER_HTTP_TIMEOUT = getattr(seahub.settings, 'INNER_HTTP_TIMEOUT', 30)
+
+class PoolStats(object):
+    def __init__(self):
+        self.requests = 0
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.errors = 0
+
+    def __str__(self):
+        return '%d requests, %d connections created, %d reused, ' \
+            '%d discarded, %d errors' % (self.requests, self.created,
+                                         self.reused, self.discarded,
+                                         self.errors)
+
+class PooledResponse(object):
+    """File-like wrapper of ``httplib.HTTPResponse``, which gives the
+    connection back to the pool once the response is consumed.
+    """
+    def __init__(self, pool, key, conn, resp, url):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._resp = resp
+        self.url = url
+        self.code = resp.status
+        self.msg = resp.reason
+        self.headers = resp.msg
+
+    def getcode(self):
+        return self.code
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+    def read(self, amt=None):
+        try:
+            data = self._resp.read(amt)
+        except (socket.error, httplib.HTTPException), e:
+            self._pool._count('errors')
+            self._discard()
+            raise urllib2.URLError(e)
+        if self._resp.isclosed():
+            self.close()
+        return data
+
+    def close(self):
+        if self._conn is None:
+            return
+        if self._resp.isclosed() and not self._resp.will_close:
+            self._pool._put_conn(self._key, self._conn)
+            self._conn = None
+        else:
+            # Not fully read, the connection can't be reused.
+            self._discard()
+
+    def _discard(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class ConnectionPool(object):
+    """Keep at most ``maxsize`` idle connections per (scheme, host, port).
+
+    The number of connections in use is not capped: more connections are
+    opened when all of them are in use, and closed instead of being put back
+    when the pool is full. So a burst of requests opens as many sockets as
+    there are concurrent requests.
+    """
+    def __init__(self, maxsize=None, timeout=None):
+        self.maxsize = INNER_HTTP_POOL_MAXSIZE if maxsize is None else maxsize
+        self.timeout = INNER_HTTP_TIMEOUT if timeout is None else timeout
+        self.stats = PoolStats()
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _new_conn(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            conn_cls = httplib.HTTPSConnection
+        else:
+            conn_cls = httplib.HTTPConnection
+        self._count('created')
+        logger.debug('New connection to %s:%s, %s' % (host, port, self.stats))
+        return conn_cls(host, port, timeout=self.timeout)
+
+    def _count(self, name):
+        # Stats are changed by all threads using the pool.
+        with self._lock:
+            setattr(self.stats, name, getattr(self.stats, name) + 1)
+
+    def _get_conn(self, key):
+        """Return an idle connection, or None if there is none.
+        """
+        with self._lock:
+            conns = self._idle.get(key)
+            if conns:
+                self.stats.reused += 1
+                return conns.pop()
+        return None
+
+    def _put_conn(self, key, conn):
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < self.maxsize:
+                conns.append(conn)
+                return
+            self.stats.discarded += 1
+        conn.close()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def urlopen(self, url, headers=None):
+        """GET ``url`` and return a ``PooledResponse``.
+        """
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        parts = urlparse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise urllib2.URLError('unsupported url scheme: %s' % parts.scheme)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        self._count('requests')
+        conn = self._get_conn(key)
+        reused = conn is not None
+        while True:
+            if conn is None:
+                conn = self._new_conn(key)
+            try:
+                conn.request('GET', path, headers=headers or {})
+                resp = conn.getresponse()
+                break
+            except (socket.error, httplib.HTTPException), e:
+                conn.close()
+                conn = None
+                if reused:
+                    # Idle connection may have been closed by the server,
+                    # retry once on a new one.
+                    reused = False
+                    continue
+                self._count('errors')
+                raise urllib2.URLError(e)
+
+        ret = PooledResponse(self, key, conn, resp, url)
+        if resp.status >= 400:
+            # Error bodies are short, read it so the connection is reused.
+            body = StringIO(ret.read())
+            ret.close()
+            self._count('errors')
+            raise urllib2.HTTPError(url, resp.status, resp.reason, resp.msg,
+                                    body)
+        return ret
+
+# Shared by all requests to httpserver in this process.
+inner_http_pool = ConnectionPool()
+
+def urlopen(url, headers=None):
+    """Fetch ``url`` over a pooled connection.
+    """
+    return inner_http_pool.urlopen(url, headers)
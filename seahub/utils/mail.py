@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import time
+import logging
+
+from django.core.mail import get_connection
+
+import seahub.settings
+
+logger = logging.getLogger(__name__)
+
+# Number of messages sent over one SMTP session before reconnecting, most
+# SMTP servers limit the number of messages per session.
+MAIL_BATCH_SIZE = getattr(seahub.settings, 'MAIL_BATCH_SIZE', 100)
+# Number of times a message is retried on a fresh connection.
+MAIL_MAX_RETRIES = getattr(seahub.settings, 'MAIL_MAX_RETRIES', 2)
+
+class MailStats(object):
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.start = time.time()
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return '%d sent, %d failed, %d retried in %.2fs (%.1f mails/s)' % (
+            self.sent, self.failed, self.retried, self.elapsed, self.rate)
+
+def send_mails(messages, batch_size=None, max_retries=None):
+    """Send ``messages``, an iterable of ``EmailMessage``, over one pooled
+    SMTP connection, which is reopened every ``batch_size`` messages.
+
+    A message that fails is retried up to ``max_retries`` times on a fresh
+    connection, then logged and skipped. ``messages`` is consumed lazily, so
+    it may be a generator. Return a ``MailStats``.
+    """
+    if batch_size is None:
+        batch_size = MAIL_BATCH_SIZE
+    if max_retries is None:
+        max_retries = MAIL_MAX_RETRIES
+
+    stats = MailStats()
+    connection = get_connection(fail_silently=False)
+    in_batch = 0
+    try:
+        for msg in messages:
+            if in_batch >= batch_size:
+                connection.close()
+                in_batch = 0
+
+            for attempt in xrange(max_retries + 1):
+                try:
+                    connection.open()
+                    msg.connection = connection
+                    msg.send(fail_silently=False)
+                    stats.sent += 1
+                    in_batch += 1
+                    break
+                except Exception, e:
+                    # The connection may be broken, start a new session.
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                    in_batch = 0
+                    if attempt < max_retries:
+                        stats.retried += 1
+                        continue
+                    stats.failed += 1
+                    logger.error('Failed to send email to %s, error detail: %s'
+                                 % (', '.join(msg.to), e))
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    logger.info('Mails: %s' % stats)
+    return stats
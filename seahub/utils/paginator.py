@@ -1,4 +1,7 @@
+import datetime
+
 from django.core.paginator import Paginator as DefaultPaginator
+from django.db.models import Q
 
 def get_page_range(current_page, num_pages):
     first_page = 1
@@ -18,3 +21,98 @@ class Paginator(DefaultPaginator):
         Returns custom range of pages.
         """
         return get_page_range(current_page, self.num_pages)
+
+CURSOR_TIME_FORMAT = '%Y%m%d%H%M%S%f'
+
+def make_cursor(timestamp, pk):
+    return '%s-%d' % (timestamp.strftime(CURSOR_TIME_FORMAT), pk)
+
+def parse_cursor(cursor):
+    """
+    Returns ``(timestamp, pk)`` of a cursor made by ``make_cursor``, or None
+    if cursor is empty or invalid.
+    """
+    try:
+        timestamp, pk = cursor.split('-')
+        return datetime.datetime.strptime(timestamp, CURSOR_TIME_FORMAT), \
+            int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+class CursorPage(object):
+    def __init__(self, object_list, has_next, has_previous, time_field):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.time_field = time_field
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def _cursor(self, obj):
+        return make_cursor(getattr(obj, self.time_field), obj.pk)
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self._cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self._cursor(self.object_list[0])
+
+class CursorPaginator(object):
+    """
+    Paginates a queryset from the newest to the oldest by ``(time_field,
+    pk)``, pages are located by the cursor of their neighbour instead of page
+    number.
+
+    Unlike ``Paginator``, no COUNT query or OFFSET is issued, so the cost of a
+    page does not depend on how deep it is, given an index on the filtered
+    fields and ``time_field``.
+    """
+    def __init__(self, queryset, per_page, time_field='timestamp'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.time_field = time_field
+
+    def page(self, after=None, before=None):
+        """
+        Returns the page of objects older than ``after``, or newer than
+        ``before`` if it's given, or the first page. Cursors are
+        ``(timestamp, pk)`` tuples as returned by ``parse_cursor``.
+        """
+        f = self.time_field
+        if before is not None:
+            timestamp, pk = before
+            qs = self.queryset.filter(
+                Q(**{f + '__gt': timestamp}) |
+                Q(**{f: timestamp, 'pk__gt': pk})).order_by(f, 'pk')
+            objs = list(qs[:self.per_page + 1])
+            if len(objs) <= self.per_page:
+                # Reached the newest, show a full first page instead.
+                return self.page()
+            objs = objs[:self.per_page]
+            objs.reverse()
+            return CursorPage(objs, True, True, f)
+
+        qs = self.queryset.order_by('-' + f, '-pk')
+        if after is not None:
+            timestamp, pk = after
+            qs = qs.filter(Q(**{f + '__lt': timestamp}) |
+                           Q(**{f: timestamp, 'pk__lt': pk}))
+        objs = list(qs[:self.per_page + 1])
+        return CursorPage(objs[:self.per_page], len(objs) > self.per_page,
+                          after is not None, f)
@@ -1,10 +1,219 @@
 # -*- coding: utf-8 -*-
-from seaserv import seafile_api
-from seahub.utils import EMPTY_SHA1
+import stat
+import logging
+
+from django.core.cache import cache
+
+from pysearpc import SearpcError
+from seaserv import seafile_api, seafserv_threaded_rpc, get_commits, \
+    check_permission, get_repo, get_group_repoids
+from seahub.utils import EMPTY_SHA1, get_cached_commit, batch_call, \
+    calculate_repos_last_modify
+import seahub.settings
+
+logger = logging.getLogger(__name__)
 
 def list_dir_by_path(cmmt, path):
     if cmmt.root_id == EMPTY_SHA1:
         return []
     else:
         return seafile_api.list_dir_by_commit_and_path(cmmt.id, path)
-    
+
+def get_repos_head_and_size(repo_ids, head_cmmt_ids=None):
+    """Get head commit and size of repos in one batch.
+
+    Arguments:
+    - `repo_ids`:
+    - `head_cmmt_ids`: An optional dict mapping repo id to its head commit
+      id, used to get the head commit from the commit cache.
+
+    Returns:
+        A dict mapping repo id to a ``(head commit, size)`` tuple. Head commit
+        is ``None`` if the repo has no commit.
+    """
+    head_cmmt_ids = head_cmmt_ids or {}
+
+    def get_head_and_size(repo_id):
+        head_cmmt_id = head_cmmt_ids.get(repo_id)
+        if head_cmmt_id:
+            commit = get_cached_commit(head_cmmt_id)
+        else:
+            commits = get_commits(repo_id, 0, 1)
+            commit = commits[0] if commits else None
+        if not commit:
+            return None, 0
+        return commit, seafserv_threaded_rpc.server_repo_size(repo_id)
+
+    return batch_call(get_head_and_size, repo_ids)
+
+def get_repos_permission(repo_ids, username):
+    """Get user's permission ('r', 'rw' or ``None``) of repos in one batch.
+    """
+    return batch_call(lambda repo_id: check_permission(repo_id, username),
+                      repo_ids)
+
+def get_group_repos_shared_to_user(username, groups):
+    """Get repos shared to ``groups`` and not owned by ``username``.
+
+    Repo ids are deduplicated across groups, then repos, owners, permissions
+    and head commits are fetched in batches, so the cost is proportional to
+    the number of distinct repos.
+
+    Returns:
+        A list of repos, with properties renamed as in ``SharedRepo``
+        (``repo_id``, ``repo_name``, ``repo_desc``), and ``last_modified``,
+        ``share_type``, ``user`` (the owner) and ``user_perm`` set.
+    """
+    group_repoids = batch_call(get_group_repoids, [g.id for g in groups])
+    repo_ids = []
+    seen = set()
+    for grp in groups:
+        for r_id in group_repoids.get(grp.id) or []:
+            if r_id not in seen:
+                seen.add(r_id)
+                repo_ids.append(r_id)
+
+    # No need to list my own repo
+    owners = batch_call(seafile_api.get_repo_owner, repo_ids)
+    repo_ids = [x for x in repo_ids if owners.get(x) != username]
+
+    repos = batch_call(get_repo, repo_ids)
+    perms = get_repos_permission(repo_ids, username)
+    ret = [repos[x] for x in repo_ids if repos.get(x)]
+    calculate_repos_last_modify(ret)
+    for r in ret:
+        # Convert repo properties due to the different collumns in Repo
+        # and SharedRepo
+        r.repo_id = r.id
+        r.repo_name = r.name
+        r.repo_desc = r.desc
+        r.last_modified = r.latest_modify
+        r.share_type = 'group'
+        r.user = owners.get(r.id)
+        r.user_perm = perms.get(r.id)
+    return ret
+
+# Directory objects never change, their listings can be cached for long.
+DIR_CACHE_PREFIX = 'DIR_'
+DIR_CACHE_TIMEOUT = getattr(seahub.settings, 'DIR_CACHE_TIMEOUT',
+                            24 * 60 * 60)
+
+def _list_dir_by_dir_id(dir_id):
+    try:
+        dirents = seafile_api.list_dir_by_dir_id(dir_id)
+    except SearpcError, e:
+        logger.error(e)
+        return None
+    return [(d.obj_name, d.obj_id, stat.S_ISDIR(d.mode)) for d in dirents]
+
+class DirTree(object):
+    """Walk the directories of a commit by dir id.
+
+    A directory object is identified by the sha1 of its content, so listings
+    are memoized by dir id, in this object and in the cache. Entries of a
+    listing are ``(name, obj_id, is_dir)`` tuples.
+    """
+    def __init__(self, commit):
+        self.root_id = commit.root_id
+        self._dirs = {EMPTY_SHA1: []}
+        # Whether listing some dir failed, so a dir or file not found may
+        # still exist.
+        self.has_error = False
+
+    def list_dirs(self, dir_ids):
+        """List dirs of ``dir_ids`` in one batch. Return a dict mapping dir id
+        to its entries, or ``None`` if it can not be listed.
+        """
+        missing = [x for x in set(dir_ids) if x not in self._dirs]
+        if missing:
+            found = cache.get_many([DIR_CACHE_PREFIX + x for x in missing])
+            for dir_id in missing:
+                entries = found.get(DIR_CACHE_PREFIX + dir_id)
+                if entries is not None:
+                    self._dirs[dir_id] = entries
+
+            listed = batch_call(_list_dir_by_dir_id,
+                                [x for x in missing if x not in self._dirs])
+            for dir_id, entries in listed.items():
+                self._dirs[dir_id] = entries
+                if entries is None:
+                    self.has_error = True
+                else:
+                    cache.set(DIR_CACHE_PREFIX + dir_id, entries,
+                              DIR_CACHE_TIMEOUT)
+        return dict([(x, self._dirs.get(x)) for x in dir_ids])
+
+    def list_dir(self, dir_id):
+        return self.list_dirs([dir_id])[dir_id]
+
+    def walk_path(self, path):
+        """Return a list of ``(dir id, entries)`` of each dir from the root
+        down to ``path``. The list is cut at the first dir not found.
+        """
+        ret = []
+        dir_id = self.root_id
+        names = [x for x in path.split('/') if x]
+        for i in xrange(len(names) + 1):
+            entries = self.list_dir(dir_id)
+            if entries is None:
+                break
+            ret.append((dir_id, entries))
+            if i == len(names):
+                break
+            dir_id = None
+            for name, obj_id, is_dir in entries:
+                if is_dir and name == names[i]:
+                    dir_id = obj_id
+                    break
+            if dir_id is None:
+                break
+        return ret
+
+    def get_dir_id(self, path):
+        """Return the id of the dir at ``path``, or ``None``.
+        """
+        dirs = self.walk_path(path)
+        if len(dirs) != len([x for x in path.split('/') if x]) + 1:
+            return None
+        return dirs[-1][0]
+
+    def get_file_id(self, path):
+        """Return the id of the file at ``path``, or ``None``.
+        """
+        parent, name = path.rstrip('/').rsplit('/', 1)
+        dir_id = self.get_dir_id(parent)
+        if dir_id is None:
+            return None
+        for entry_name, obj_id, is_dir in self.list_dir(dir_id) or []:
+            if not is_dir and entry_name == name:
+                return obj_id
+        return None
+
+    def tree(self, dir_id, depth=1, dir_only=False):
+        """Return the entries of ``dir_id`` as dicts, with the entries of
+        subdirs down to ``depth`` levels in ``children``.
+
+        Each level is listed in one batch. With ``dir_only``, ``has_subdir``
+        of a dir is computed from its listing, so one more level is listed.
+        """
+        levels = [[dir_id]]
+        for i in xrange(depth + 1 if dir_only else depth):
+            listed = self.list_dirs(levels[-1])
+            levels.append([obj_id for x in levels[-1]
+                           for name, obj_id, is_dir in listed[x] or []
+                           if is_dir])
+
+        def build(dir_id, level):
+            ret = []
+            for name, obj_id, is_dir in self._dirs.get(dir_id) or []:
+                if is_dir:
+                    entries = self._dirs.get(obj_id) or []
+                    d = {'name': name, 'id': obj_id, 'type': 'dir',
+                         'has_subdir': any([x[2] for x in entries])}
+                    if level < depth:
+                        d['children'] = build(obj_id, level + 1)
+                    ret.append(d)
+                elif not dir_only:
+                    ret.append({'name': name, 'id': obj_id, 'type': 'file'})
+            return ret
+        return build(dir_id, 1)
@@ -9,7 +9,6 @@ import urllib2
 import logging
 import chardet
 from types import FunctionType
-from datetime import datetime
 from math import ceil
 from urllib import quote
 
@@ -26,7 +25,6 @@ from django.shortcuts import render_to_response, redirect
 from django.template import Context, loader, RequestContext
 from django.template.loader import render_to_string
 from django.utils.translation import ugettext as _
-from django.utils import timezone
 from django.utils.http import urlquote
 
 import seaserv
@@ -40,9 +38,8 @@ from seaserv import ccnet_rpc, ccnet_threaded_rpc, get_repos, get_emailusers, \
     list_inner_pub_repos, get_org_groups_by_repo, is_org_repo_owner, \
     get_org_repo_owner, is_passwd_set, get_file_size, check_quota, edit_repo,\
     get_related_users_by_repo, get_related_users_by_org_repo, \
-    get_session_info, get_group_repoids, get_repo_owner, get_file_id_by_path, \
-    set_repo_history_limit, \
-    get_commit, MAX_DOWNLOAD_DIR_SIZE, CALC_SHARE_USAGE, count_emailusers, \
+    get_session_info, get_file_id_by_path, set_repo_history_limit, \
+    MAX_DOWNLOAD_DIR_SIZE, CALC_SHARE_USAGE, count_emailusers, \
     count_inner_pub_repos, unset_inner_pub_repo, get_user_quota_usage, \
     get_user_share_usage, send_message, \
     MAX_UPLOAD_FILE_SIZE
@@ -64,6 +61,7 @@ from seahub.group.signals import grpmsg_added
 from seahub.notifications.models import UserNotification
 from seahub.options.models import UserOptions, CryptoOptionNotSetError
 from seahub.profile.models import Profile
+from seahub.profile.utils import prefetch_user_info
 from seahub.share.models import FileShare, PrivateFileDirShare, UploadLinkShare
 from seahub.forms import AddUserForm, RepoCreateForm, \
     RepoPassowrdForm, SharedRepoCreateForm,\
@@ -71,17 +69,20 @@ from seahub.forms import AddUserForm, RepoCreateForm, \
 from seahub.signals import repo_created, repo_deleted
 from seahub.utils import render_permission_error, render_error, list_to_string, \
     get_httpserver_root, get_ccnetapplet_root, gen_shared_upload_link, \
-    gen_dir_share_link, gen_file_share_link, get_repo_last_modify, \
+    gen_dir_share_link, gen_file_share_link, \
     calculate_repos_last_modify, get_file_type_and_ext, get_user_repos, \
+    get_cached_commit, cache_commits, \
     EMPTY_SHA1, normalize_file_path, \
     get_file_revision_id_size, get_ccnet_server_addr_port, \
     gen_file_get_url, string2list, MAX_INT, IS_EMAIL_CONFIGURED, \
     gen_file_upload_url, check_and_get_org_by_repo, \
-    get_file_contributors, EVENTS_ENABLED, get_user_events, get_org_user_events, \
+    get_file_contributors, EVENTS_ENABLED, get_user_events_page, \
     get_dir_files_last_modified, show_delete_days, \
     TRAFFIC_STATS_ENABLED, get_user_traffic_stat
 from seahub.utils.paginator import get_page_range
 from seahub.utils.star import get_dir_starred_files
+from seahub.utils.repo import get_group_repos_shared_to_user, \
+    get_repos_permission
 from seahub.views.modules import get_enabled_mods_by_user, MOD_PERSONAL_WIKI, \
     enable_mod_for_user, disable_mod_for_user, get_available_mods_by_user
 from seahub.utils import HAS_OFFICE_CONVERTER
@@ -195,6 +196,50 @@ def gen_path_link(path, repo_name):
     
     return zipped
 
+def get_dir_links_index(username, repo_id, path):
+    """Get share links and upload links created by user under ``path``.
+
+    Returns:
+        A tuple of two dicts, mapping path to share link token and upload
+        link token respectively.
+    """
+    fileshares = FileShare.objects.filter(repo_id=repo_id, username=username,
+                                          path__startswith=path)
+    uploadlinks = UploadLinkShare.objects.filter(repo_id=repo_id,
+                                                 username=username,
+                                                 path__startswith=path)
+    share_index = dict([(e.path, e.token) for e in fileshares])
+    upload_index = dict([(e.path, e.token) for e in uploadlinks])
+    return share_index, upload_index
+
+def join_dirents_links(path, dirents, share_index, upload_index,
+                       starred_files):
+    """Set share link, upload link and starred flag for each dirent under
+    ``path``, using the indexes built by ``get_dir_links_index``.
+    """
+    for dirent in dirents:
+        dirent.sharelink = ''
+        dirent.uploadlink = ''
+        if stat.S_ISDIR(dirent.props.mode):
+            dpath = os.path.join(path, dirent.obj_name)
+            if dpath[-1] != '/':
+                dpath += '/'
+            token = share_index.get(dpath)
+            if token:
+                dirent.sharelink = gen_dir_share_link(token)
+                dirent.sharetoken = token
+            token = upload_index.get(dpath)
+            if token:
+                dirent.uploadlink = gen_shared_upload_link(token)
+                dirent.uploadtoken = token
+        else:
+            fpath = os.path.join(path, dirent.obj_name)
+            dirent.starred = fpath in starred_files
+            token = share_index.get(fpath)
+            if token:
+                dirent.sharelink = gen_file_share_link(token)
+                dirent.sharetoken = token
+
 def get_repo_dirents(request, repo_id, commit, path, offset=-1, limit=-1):
     dir_list = []
     file_list = []
@@ -214,47 +259,27 @@ def get_repo_dirents(request, repo_id, commit, path, offset=-1, limit=-1):
             raise Http404
             # return render_error(self.request, e.msg)
 
+        username = request.user.username
         org_id = -1
         if hasattr(request.user, 'org') and request.user.org:
             org_id = request.user.org['org_id']
-        starred_files = get_dir_starred_files(request.user.username, repo_id, path, org_id)
+        starred_files = set(get_dir_starred_files(username, repo_id, path,
+                                                  org_id))
 
         last_modified_info = get_dir_files_last_modified(repo_id, path)
 
-        fileshares = FileShare.objects.filter(repo_id=repo_id).filter(username=request.user.username)
-        uploadlinks = UploadLinkShare.objects.filter(repo_id=repo_id).filter(username=request.user.username)
+        share_index, upload_index = get_dir_links_index(username, repo_id,
+                                                        path)
+        join_dirents_links(path, dirs, share_index, upload_index,
+                           starred_files)
 
         for dirent in dirs:
             dirent.last_modified = last_modified_info.get(dirent.obj_name, 0)
-            dirent.sharelink = ''
-            dirent.uploadlink = ''
             if stat.S_ISDIR(dirent.props.mode):
-                dpath = os.path.join(path, dirent.obj_name)
-                if dpath[-1] != '/':
-                    dpath += '/'
-                for share in fileshares:
-                    if dpath == share.path:
-                        dirent.sharelink = gen_dir_share_link(share.token)
-                        dirent.sharetoken = share.token
-                        break
-                for link in uploadlinks:
-                    if dpath == link.path:
-                        dirent.uploadlink = gen_shared_upload_link(link.token)
-                        dirent.uploadtoken = link.token
-                        break
                 dir_list.append(dirent)
             else:
                 file_list.append(dirent)
                 dirent.file_size = get_file_size(dirent.obj_id)
-                dirent.starred = False
-                fpath = os.path.join(path, dirent.obj_name)
-                if fpath in starred_files:
-                    dirent.starred = True
-                for share in fileshares:
-                    if fpath == share.path:
-                        dirent.sharelink = gen_file_share_link(share.token)
-                        dirent.sharetoken = share.token
-                        break
         dir_list.sort(lambda x, y : cmp(x.obj_name.lower(),
                                         y.obj_name.lower()))
         file_list.sort(lambda x, y : cmp(x.obj_name.lower(),
@@ -267,18 +292,13 @@ def get_repo_dirents(request, repo_id, commit, path, offset=-1, limit=-1):
 def get_unencry_rw_repos_by_user(username):
     """Get all unencrypted repos the user can read and write.
     """
-    def has_repo(repos, repo):
-        for r in repos:
-            if repo.id == r.id:
-                return True
-        return False
-    
     owned_repos, shared_repos, groups_repos, public_repos = get_user_repos(username)
 
     accessible_repos = []
-
+    seen = set()
     for r in owned_repos:
-        if not has_repo(accessible_repos, r) and not r.encrypted:
+        if r.id not in seen and not r.encrypted:
+            seen.add(r.id)
             accessible_repos.append(r)
 
     for r in shared_repos + public_repos:
@@ -288,14 +308,14 @@ def get_unencry_rw_repos_by_user(username):
         r.name = r.repo_name
         r.desc = r.repo_desc
 
-        if not has_repo(accessible_repos, r) and not r.encrypted:
-            if seafile_api.check_repo_access_permission(r.id, username) == 'rw':
-                accessible_repos.append(r)
-
-    for r in groups_repos:
-        if not has_repo(accessible_repos, r) and not r.encrypted :
-            if seafile_api.check_repo_access_permission(r.id, username) == 'rw':            
-                accessible_repos.append(r)
+    # Permissions of repos not owned are checked in one batch.
+    other_repos = []
+    for r in shared_repos + public_repos + groups_repos:
+        if r.id not in seen and not r.encrypted:
+            seen.add(r.id)
+            other_repos.append(r)
+    perms = get_repos_permission([r.id for r in other_repos], username)
+    accessible_repos += [r for r in other_repos if perms.get(r.id) == 'rw']
 
     return accessible_repos
 
@@ -354,7 +374,7 @@ def render_recycle_dir(request, repo_id, commit_id):
     if not repo:
         raise Http404
 
-    commit = seafserv_threaded_rpc.get_commit(commit_id)
+    commit = get_cached_commit(commit_id)
     if not commit:
         raise Http404
 
@@ -648,6 +668,8 @@ def repo_history(request, repo_id):
     commits_all = get_commits(repo_id, per_page * (current_page -1),
                               per_page + 1)
     commits = commits_all[:per_page]
+    # Commits are very likely to be viewed again (e.g. history changes).
+    cache_commits(commits)
 
     if len(commits_all) == per_page + 1:
         page_next = True
@@ -849,7 +871,7 @@ def repo_history_changes(request, repo_id):
 
     changes = get_diff(repo_id, '', commit_id)
 
-    c = get_commit(commit_id)
+    c = get_cached_commit(commit_id)
     if c.parent_id is None:
         # A commit is a first commit only if it's parent id is None.
         changes['cmt_desc'] = repo.desc
@@ -950,26 +972,8 @@ def myhome(request):
     
     # Personal repos others shared to me
     in_repos = list_personal_shared_repos(username, 'to_email', -1, -1)
-    # For each group I joined... 
-    for grp in joined_groups:
-        # Get group repos, and for each group repos...
-        for r_id in get_group_repoids(grp.id):
-            # No need to list my own repo
-            if is_repo_owner(username, r_id):
-                continue
-            # Convert repo properties due to the different collumns in Repo
-            # and SharedRepo
-            r = get_repo(r_id)
-            if not r:
-                continue
-            r.repo_id = r.id
-            r.repo_name = r.name
-            r.repo_desc = r.desc
-            r.last_modified = get_repo_last_modify(r)
-            r.share_type = 'group'
-            r.user = get_repo_owner(r_id)
-            r.user_perm = check_permission(r_id, username)
-            in_repos.append(r)
+    # Repos shared to groups I joined
+    in_repos += get_group_repos_shared_to_user(username, joined_groups)
     in_repos.sort(lambda x, y: cmp(y.last_modified, x.last_modified))
 
     # user notifications
@@ -1925,14 +1929,11 @@ def events(request):
     username = request.user.username
     start = int(request.GET.get('start', 0))
 
-    if request.cloud_mode:
-        org_id = request.GET.get('org_id')
-        events, start = get_org_user_events(org_id, username, start, events_count)
-    else:
-        events, start = get_user_events(username, start, events_count)
-    events_more = True if len(events) == events_count else False
+    org_id = request.GET.get('org_id') if request.cloud_mode else None
+    event_groups, events_more, start = get_user_events_page(
+        username, start, events_count, org_id)
 
-    event_groups = group_events_data(events)
+    prefetch_user_info([e.author for g in event_groups for e in g['events']])
     ctx = {'event_groups': event_groups}
     html = render_to_string("snippets/events_body.html", ctx)
 
@@ -1940,42 +1941,6 @@ def events(request):
                                     'new_start': start}),
                             content_type='application/json; charset=utf-8')
 
-def group_events_data(events):
-    """
-    Group events according to the date.
-    """
-    event_groups = []
-    for e in events:
-        if e.etype == 'repo-update':
-            e.time = datetime.fromtimestamp(int(e.commit.ctime)) # e.commit.ctime is a timestamp
-            e.author = e.commit.creator_name
-        else:
-            # e.timestamp is a datetime.datetime in UTC
-            # change from UTC timezone to current seahub timezone
-            def utc_to_local(dt):
-                tz = timezone.get_default_timezone()
-                utc = dt.replace(tzinfo=timezone.utc)
-                local = timezone.make_naive(utc, tz)
-                return local
-
-            e.time = utc_to_local(e.timestamp)
-            if e.etype == 'repo-create':
-                e.author = e.creator
-            else:
-                e.author = e.repo_owner
-        e.date = (e.time).strftime("%Y-%m-%d")
-        
-        if len(event_groups) == 0 or \
-            len(event_groups) > 0 and e.date != event_groups[-1]['date']:
-            event_group = {}
-            event_group['date'] = e.date
-            event_group['events'] = [e]
-            event_groups.append(event_group)
-        else:
-            event_groups[-1]['events'].append(e)
-
-    return event_groups
-
 def pdf_full_view(request):
     '''For pdf view with pdf.js.'''
     
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 import os
-import stat
 import logging
 import simplejson as json
 
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.http import HttpResponse, Http404
 from django.template import RequestContext
@@ -19,16 +19,24 @@ from seahub.auth.decorators import login_required
 from seahub.contacts.models import Contact
 from seahub.forms import RepoNewDirentForm, RepoRenameDirentForm
 from seahub.options.models import UserOptions, CryptoOptionNotSetError
-from seahub.views import get_repo_dirents
+from seahub.views import get_repo_dirents, get_unencry_rw_repos_by_user
 from seahub.views.repo import get_nav_path, get_fileshare, get_dir_share_link, \
         get_uploadlink, get_dir_shared_upload_link
 import seahub.settings as settings
-from seahub.utils import check_filename_with_rename, EMPTY_SHA1, gen_block_get_url
+from seahub.utils import check_filename_with_rename, EMPTY_SHA1, gen_block_get_url, \
+    get_cached_commit, normalize_cache_key
+from seahub.utils.repo import DirTree
 from seahub.utils.star import star_file, unstar_file
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+# Max number of levels of dirents returned by ``get_dirents`` at once.
+DIR_TREE_MAX_DEPTH = 5
+
+# The list of repos a user can save files to is cached for a short while.
+UNENC_RW_REPOS_CACHE_TIMEOUT = getattr(settings, 'UNENC_RW_REPOS_CACHE_TIMEOUT', 60)
+
 ########## Seafile API Wrapper
 def get_repo(repo_id):
     return seafile_api.get_repo(repo_id)
@@ -44,6 +52,17 @@ def get_group(gid):
 
 def is_group_user(gid, username):
     return seaserv.is_group_user(gid, username)
+
+def get_head_commit(repo):
+    if repo.head_cmmt_id is not None:
+        return get_cached_commit(repo.head_cmmt_id)
+    commits = seaserv.get_commits(repo.id, 0, 1)
+    return commits[0] if commits else None
+
+def add_repo_id(dirents, repo_id):
+    for d in dirents:
+        d['repo_id'] = repo_id
+        add_repo_id(d.get('children', []), repo_id)
     
 ########## repo related
 @login_required
@@ -72,63 +91,38 @@ def get_dirents(request, repo_id):
         err_msg = _(u"No path.")
         return HttpResponse(json.dumps({"err_msg": err_msg}), status=400,
                             content_type=content_type)
+    try:
+        depth = min(max(int(request.GET.get('depth', 1)), 1),
+                    DIR_TREE_MAX_DEPTH)
+    except ValueError:
+        depth = 1
+
+    repo = get_repo(repo_id)
+    commit = get_head_commit(repo) if repo else None
+    if not commit:
+        err_msg = _(u'Library does not exist.')
+        return HttpResponse(json.dumps({"err_msg": err_msg}), status=400,
+                            content_type=content_type)
+    dir_tree = DirTree(commit)
 
     # get dirents for every path element
     if all_dir:
-        all_dirents = []
         path_eles = path.split('/')[:-1]
-        for i, x in enumerate(path_eles):
-            ele_path = '/'.join(path_eles[:i+1]) + '/'
-            try:
-                ele_path_dirents = seafile_api.list_dir_by_path(repo_id, ele_path.encode('utf-8'))
-            except SearpcError, e:
-                ele_path_dirents = []
-            ds = []
-            for d in ele_path_dirents:
-                if stat.S_ISDIR(d.mode):
-                    ds.append(d.obj_name)
-            all_dirents.append(ds)
+        all_dirents = []
+        for dir_id, entries in dir_tree.walk_path(path)[:len(path_eles)]:
+            all_dirents.append([name for name, obj_id, is_dir in entries
+                                if is_dir])
+        all_dirents += [[]] * (len(path_eles) - len(all_dirents))
         return HttpResponse(json.dumps(all_dirents), content_type=content_type)
 
-    # get dirents in path
-    try:
-        dirents = seafile_api.list_dir_by_path(repo_id, path.encode('utf-8'))
-    except SearpcError, e:
-        return HttpResponse(json.dumps({"err_msg": e.msg}), status=500,
+    # get dirents in path, and in its subdirs down to ``depth`` levels
+    dir_id = dir_tree.get_dir_id(path)
+    if dir_id is None:
+        err_msg = _(u'Directory does not exist.')
+        return HttpResponse(json.dumps({"err_msg": err_msg}), status=400,
                             content_type=content_type)
-    dirent_list = []
-    for dirent in dirents:
-        if stat.S_ISDIR(dirent.mode):
-            dirent.has_subdir = False
-
-            if dir_only:
-                dirent_path = os.path.join(path, dirent.obj_name)
-                try:
-                    dirent_dirents = seafile_api.list_dir_by_path(repo_id, dirent_path.encode('utf-8'))
-                except SearpcError, e:
-                    dirent_dirents = []
-                for dirent_dirent in dirent_dirents:
-                    if stat.S_ISDIR(dirent_dirent.props.mode):
-                        dirent.has_subdir = True
-                        break
-
-            subdir = {
-                'name': dirent.obj_name,
-                'id': dirent.obj_id,
-                'type': 'dir',
-                'has_subdir': dirent.has_subdir, # to decide node 'state' ('closed' or not) in jstree
-                'repo_id': repo_id,
-            }
-            dirent_list.append(subdir)
-        else:
-            if not dir_only:
-                f = {
-                    'repo_id': repo_id,
-                    'id': dirent.obj_id,
-                    'name': dirent.obj_name,
-                    'type': 'file',
-                    }
-                dirent_list.append(f)
+    dirent_list = dir_tree.tree(dir_id, depth, dir_only)
+    add_repo_id(dirent_list, repo_id)
 
     return HttpResponse(json.dumps(dirent_list), content_type=content_type)
 
@@ -177,6 +171,26 @@ def get_my_unenc_repos(request):
     
     return HttpResponse(json.dumps(repo_list), content_type=content_type)
 
+@login_required
+def get_unenc_rw_repos(request):
+    """Get unencrypted repos the user can read and write, used when the user
+    opens the "Save to..." dialog.
+    """
+    if not request.is_ajax():
+        raise Http404
+
+    content_type = 'application/json; charset=utf-8'
+
+    username = request.user.username
+    cache_key = normalize_cache_key(username, 'UNENC_RW_REPOS_')
+    repo_list = cache.get(cache_key)
+    if repo_list is None:
+        repo_list = [{"name": r.name, "id": r.id}
+                     for r in get_unencry_rw_repos_by_user(username)]
+        cache.set(cache_key, repo_list, UNENC_RW_REPOS_CACHE_TIMEOUT)
+
+    return HttpResponse(json.dumps(repo_list), content_type=content_type)
+
 @login_required        
 def list_dir(request, repo_id):
     """
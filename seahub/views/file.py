@@ -5,6 +5,7 @@ view_snapshot_file, view_shared_file, file_edit, etc.
 """
 
 import os
+import codecs
 import hashlib
 import simplejson as json
 import stat
@@ -44,6 +45,8 @@ from seahub.utils import show_delete_days, render_error, \
     get_file_contributors, get_ccnetapplet_root, render_permission_error, \
     is_textual_file, show_delete_days, mkstemp, EMPTY_SHA1, HtmlDiff, \
     check_filename_with_rename, gen_inner_file_get_url, normalize_file_path
+from seahub.utils.htmldiff import DiffTooLarge, make_unified_diff
+from seahub.utils.httpclient import urlopen
 from seahub.utils.file_types import (IMAGE, PDF, IMAGE, DOCUMENT, MARKDOWN, \
                                          TEXT, SF)
 from seahub.utils.star import is_file_starred
@@ -54,13 +57,17 @@ if HAS_OFFICE_CONVERTER:
         prepare_converted_html, OFFICE_PREVIEW_MAX_SIZE
 
 from seahub.settings import FILE_ENCODING_LIST, FILE_PREVIEW_MAX_SIZE, \
-    FILE_ENCODING_TRY_LIST, USE_PDFJS, MEDIA_URL, SITE_ROOT
-from seahub.views import is_registered_user, get_repo_access_permission, \
-    get_unencry_rw_repos_by_user
+    FILE_ENCODING_TRY_LIST, USE_PDFJS, MEDIA_URL, SITE_ROOT, \
+    TEXT_DIFF_MAX_SIZE, TEXT_DIFF_TIMEOUT, TEXT_PREVIEW_MAX_LINES, \
+    TEXT_PREVIEW_MAX_BYTES
+from seahub.views import is_registered_user, get_repo_access_permission
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
 
+# Bytes read from httpserver at a time when previewing text files.
+TEXT_PREVIEW_CHUNK_SIZE = 64 * 1024
+
 def get_user_permission(request, repo_id):
     if request.user.is_authenticated():
         return check_permission(repo_id, request.user.username)
@@ -110,8 +117,11 @@ def repo_file_get(raw_path, file_enc):
         encoding = file_enc
 
     try:
-        file_response = urllib2.urlopen(raw_path)
-        content = file_response.read()
+        file_response = urlopen(raw_path)
+        try:
+            content = file_response.read()
+        finally:
+            file_response.close()
     except urllib2.HTTPError, e:
         logger.error(e)
         err = _(u'HTTPError: failed to open file online')
@@ -152,6 +162,142 @@ def repo_file_get(raw_path, file_enc):
 
     return err, file_content, encoding
 
+def detect_encoding(content, final=True):
+    """Return the first encoding in ``FILE_ENCODING_TRY_LIST`` that can
+    decode ``content``, or the one guessed by chardet. If ``final`` is False,
+    ``content`` is the beginning of a file and may end in the middle of a
+    character.
+    """
+    for enc in FILE_ENCODING_TRY_LIST:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(content, final)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return chardet.detect(content)['encoding']
+
+def is_line_encoding(encoding):
+    """Whether ``encoding`` is a text encoding compatible with ASCII, so that
+    a file can be split into lines at line feeds before being decoded.
+    """
+    try:
+        return u'a\n'.encode(encoding) == 'a\n' and \
+            'a\n'.decode(encoding) == u'a\n'
+    except Exception:
+        return False
+
+def open_file_at(raw_path, offset):
+    """Open ``raw_path`` and skip to byte ``offset`` of the file, with a range
+    request if httpserver supports it.
+    """
+    headers = {}
+    if offset > 0:
+        headers['Range'] = 'bytes=%d-' % offset
+    resp = urlopen(raw_path, headers)
+    if offset > 0 and resp.getcode() != 206:
+        # Range is ignored, whole file is returned.
+        left = offset
+        while left > 0:
+            data = resp.read(min(left, TEXT_PREVIEW_CHUNK_SIZE))
+            if not data:
+                break
+            left -= len(data)
+    return resp
+
+def read_lines(fp, max_lines, max_bytes):
+    """Read from ``fp`` until ``max_lines`` lines or about ``max_bytes`` bytes
+    are read.
+
+    Returns:
+        data, whether the end of file is reached
+    """
+    chunks = []
+    lines = size = 0
+    while True:
+        chunk = fp.read(TEXT_PREVIEW_CHUNK_SIZE)
+        if not chunk:
+            return ''.join(chunks), True
+
+        count = chunk.count('\n')
+        if lines + count >= max_lines:
+            pos = -1
+            for i in xrange(max_lines - lines):
+                pos = chunk.find('\n', pos + 1)
+            chunks.append(chunk[:pos + 1])
+            return ''.join(chunks), False
+
+        chunks.append(chunk)
+        lines += count
+        size += len(chunk)
+        if size >= max_bytes:
+            return ''.join(chunks), False
+
+def repo_file_get_lines(raw_path, file_enc, offset=0, max_lines=None):
+    """Get at most ``max_lines`` lines of a text file from byte ``offset``,
+    without fetching the rest of the file. Encoding is detected on the lines
+    read if ``file_enc`` is 'auto'.
+
+    Returns:
+        err, content, encoding, offset of the next line or None at the end
+        of file
+    """
+    if max_lines is None:
+        max_lines = TEXT_PREVIEW_MAX_LINES
+    encoding = file_enc if file_enc != 'auto' else None
+
+    try:
+        fp = open_file_at(raw_path, offset)
+        try:
+            data, eof = read_lines(fp, max_lines, TEXT_PREVIEW_MAX_BYTES)
+        finally:
+            fp.close()
+    except urllib2.HTTPError, e:
+        if e.code == 416:
+            # offset is at the end of file
+            return '', u'', encoding, None
+        logger.error(e)
+        err = _(u'HTTPError: failed to open file online')
+        return err, '', None, None
+    except urllib2.URLError as e:
+        logger.error(e)
+        err = _(u'URLError: failed to open file online')
+        return err, '', None, None
+
+    if not encoding:
+        encoding = detect_encoding(data, eof)
+        if not encoding:
+            return _(u'Unknown file encoding'), '', '', None
+
+    if not is_line_encoding(encoding):
+        if offset > 0:
+            return _(u'The encoding you chose is not proper.'), '', encoding, None
+        # e.g. UTF-16, lines can't be found in bytes, read the whole file.
+        err, content, encoding = repo_file_get(raw_path, encoding)
+        return err, content, encoding, None
+
+    if not eof and not data.endswith('\n'):
+        # Stopped by max_bytes in the middle of a line, the rest of the line
+        # is read next time.
+        pos = data.rfind('\n')
+        if pos >= 0:
+            data = data[:pos + 1]
+    # Only a single long line may end in the middle of a character.
+    final = eof or data.endswith('\n')
+
+    try:
+        content = codecs.getincrementaldecoder(encoding)().decode(data, final)
+    except (LookupError, UnicodeDecodeError):
+        if file_enc != 'auto':
+            return _(u'The encoding you chose is not proper.'), '', encoding, None
+        return _(u'Unknown file encoding'), '', '', None
+
+    if eof:
+        return '', content, encoding, None
+    if final:
+        return '', content, encoding, offset + len(data)
+    # Bytes of a cut character are not decoded, count the decoded ones.
+    return '', content, encoding, offset + len(content.encode(encoding))
+
 
 def get_file_view_path_and_perm(request, repo_id, obj_id, path):
     """ Get path and the permission to view file.
@@ -174,13 +320,23 @@ def get_file_view_path_and_perm(request, repo_id, obj_id, path):
         inner_url = gen_inner_file_get_url(token, filename)
         return (outer_url, inner_url, user_perm)
 
-def handle_textual_file(request, filetype, raw_path, ret_dict):
+def handle_textual_file(request, filetype, raw_path, ret_dict,
+                        max_lines=None):
+    """Get content of a textual file. If ``max_lines`` is given, only the
+    first ``max_lines`` lines of a plain text file are fetched, and the offset
+    to load more lines from is set as ``next_offset``.
+    """
     # encoding option a user chose
     file_enc = request.GET.get('file_enc', 'auto') 
     if not file_enc in FILE_ENCODING_LIST:
         file_enc = 'auto'
-    err, file_content, encoding = get_file_content(filetype,
-                                                   raw_path, file_enc)
+    if filetype == TEXT and max_lines:
+        err, file_content, encoding, next_offset = repo_file_get_lines(
+            raw_path, file_enc, max_lines=max_lines)
+        ret_dict['next_offset'] = next_offset
+    else:
+        err, file_content, encoding = get_file_content(filetype,
+                                                       raw_path, file_enc)
     file_encoding_list = FILE_ENCODING_LIST
     if encoding and encoding not in FILE_ENCODING_LIST:
         file_encoding_list.append(encoding)
@@ -334,7 +490,8 @@ def view_file(request, repo_id):
     else:
         """Choose different approach when dealing with different type of file."""
         if is_textual_file(file_type=filetype):
-            handle_textual_file(request, filetype, inner_path, ret_dict)
+            handle_textual_file(request, filetype, inner_path, ret_dict,
+                                max_lines=TEXT_PREVIEW_MAX_LINES)
             if filetype == MARKDOWN:
                 c = ret_dict['file_content']
                 ret_dict['file_content'] = convert_md_link(c, repo_id, username)
@@ -435,6 +592,7 @@ def view_file(request, repo_id):
             'file_enc': ret_dict['file_enc'],
             'encoding': ret_dict['encoding'],
             'file_encoding_list':ret_dict['file_encoding_list'],
+            'next_offset': ret_dict.get('next_offset'),
             'html_exists': ret_dict['html_exists'],
             'html_detail': ret_dict.get('html_detail', {}),
             'filetype': ret_dict['filetype'],
@@ -635,7 +793,6 @@ def view_shared_file(request, token):
             except SearpcError, e:
                 logger.error('Error when sending file-view message: %s' % str(e))
 
-    accessible_repos = get_unencry_rw_repos_by_user(request.user.username)
     save_to_link = reverse('save_shared_link') + '?t=' + token
             
     return render_to_response('shared_file_view.html', {
@@ -657,7 +814,6 @@ def view_shared_file(request, token):
             'html_detail': ret_dict.get('html_detail', {}),
             'filetype': ret_dict['filetype'],
             'use_pdfjs':USE_PDFJS,
-            'accessible_repos': accessible_repos,
             'save_to_link': save_to_link,
             }, context_instance=RequestContext(request))
 
@@ -936,6 +1092,70 @@ def get_file_content_by_commit_and_path(request, repo_id, commit_id, path, file_
             return None, 'error when read file from httpserver: %s' % e
         return file_content, err
 
+@login_required
+def text_file_lines(request, repo_id):
+    """Load more lines of a text file being previewed, from byte ``offset``.
+
+    Lines are read from file ``obj_id`` of commit ``commit_id`` that the
+    page was rendered with, as the offset is only valid for that file.
+    """
+    if not request.is_ajax():
+        raise Http404
+
+    content_type = 'application/json; charset=utf-8'
+
+    path = request.GET.get('p', '').rstrip('/')
+    commit_id = request.GET.get('commit_id', '')
+    obj_id = request.GET.get('obj_id', '')
+    # Encoding detected on the first page may not be in FILE_ENCODING_LIST.
+    file_enc = request.GET.get('file_enc', 'auto')
+    if file_enc != 'auto' and file_enc not in FILE_ENCODING_LIST and \
+            not is_line_encoding(file_enc):
+        file_enc = None
+    try:
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        offset = -1
+    if not path or not commit_id or not obj_id or not file_enc or offset < 0:
+        return HttpResponse(json.dumps({'error': _(u'Invalid arguments')}),
+                            status=400, content_type=content_type)
+
+    repo = get_repo(repo_id)
+    if not repo:
+        return HttpResponse(json.dumps({'error': _(u'Library does not exist.')}),
+                            status=400, content_type=content_type)
+
+    username = request.user.username
+    if get_repo_access_permission(repo_id, username) is None or \
+            (repo.encrypted and not seafile_api.is_password_set(repo_id, username)):
+        return HttpResponse(json.dumps({'error': _(u'Permission denied.')}),
+                            status=403, content_type=content_type)
+
+    # Make sure the file belongs to this repo.
+    commit = get_commit(commit_id)
+    file_id = None
+    if commit and commit.repo_id == repo_id:
+        try:
+            file_id = seafserv_threaded_rpc.get_file_id_by_commit_and_path(
+                commit_id, path)
+        except SearpcError, e:
+            logger.error(e)
+    if not file_id or file_id != obj_id:
+        return HttpResponse(json.dumps({'error': _(u'File does not exist')}),
+                            status=400, content_type=content_type)
+
+    token = web_get_access_token(repo_id, obj_id, 'view', username)
+    inner_path = gen_inner_file_get_url(token, os.path.basename(path))
+    err, content, encoding, next_offset = repo_file_get_lines(
+        inner_path, file_enc, offset)
+    if err:
+        return HttpResponse(json.dumps({'error': err}), status=500,
+                            content_type=content_type)
+
+    return HttpResponse(json.dumps({'content': content,
+                                    'next_offset': next_offset}),
+                        content_type=content_type)
+
 @login_required    
 def text_diff(request, repo_id):
     commit_id = request.GET.get('commit', '')
@@ -974,12 +1194,24 @@ def text_diff(request, repo_id):
 
     is_new_file = False
     diff_result_table = ''
+    diff_result_unified = ''
+    diff_truncated = False
     if prev_content == '' and current_content == '':
         is_new_file = True
     else:
-        diff = HtmlDiff()
-        diff_result_table = diff.make_table(prev_content.splitlines(),
-                                        current_content.splitlines(), True)
+        prev_lines = prev_content.splitlines()
+        current_lines = current_content.splitlines()
+        diff = HtmlDiff(fast=True)
+        try:
+            diff_result_table = diff.make_table(prev_lines, current_lines,
+                                                True,
+                                                max_size=TEXT_DIFF_MAX_SIZE,
+                                                timeout=TEXT_DIFF_TIMEOUT)
+        except DiffTooLarge, e:
+            logger.warn('text diff of %s in repo %s: %s' % (path, repo_id, e))
+            diff_result_unified, diff_truncated = make_unified_diff(
+                prev_lines, current_lines, max_size=TEXT_DIFF_MAX_SIZE,
+                timeout=TEXT_DIFF_TIMEOUT, matcher=diff.matcher)
 
     zipped = gen_path_link(path, repo.name)
 
@@ -995,6 +1227,8 @@ def text_diff(request, repo_id):
         'current_commit': current_commit,
         'prev_commit': prev_commit,
         'diff_result_table': diff_result_table,
+        'diff_result_unified': diff_result_unified,
+        'diff_truncated': diff_truncated,
         'is_new_file': is_new_file,
         'search_repo_id': search_repo_id,
     }, context_instance=RequestContext(request))
@@ -1106,7 +1340,6 @@ def view_priv_shared_file(request, token):
         elif filetype == PDF:
             handle_pdf(inner_path, obj_id, fileext, ret_dict)
 
-    accessible_repos = get_unencry_rw_repos_by_user(username)
     save_to_link = reverse('save_private_file_share', args=[pfs.token])
 
     return render_to_response('shared_file_view.html', {
@@ -1127,6 +1360,5 @@ def view_priv_shared_file(request, token):
             'html_detail': ret_dict.get('html_detail', {}),
             'filetype': ret_dict['filetype'],
             'use_pdfjs':USE_PDFJS,
-            'accessible_repos': accessible_repos,
             'save_to_link': save_to_link,
             }, context_instance=RequestContext(request))
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
 import stat
-import urllib2
 
 from django.core.urlresolvers import reverse
 from django.utils.http import urlquote
@@ -16,6 +15,7 @@ from seahub.utils import render_error, render_permission_error, string2list, \
     gen_file_get_url, get_file_type_and_ext, get_file_contributors, \
     gen_inner_file_get_url
 from seahub.utils.file_types import IMAGE
+from seahub.utils.httpclient import urlopen
 from models import WikiPageMissing, WikiDoesNotExist, GroupWiki, PersonalWiki
 
 
@@ -89,7 +89,7 @@ def get_personal_wiki_page(username, page_name):
     repo = get_personal_wiki_repo(username)
     dirent = get_wiki_dirent(repo.id, page_name)
     url = get_inner_file_url(repo, dirent.obj_id, dirent.obj_name)
-    file_response = urllib2.urlopen(url)
+    file_response = urlopen(url)
     content = file_response.read()
     return content, repo, dirent
 
@@ -97,7 +97,7 @@ def get_group_wiki_page(username, group, page_name):
     repo = get_group_wiki_repo(group, username)
     dirent = get_wiki_dirent(repo.id, page_name)
     url = get_inner_file_url(repo, dirent.obj_id, dirent.obj_name)
-    file_response = urllib2.urlopen(url)
+    file_response = urlopen(url)
     content = file_response.read()
     return content, repo, dirent
 
@@ -133,6 +133,81 @@ class SimpleRateThrottle(BaseThrottle):
         return remaining_duration / float(available_requests)
 
 
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    A fixed memory alternative to `SimpleRateThrottle`.
+
+    Instead of the full request history, two counters are kept in the cache
+    for each key: the number of requests in the current fixed window of
+    `duration` seconds, and in the previous one.  The number of requests in
+    the sliding window ending now is estimated by weighting the previous
+    count by how much of the previous window the sliding window still
+    covers.
+
+    Counters are created with `cache.add` with a timeout of two windows,
+    and then only updated with `cache.incr`, which is atomic on memcached.
+    Caches whose `incr` is not atomic may lose counts under concurrent
+    requests, and may reset the timeout to their default one.
+    """
+
+    def get_window_keys(self):
+        window = int(self.now // self.duration)
+        return ('%s_%d' % (self.key, window), '%s_%d' % (self.key, window - 1))
+
+    def incr(self, key, delta):
+        """
+        Adds `delta` to the counter `key`, and returns the new count.
+        """
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            pass
+        # Counters live for two windows, as the previous window count is
+        # needed for the whole current window.  Keys are stamped with the
+        # window, so they never need to live longer.
+        cache.add(key, 0, self.duration * 2)
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            # Expired right after being added.
+            return max(delta, 0)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+
+        current_key, previous_key = self.get_window_keys()
+        self.current = self.incr(current_key, 1)
+        self.previous = cache.get(previous_key, 0)
+        self.elapsed = (self.now % self.duration) / float(self.duration)
+        if self.previous * (1 - self.elapsed) + self.current > self.num_requests:
+            # Do not count throttled requests.
+            self.current = self.incr(current_key, -1)
+            return self.throttle_failure()
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """
+        Returns the recommended next request time in seconds.
+        """
+        remaining = 1 - self.elapsed
+        available = self.num_requests - self.current - 1
+        if available < 0 or not self.previous:
+            # Wait for the current window to become the previous one.
+            return remaining * self.duration
+        # Wait until the weighted previous count leaves room for a request.
+        needed = 1 - float(available) / self.previous
+        return max(needed - self.elapsed, 0) * self.duration
+
+
 class AnonRateThrottle(SimpleRateThrottle):
     """
     Limits the rate of API calls that may be made by a anonymous users.
@@ -206,3 +281,17 @@ class ScopedRateThrottle(SimpleRateThrottle):
             'scope': scope,
             'ident': ident
         }
+
+
+class AnonSlidingWindowRateThrottle(SlidingWindowRateThrottle, AnonRateThrottle):
+    """
+    `AnonRateThrottle` with a fixed memory sliding window.
+    """
+    pass
+
+
+class UserSlidingWindowRateThrottle(SlidingWindowRateThrottle, UserRateThrottle):
+    """
+    `UserRateThrottle` with a fixed memory sliding window.
+    """
+    pass
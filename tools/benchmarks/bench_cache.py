@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Benchmark the tiered cache backend against the file based cache.
+
+Simulates rendering template heavy pages (group discussions, events, member
+lists), where each page looks up nickname, user id and avatar of every user
+shown, and most lookups are cache hits.
+
+    python tools/benchmarks/bench_cache.py [n_pages] [users_per_page]
+"""
+import os
+import sys
+import time
+import shutil
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+
+from django.conf import settings
+
+CACHE_DIR = tempfile.mkdtemp(prefix='seahub_bench_cache_')
+settings.configure(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, 'file'),
+            'OPTIONS': {'MAX_ENTRIES': 1000000},
+        },
+        'tiered': {
+            'BACKEND': 'seahub.base.tiered_cache.TieredCache',
+            'OPTIONS': {'SHARED_CACHE': 'tiered_shared'},
+        },
+        'tiered_shared': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, 'tiered'),
+            'OPTIONS': {'MAX_ENTRIES': 1000000},
+        },
+})
+
+from django.core.cache import get_cache
+
+KEY_PREFIXES = ('NICKNAME_', 'EMAIL2ID_', 'AVATAR_')
+
+def render_pages(cache, emails, n_pages, users_per_page):
+    rand = random.Random(0)
+    for i in xrange(n_pages):
+        for email in rand.sample(emails, users_per_page):
+            for prefix in KEY_PREFIXES:
+                key = prefix + email
+                if cache.get(key) is None:
+                    cache.set(key, email.split('@')[0], 3600)
+
+def main():
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    users_per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    emails = ['user%d@example.com' % i for i in xrange(users_per_page * 5)]
+
+    print '%d pages, %d users per page, %d lookups per page' % (
+        n_pages, users_per_page, users_per_page * len(KEY_PREFIXES))
+    try:
+        for alias in ('file', 'tiered'):
+            cache = get_cache(alias)
+            # Warm up the cache, so that lookups are cache hits as on a busy
+            # site, then measure.
+            render_pages(cache, emails, 1, len(emails))
+            start = time.time()
+            render_pages(cache, emails, n_pages, users_per_page)
+            elapsed = time.time() - start
+            print '%-8s %.3fs total, %.2fms per page' % (
+                alias, elapsed, elapsed * 1000 / n_pages)
+    finally:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
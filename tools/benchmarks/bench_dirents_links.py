@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Benchmark joining directory entries with share links, upload links and
+starred files, as done by ``seahub.views.get_repo_dirents``.
+
+Compares the old nested-loop join against the path indexed join. Run it from
+the top directory of seahub with seahub environment set up (see
+setenv.sh.template):
+
+    python tools/benchmarks/bench_dirents_links.py [n_dirents] [n_links]
+"""
+import os
+import sys
+import stat
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "seahub.settings")
+
+from seahub.views import join_dirents_links
+from seahub.utils import gen_dir_share_link, gen_file_share_link, \
+    gen_shared_upload_link
+
+class FakeProps(object):
+    def __init__(self, mode):
+        self.mode = mode
+
+class FakeDirent(object):
+    def __init__(self, name, is_dir):
+        self.obj_name = name
+        self.props = FakeProps(stat.S_IFDIR if is_dir else stat.S_IFREG)
+
+class FakeLink(object):
+    def __init__(self, path, token):
+        self.path = path
+        self.token = token
+
+def old_join(path, dirents, fileshares, uploadlinks, starred_files):
+    for dirent in dirents:
+        dirent.sharelink = ''
+        dirent.uploadlink = ''
+        if stat.S_ISDIR(dirent.props.mode):
+            dpath = os.path.join(path, dirent.obj_name)
+            if dpath[-1] != '/':
+                dpath += '/'
+            for share in fileshares:
+                if dpath == share.path:
+                    dirent.sharelink = gen_dir_share_link(share.token)
+                    dirent.sharetoken = share.token
+                    break
+            for link in uploadlinks:
+                if dpath == link.path:
+                    dirent.uploadlink = gen_shared_upload_link(link.token)
+                    dirent.uploadtoken = link.token
+                    break
+        else:
+            dirent.starred = False
+            fpath = os.path.join(path, dirent.obj_name)
+            if fpath in starred_files:
+                dirent.starred = True
+            for share in fileshares:
+                if fpath == share.path:
+                    dirent.sharelink = gen_file_share_link(share.token)
+                    dirent.sharetoken = share.token
+                    break
+
+def make_data(path, n_dirents, n_links):
+    dirents = []
+    for i in xrange(n_dirents):
+        if i % 10 == 0:
+            dirents.append(FakeDirent('dir-%d' % i, True))
+        else:
+            dirents.append(FakeDirent('file-%d.txt' % i, False))
+
+    # Spread links evenly over the dirents.
+    step = max(n_dirents / max(n_links, 1), 1)
+    fileshares = []
+    uploadlinks = []
+    starred_files = []
+    for i in xrange(0, n_dirents, step)[:n_links]:
+        d = dirents[i]
+        p = os.path.join(path, d.obj_name)
+        if stat.S_ISDIR(d.props.mode):
+            p += '/'
+            uploadlinks.append(FakeLink(p, 'u%09d' % i))
+        else:
+            starred_files.append(p)
+        fileshares.append(FakeLink(p, 's%09d' % i))
+    return dirents, fileshares, uploadlinks, starred_files
+
+def timeit(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+def main():
+    n_dirents = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n_links = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    path = '/bench/'
+
+    dirents, fileshares, uploadlinks, starred_files = make_data(
+        path, n_dirents, n_links)
+    print '%d dirents x %d links' % (n_dirents, n_links)
+
+    t_old = timeit(old_join, path, dirents, fileshares, uploadlinks,
+                   starred_files)
+    old_result = [(d.sharelink, d.uploadlink, getattr(d, 'starred', None))
+                  for d in dirents]
+    print 'nested loop join: %.3fs' % t_old
+
+    def new_join():
+        share_index = dict([(e.path, e.token) for e in fileshares])
+        upload_index = dict([(e.path, e.token) for e in uploadlinks])
+        join_dirents_links(path, dirents, share_index, upload_index,
+                           set(starred_files))
+    t_new = timeit(new_join)
+    new_result = [(d.sharelink, d.uploadlink, getattr(d, 'starred', None))
+                  for d in dirents]
+    print 'indexed join:     %.3fs' % t_new
+
+    assert old_result == new_result, 'results differ'
+    if t_new > 0:
+        print 'speedup:          %.1fx' % (t_old / t_new)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Benchmark rendering the side by side diff of a text file, as done by
+``seahub.views.file.text_diff``.
+
+Compares ``HtmlDiff`` based on ndiff against the fast line matching mode. Run
+it from the top directory of seahub with seahub environment set up (see
+setenv.sh.template):
+
+    python tools/benchmarks/bench_text_diff.py [n_lines] [n_changes]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "seahub.settings")
+
+from seahub.utils.htmldiff import HtmlDiff
+
+def make_file(rand, n_lines):
+    lines = []
+    for i in xrange(n_lines):
+        r = rand.random()
+        if r < 0.1:
+            lines.append('')
+        elif r < 0.2:
+            lines.append('    }')
+        else:
+            lines.append('    value_%d = compute(%d, "%s")' % (
+                    rand.randint(0, n_lines), i, 'x' * rand.randint(0, 40)))
+    return lines
+
+def modify(rand, lines, n_changes):
+    lines = list(lines)
+    for i in xrange(n_changes):
+        pos = rand.randint(0, len(lines) - 1)
+        r = rand.random()
+        if r < 0.3:
+            lines.insert(pos, '    added_%d = True' % i)
+        elif r < 0.6:
+            del lines[pos]
+        else:
+            lines[pos] = lines[pos] + ' # changed'
+
+    # A block of edited lines, the worst case of ndiff, which compares every
+    # pair of lines of the block to find the most similar ones.
+    start = len(lines) / 2
+    for i in xrange(start, min(start + 500, len(lines))):
+        lines[i] = lines[i].replace('value_', 'v_')
+    return lines
+
+def timeit(func, *args):
+    start = time.time()
+    ret = func(*args)
+    return time.time() - start, ret
+
+def main():
+    n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_changes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rand = random.Random(0)
+
+    old = make_file(rand, n_lines)
+    new = modify(rand, old, n_changes)
+    print '%d lines, %d changes and an edited block' % (n_lines, n_changes)
+
+    t_old, table_old = timeit(HtmlDiff().make_table, old, new, True)
+    print 'ndiff:      %.3fs, %d bytes' % (t_old, len(table_old))
+
+    t_new, table_new = timeit(HtmlDiff(fast=True).make_table, old, new, True)
+    print 'line diff:  %.3fs, %d bytes' % (t_new, len(table_new))
+
+    if t_new > 0:
+        print 'speedup:    %.1fx' % (t_old / t_new)
+
+if __name__ == '__main__':
+    main()